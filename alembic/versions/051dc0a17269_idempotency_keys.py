@@ -0,0 +1,37 @@
+"""idempotency keys for order creation
+
+Revision ID: 051dc0a17269
+Revises: f24519206646
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '051dc0a17269'
+down_revision = 'f24519206646'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'idempotency_keys' not in inspector.get_table_names():
+        op.create_table(
+            'idempotency_keys',
+            sa.Column('userid', sa.BigInteger(), nullable=False),
+            sa.Column('key', sa.String(length=255), nullable=False),
+            sa.Column('requesthash', sa.String(length=64), nullable=False),
+            sa.Column('orderid', sa.Integer(), nullable=False),
+            sa.Column('createdat', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+            sa.ForeignKeyConstraint(['orderid'], ['orders.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('userid', 'key'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('idempotency_keys')
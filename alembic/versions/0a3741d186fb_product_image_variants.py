@@ -0,0 +1,29 @@
+"""products.image_variants for resized image copies
+
+Revision ID: 0a3741d186fb
+Revises: 977177519065
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0a3741d186fb'
+down_revision = '977177519065'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    columns = [c['name'] for c in inspector.get_columns('products')]
+    if 'image_variants' not in columns:
+        op.add_column('products', sa.Column('image_variants', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'image_variants')
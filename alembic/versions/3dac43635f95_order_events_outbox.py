@@ -0,0 +1,53 @@
+"""order_events outbox
+
+Revision ID: 3dac43635f95
+Revises: b26285be2184
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '3dac43635f95'
+down_revision = 'b26285be2184'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'order_events' not in inspector.get_table_names():
+        op.create_table(
+            'order_events',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('orderid', sa.Integer(), nullable=False),
+            sa.Column('userid', sa.BigInteger(), nullable=True),
+            sa.Column('kind', sa.String(length=30), nullable=False),
+            sa.Column('status', sa.String(length=50), nullable=False),
+            sa.Column('paymentstatus', sa.String(length=20), nullable=True),
+            sa.Column('payload', sa.Text(), nullable=True),
+            sa.Column('createdat', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.Column('processedat', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+            sa.Column('lasterror', sa.Text(), nullable=True),
+            sa.ForeignKeyConstraint(['orderid'], ['orders.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_order_events_orderid', 'order_events', ['orderid'])
+        # Очередь диспетчера - только необработанные события
+        op.create_index(
+            'ix_order_events_pending',
+            'order_events',
+            ['id'],
+            postgresql_where=sa.text('processedat IS NULL'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_events_pending', table_name='order_events')
+    op.drop_index('ix_order_events_orderid', table_name='order_events')
+    op.drop_table('order_events')
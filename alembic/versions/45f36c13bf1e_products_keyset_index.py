@@ -0,0 +1,37 @@
+"""products keyset index
+
+Revision ID: 45f36c13bf1e
+Revises: b9f265640762
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '45f36c13bf1e'
+down_revision = 'b9f265640762'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Порядок каталога и keyset-пагинация GET /api/products: (categoryid, name, id).
+    # CONCURRENTLY нельзя внутри транзакции - выполняем в autocommit.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_products_categoryid_name_id',
+            'products',
+            ['categoryid', 'name', 'id'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_products_categoryid_name_id',
+            table_name='products',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,54 @@
+"""indexes for bot and api hot paths
+
+Revision ID: 78ff3094bf18
+Revises: 051dc0a17269
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '78ff3094bf18'
+down_revision = '051dc0a17269'
+branch_labels = None
+depends_on = None
+
+# (имя, таблица, колонки, условие частичного индекса)
+# products.categoryid уже покрыт ведущей колонкой ix_products_categoryid_name_id,
+# cart (userid, productcode) - уникальным индексом из 9d7be258a5d3.
+INDEXES = [
+    ('ix_orders_userid_createdat', 'orders', ['userid', 'createdat'], None),
+    ('ix_orders_status_createdat', 'orders', ['status', 'createdat'], None),
+    ('ix_orders_createdat', 'orders', ['createdat'], None),
+    ('ix_orders_new_createdat', 'orders', ['createdat'], "status = 'new'"),
+    ('ix_orderitems_orderid', 'orderitems', ['orderid'], None),
+    ('ix_useraddresses_userid', 'useraddresses', ['userid'], None),
+    ('ix_orderhistory_orderid', 'orderhistory', ['orderid'], None),
+    ('ix_categories_code', 'categories', ['code'], None),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY нельзя внутри транзакции - выполняем в autocommit
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,34 @@
+"""cache_versions for cross-process cache invalidation
+
+Revision ID: 977177519065
+Revises: dd9cea776466
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '977177519065'
+down_revision = 'dd9cea776466'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'cache_versions' not in inspector.get_table_names():
+        op.create_table(
+            'cache_versions',
+            sa.Column('topic', sa.String(length=100), nullable=False),
+            sa.Column('version', sa.BigInteger(), nullable=False),
+            sa.Column('updatedat', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('topic'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('cache_versions')
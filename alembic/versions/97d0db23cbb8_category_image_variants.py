@@ -0,0 +1,29 @@
+"""categories.image_variants for resized image copies
+
+Revision ID: 97d0db23cbb8
+Revises: 0a3741d186fb
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '97d0db23cbb8'
+down_revision = '0a3741d186fb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    columns = [c['name'] for c in inspector.get_columns('categories')]
+    if 'image_variants' not in columns:
+        op.add_column('categories', sa.Column('image_variants', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('categories', 'image_variants')
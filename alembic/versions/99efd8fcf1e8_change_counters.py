@@ -0,0 +1,54 @@
+"""change_counters: monotonic counters for commit-ordered change numbers
+
+Revision ID: 99efd8fcf1e8
+Revises: e22d6b49761a
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '99efd8fcf1e8'
+down_revision = 'e22d6b49761a'
+branch_labels = None
+depends_on = None
+
+# Счётчик продолжает с наибольшего уже выданного номера
+SEED = {
+    'catalog': (
+        "SELECT MAX(seq) FROM ("
+        " SELECT MAX(changeseq) AS seq FROM products"
+        " UNION ALL SELECT MAX(changeseq) FROM product_tombstones) AS s"
+    ),
+    'order_events': "SELECT MAX(feedseq) FROM order_events",
+}
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'change_counters' not in inspector.get_table_names():
+        op.create_table(
+            'change_counters',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('name'),
+        )
+
+    for name, query in SEED.items():
+        exists = conn.execute(
+            sa.text("SELECT 1 FROM change_counters WHERE name = :name").bindparams(name=name)
+        ).scalar()
+        if not exists:
+            value = conn.execute(sa.text(query)).scalar() or 0
+            conn.execute(
+                sa.text("INSERT INTO change_counters (name, value) VALUES (:name, :value)")
+                .bindparams(name=name, value=value)
+            )
+
+
+def downgrade() -> None:
+    op.drop_table('change_counters')
@@ -0,0 +1,102 @@
+"""unique (userid, productcode) in cart
+
+Revision ID: 9d7be258a5d3
+Revises: 78ff3094bf18
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '9d7be258a5d3'
+down_revision = '78ff3094bf18'
+branch_labels = None
+depends_on = None
+
+
+INDEX = 'uq_cart_userid_productcode'
+ATTEMPTS = 3
+
+
+def dedupe_cart() -> None:
+    # Дубли от гонок "+": количество суммируем в самую раннюю строку, остальные удаляем
+    op.execute("""
+        UPDATE cart SET quantity = (
+            SELECT SUM(c2.quantity) FROM cart c2
+            WHERE c2.userid = cart.userid AND c2.productcode = cart.productcode
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM cart GROUP BY userid, productcode HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM cart WHERE id NOT IN (
+            SELECT MIN(id) FROM cart GROUP BY userid, productcode
+        )
+    """)
+
+
+def drop_invalid_index(conn) -> None:
+    """
+    Упавший CREATE INDEX CONCURRENTLY оставляет индекс INVALID: if_not_exists
+    его пропустит, а ADD CONSTRAINT ... USING INDEX на нём упадёт
+    """
+    if conn.dialect.name != 'postgresql':
+        return
+    invalid = conn.execute(sa.text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": INDEX}).scalar()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX}")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # Индекс строится без блокировки таблицы: дубль, вставленный после
+    # чистки, валит построение - чистим снова и повторяем
+    for attempt in range(1, ATTEMPTS + 1):
+        dedupe_cart()
+        with op.get_context().autocommit_block():
+            drop_invalid_index(conn)
+            try:
+                op.create_index(
+                    INDEX,
+                    'cart',
+                    ['userid', 'productcode'],
+                    unique=True,
+                    postgresql_concurrently=True,
+                    if_not_exists=True,
+                )
+                break
+            except sa.exc.IntegrityError:
+                if attempt == ATTEMPTS:
+                    drop_invalid_index(conn)
+                    raise
+
+    constraints = [c['name'] for c in inspect(conn).get_unique_constraints('cart')]
+    if conn.dialect.name == 'postgresql' and INDEX not in constraints:
+        # Готовый индекс превращаем в ограничение без повторного построения
+        op.execute(
+            "ALTER TABLE cart ADD CONSTRAINT uq_cart_userid_productcode "
+            "UNIQUE USING INDEX uq_cart_userid_productcode"
+        )
+
+    # Обычный индекс, который создавала ранняя версия 78ff3094bf18, дублирует уникальный
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_cart_userid_productcode',
+            table_name='cart',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER TABLE cart DROP CONSTRAINT IF EXISTS uq_cart_userid_productcode")
+    else:
+        op.drop_index('uq_cart_userid_productcode', table_name='cart', if_exists=True)
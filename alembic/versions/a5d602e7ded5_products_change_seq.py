@@ -0,0 +1,88 @@
+"""products.changeseq: commit-ordered version for the catalog changes feed
+
+Revision ID: a5d602e7ded5
+Revises: e84c3c7a177f
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+import time
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'a5d602e7ded5'
+down_revision = 'e84c3c7a177f'
+branch_labels = None
+depends_on = None
+
+# Любая запись в товар (в т.ч. сырым SQL из скриптов) сбрасывает номер:
+# товар попадёт в ленту после следующей нумерации (api.change_seq)
+RESET_FUNCTION = """
+CREATE OR REPLACE FUNCTION products_reset_changeseq() RETURNS trigger AS $$
+BEGIN
+    NEW.changeseq := NULL;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+RESET_TRIGGER = """
+CREATE TRIGGER products_reset_changeseq
+BEFORE UPDATE ON products
+FOR EACH ROW
+WHEN (NEW.changeseq IS NOT DISTINCT FROM OLD.changeseq)
+EXECUTE FUNCTION products_reset_changeseq()
+"""
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    # Версии клиентов до этой миграции - мс эпохи: номера начинаем выше,
+    # чтобы с любой старой версии клиент один раз получил весь каталог
+    base = int(time.time() * 1000)
+
+    if 'changeseq' not in [c['name'] for c in inspector.get_columns('products')]:
+        op.add_column('products', sa.Column('changeseq', sa.BigInteger(), nullable=True))
+        op.execute(sa.text("UPDATE products SET changeseq = :base + id").bindparams(base=base))
+    if 'changeseq' not in [c['name'] for c in inspector.get_columns('product_tombstones')]:
+        op.add_column('product_tombstones', sa.Column('changeseq', sa.BigInteger(), nullable=True))
+        op.execute(sa.text(
+            "UPDATE product_tombstones SET changeseq = :base + id"
+            " + (SELECT COALESCE(MAX(id), 0) FROM products)"
+        ).bindparams(base=base))
+
+    if conn.dialect.name == 'postgresql':
+        op.execute(RESET_FUNCTION)
+        op.execute("DROP TRIGGER IF EXISTS products_reset_changeseq ON products")
+        op.execute(RESET_TRIGGER)
+
+    with op.get_context().autocommit_block():
+        for table in ('products', 'product_tombstones'):
+            op.create_index(
+                f'ix_{table}_changeseq',
+                table,
+                ['changeseq'],
+                unique=True,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        for table in ('products', 'product_tombstones'):
+            op.drop_index(
+                f'ix_{table}_changeseq',
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    if conn.dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS products_reset_changeseq ON products")
+        op.execute("DROP FUNCTION IF EXISTS products_reset_changeseq()")
+    op.drop_column('product_tombstones', 'changeseq')
+    op.drop_column('products', 'changeseq')
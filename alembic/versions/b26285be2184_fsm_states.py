@@ -0,0 +1,38 @@
+"""fsm_states for persistent bot FSM storage
+
+Revision ID: b26285be2184
+Revises: 9d7be258a5d3
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'b26285be2184'
+down_revision = '9d7be258a5d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'fsm_states' not in inspector.get_table_names():
+        op.create_table(
+            'fsm_states',
+            sa.Column('key', sa.String(length=255), nullable=False),
+            sa.Column('state', sa.String(length=255), nullable=True),
+            sa.Column('data', sa.Text(), nullable=True),
+            sa.Column('updatedat', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('key'),
+        )
+        # По нему удаляются состояния, простоявшие дольше TTL
+        op.create_index('ix_fsm_states_updatedat', 'fsm_states', ['updatedat'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_fsm_states_updatedat', table_name='fsm_states')
+    op.drop_table('fsm_states')
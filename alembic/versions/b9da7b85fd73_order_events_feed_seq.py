@@ -0,0 +1,48 @@
+"""order_events.feedseq: commit-ordered cursor for the order events feed
+
+Revision ID: b9da7b85fd73
+Revises: a5d602e7ded5
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'b9da7b85fd73'
+down_revision = 'a5d602e7ded5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'feedseq' not in [c['name'] for c in inspector.get_columns('order_events')]:
+        op.add_column('order_events', sa.Column('feedseq', sa.BigInteger(), nullable=True))
+        # Курсоры клиентов до миграции - id событий: старые события получают
+        # тот же номер, новые - больше, клиент продолжает с того же места
+        op.execute("UPDATE order_events SET feedseq = id")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_order_events_feedseq',
+            'order_events',
+            ['feedseq'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_order_events_feedseq',
+            table_name='order_events',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('order_events', 'feedseq')
@@ -0,0 +1,38 @@
+"""partial index for courier active orders
+
+Revision ID: dd9cea776466
+Revises: 3dac43635f95
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'dd9cea776466'
+down_revision = '3dac43635f95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY нельзя внутри транзакции - выполняем в autocommit
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_delivery_active',
+            'orders',
+            ['createdat'],
+            postgresql_where=sa.text("status IN ('ready', 'delivering')"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_orders_delivery_active',
+            table_name='orders',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
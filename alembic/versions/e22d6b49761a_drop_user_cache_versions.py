@@ -0,0 +1,23 @@
+"""drop per-user cache_versions rows
+
+Revision ID: e22d6b49761a
+Revises: b9da7b85fd73
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e22d6b49761a'
+down_revision = 'b9da7b85fd73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Темы user:<id> больше не пишутся и никем не читаются
+    op.execute("DELETE FROM cache_versions WHERE topic LIKE 'user:%'")
+
+
+def downgrade() -> None:
+    pass
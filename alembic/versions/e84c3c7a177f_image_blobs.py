@@ -0,0 +1,36 @@
+"""image_blobs for content-addressed image storage
+
+Revision ID: e84c3c7a177f
+Revises: 97d0db23cbb8
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'e84c3c7a177f'
+down_revision = '97d0db23cbb8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'image_blobs' not in inspector.get_table_names():
+        op.create_table(
+            'image_blobs',
+            sa.Column('digest', sa.String(length=64), nullable=False),
+            sa.Column('ext', sa.String(length=10), nullable=False),
+            sa.Column('size', sa.BigInteger(), nullable=False),
+            sa.Column('refcount', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('createdat', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('digest'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('image_blobs')
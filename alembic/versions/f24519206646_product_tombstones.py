@@ -0,0 +1,65 @@
+"""product tombstones and updated_at for catalog changes feed
+
+Revision ID: f24519206646
+Revises: 45f36c13bf1e
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'f24519206646'
+down_revision = '45f36c13bf1e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    # Надгробия удалённых товаров
+    if 'product_tombstones' not in inspector.get_table_names():
+        op.create_table(
+            'product_tombstones',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('code', sa.String(length=50), nullable=True),
+            sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_product_tombstones_deleted_at', 'product_tombstones', ['deleted_at'])
+
+    # updated_at должен быть заполнен у всех товаров, иначе они не попадут в ленту
+    columns = [c['name'] for c in inspector.get_columns('products')]
+    if 'updated_at' not in columns:
+        op.add_column('products', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.alter_column('products', 'updated_at', server_default=sa.text('now()'))
+    if 'created_at' in columns:
+        op.execute("UPDATE products SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL")
+    else:
+        op.execute("UPDATE products SET updated_at = now() WHERE updated_at IS NULL")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_products_updated_at',
+            'products',
+            ['updated_at'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_products_updated_at',
+            table_name='products',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.alter_column('products', 'updated_at', server_default=None)
+    op.drop_index('ix_product_tombstones_deleted_at', table_name='product_tombstones')
+    op.drop_table('product_tombstones')
@@ -0,0 +1,87 @@
+"""
+Корзина пользователя для отображения: строки, итоги и цены со скидкой
+одним запросом. Общая для API и бота.
+
+Цена строки - discounted_price(), та же, по которой считают заказ
+POST /api/orders и оформление в боте.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.models.cart import Cart
+from api.models.product import Product
+
+
+def discounted_price(product: Product) -> float:
+    """Цена за кг/шт с учётом скидки товара"""
+    price = product.priceperkg or 0
+    if product.is_discount and product.discount_percent:
+        price = price * (100 - product.discount_percent) / 100
+    return round(price, 2)
+
+
+@dataclass(frozen=True)
+class CartLine:
+    """Строка корзины"""
+    product_code: str
+    name: str
+    quantity: float
+    is_weighted: bool
+    base_price: float
+    price: float
+    discount_percent: int
+    line_total: float
+
+
+@dataclass(frozen=True)
+class CartView:
+    """Корзина целиком"""
+    user_id: int
+    lines: Tuple[CartLine, ...]
+    total: float
+
+    def get(self, product_code: str) -> Optional[CartLine]:
+        """Строка корзины по коду товара"""
+        for line in self.lines:
+            if line.product_code == product_code:
+                return line
+        return None
+
+    def quantity_of(self, product_code: str) -> float:
+        """Количество товара в корзине (0, если нет)"""
+        line = self.get(product_code)
+        return line.quantity if line else 0
+
+
+async def load_cart_view(session: AsyncSession, user_id: int) -> CartView:
+    """Собрать корзину одним запросом cart JOIN products"""
+    result = await session.execute(
+        select(Cart, Product)
+        .join(Product, Cart.productcode == Product.code)
+        .where(Cart.userid == user_id)
+        .order_by(Cart.id)
+    )
+
+    lines = []
+    for cart, product in result.all():
+        price = discounted_price(product)
+        lines.append(CartLine(
+            product_code=cart.productcode,
+            name=product.name,
+            quantity=cart.quantity,
+            is_weighted=bool(product.isweighted),
+            base_price=product.priceperkg or 0,
+            price=price,
+            discount_percent=(product.discount_percent or 0) if product.is_discount else 0,
+            line_total=round(price * cart.quantity, 2),
+        ))
+
+    return CartView(
+        user_id=user_id,
+        lines=tuple(lines),
+        total=round(sum(line.line_total for line in lines), 2),
+    )
@@ -0,0 +1,560 @@
+"""
+Снимок каталога в памяти процесса
+Товары и категории читаются из БД один раз, хранятся неизменяемыми
+и целиком подменяются после каждой записи в товары.
+
+Если БД недоступна, отдаётся последний удачный снимок (stale-on-error);
+снимок старше max_age отдаётся сразу и пересобирается в фоне
+(stale-while-revalidate). Старше max_stale прежний снимок не отдаём.
+Возраст снимка уходит клиентам в заголовке Age.
+
+С CATALOG_FILE снимок собирается из общего файла (api/catalog_file.py):
+в БД за каталогом ходит один процесс, готовое тело полного списка
+берётся из mmap и не копируется в память каждого воркера. Товары
+такого снимка тоже не копируются целиком: запись декодируется из mmap
+при первом обращении, последние DECODED_CACHE_SIZE декодированных
+держатся в снимке; товар по id и коду ищется по индексам файла.
+Ограничение устаревания то же, что у снимка из БД: max_age от сборки
+файла. Бот в этом режиме читает каталог из того же снимка.
+"""
+
+import asyncio
+import base64
+import bisect
+import hashlib
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.catalog_file import CatalogFile, MappedCatalog
+from api.change_seq import CATALOG_SEQ, stamp
+from api.config import settings
+from api.database import AsyncSessionLocal
+from api.http_cache import EncodedPayload, encode_payload
+from api.invalidation import CATALOG, invalidation_bus
+from api.singleflight import SingleFlight
+from api.models.category import Category
+from api.models.product import Product
+from api.models.product_tombstone import ProductTombstone
+from api.schemas.category import CategoryResponse
+from api.schemas.product import ProductResponse
+
+logger = logging.getLogger(__name__)
+
+_products_json = TypeAdapter(List[ProductResponse])
+
+# Сколько отфильтрованных выборок на снимок держать готовыми к отдаче
+MAX_CACHED_PAYLOADS = 64
+
+# limit по умолчанию у GET /api/products: тело этой выборки готовится при сборке
+FULL_LIST_LIMIT = 2000
+
+# Сколько декодированных записей файла каталога держать на снимок
+DECODED_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class CatalogItem:
+    """Товар снимка + поля, по которым фильтрует GET /api/products"""
+    product: ProductResponse
+    category: Optional[str]
+    in_stock: Optional[bool]
+
+    @property
+    def sort_key(self) -> tuple:
+        """Порядок каталога и ключ keyset-пагинации: (categoryid, name, id)"""
+        p = self.product
+        return (p.categoryid or 0, p.name, p.id)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога определённой версии"""
+    version: int
+    items: Sequence[CatalogItem]  # отсортированы по sort_key
+    keys: Sequence[tuple]
+    categories: Tuple[CategoryResponse, ...]
+    by_id: Mapping[int, CatalogItem]
+    by_code: Mapping[str, CatalogItem]
+    # Хэши содержимого: одинаковы во всех процессах для одних и тех же данных
+    products_digest: str
+    categories_digest: str
+    # Версия для GET /api/products/changes: всё с номером изменения не больше уже в снимке
+    sync_version: int
+    # Сериализованные и сжатые ответы по ключу выборки; живут столько же, сколько снимок
+    _payloads: Dict[tuple, "asyncio.Future[Tuple[EncodedPayload, Optional[str]]]"] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    def page(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        after: Optional[tuple] = None,
+    ) -> Tuple[List[ProductResponse], Optional[tuple]]:
+        """
+        Страница товаров с фильтрацией в памяти.
+        after - ключ последнего товара предыдущей страницы (keyset).
+        Возвращает товары и ключ для следующей страницы (None - страниц больше нет).
+        """
+        if limit is not None and limit <= 0:
+            return [], None
+        start = bisect.bisect_right(self.keys, after) if after is not None else 0
+        selected: List[CatalogItem] = []
+        skipped = 0
+
+        for item in itertools.islice(self.items, start, None):
+            if category and item.category != category:
+                continue
+            if in_stock is not None and item.in_stock != in_stock:
+                continue
+            if skipped < skip:
+                skipped += 1
+                continue
+            if limit is not None and len(selected) >= limit:
+                return [i.product for i in selected], selected[-1].sort_key
+            selected.append(item)
+
+        return [i.product for i in selected], None
+
+    def products(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[ProductResponse]:
+        """Товары с фильтрацией в памяти"""
+        return self.page(category, in_stock, skip, limit)[0]
+
+    def get(self, product_id: int) -> Optional[ProductResponse]:
+        """Товар по ID"""
+        item = self.by_id.get(product_id)
+        return item.product if item else None
+
+    def get_by_code(self, code: str) -> Optional[ProductResponse]:
+        """Товар по коду"""
+        item = self.by_code.get(code)
+        return item.product if item else None
+
+    def category_products(self, categoryid: int) -> List[ProductResponse]:
+        """Товары категории по имени: в порядке каталога это один участок items"""
+        start = bisect.bisect_left(self.keys, (categoryid,))
+        end = bisect.bisect_left(self.keys, (categoryid + 1,), lo=start)
+        return [item.product for item in self.items[start:end]]
+
+    async def products_payload(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        after: Optional[tuple] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[EncodedPayload, Optional[str]]:
+        """
+        Готовое JSON-тело выборки (raw/gzip/br) и курсор следующей страницы.
+        Сериализуется один раз на версию снимка; параллельные первые
+        запросы ждут одну задачу.
+        """
+        fields = tuple(sorted(fields)) if fields else None
+        key = (category or None, in_stock, skip, limit, after, fields)
+        future = self._payloads.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._render(self.page(category, in_stock, skip, limit, after), fields)
+            )
+            if len(self._payloads) < MAX_CACHED_PAYLOADS:
+                self._payloads[key] = future
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            self._payloads.pop(key, None)
+            raise
+
+    @staticmethod
+    async def _render(
+        page: Tuple[List[ProductResponse], Optional[tuple]],
+        fields: Optional[Tuple[str, ...]],
+    ) -> Tuple[EncodedPayload, Optional[str]]:
+        products, next_key = page
+        include = {"__all__": set(fields)} if fields else None
+        raw = _products_json.dump_json(products, include=include)
+        payload = await asyncio.to_thread(encode_payload, raw)
+        return payload, encode_cursor(next_key) if next_key is not None else None
+
+
+class CatalogStore:
+    """Держит текущий снимок каталога и атомарно подменяет его"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_age: float = 600,
+        max_stale: float = 24 * 3600,
+        retry_interval: float = 10,
+    ):
+        self._file = CatalogFile(path) if path else None
+        self.max_age = max_age
+        self.max_stale = max_stale
+        self.retry_interval = retry_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._versions = itertools.count(1)
+        self._flight = SingleFlight("catalog")
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+        self._mapped_version = 0
+        # Версия темы catalog для сверки файла: известная (из шины) или из БД
+        self._source_hint: Optional[int] = None
+        self._check_source = True
+        self._verified_at = 0.0   # monotonic: последняя удачная сборка
+        self._retry_at = 0.0      # после неудачи не чаще retry_interval
+        self._stale = False       # последняя пересборка не удалась
+        self._background: Optional[asyncio.Task] = None
+
+    @property
+    def version(self) -> int:
+        """Версия текущего снимка (0 - снимок ещё не собран)"""
+        return self._snapshot.version if self._snapshot else 0
+
+    @property
+    def age(self) -> int:
+        """Секунд с последней удачной сборки снимка (заголовок Age)"""
+        return int(time.monotonic() - self._verified_at) if self._snapshot else 0
+
+    async def get(self) -> CatalogSnapshot:
+        """Текущий снимок; в установившемся режиме БД не трогаем"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Холодный старт: одновременные запросы ждут одну сборку
+            return await self._flight.do("snapshot", self._swap)
+
+        now = time.monotonic()
+        age = now - self._verified_at
+        if age > self.max_stale:
+            # Слишком старый снимок не отдаём: ошибка БД дойдёт до клиента
+            return await self._flight.do("snapshot", self._swap)
+        if (self._stale or age > self.max_age) and now >= self._retry_at:
+            self._expect_source(invalidation_bus.version(CATALOG))
+            self._revalidate()
+        return snapshot
+
+    def add_listener(self, callback: Callable[[CatalogSnapshot], None]):
+        """Вызывать callback(снимок) после каждой замены снимка"""
+        self._listeners.append(callback)
+
+    async def refresh(self, source_version: Optional[int] = None) -> CatalogSnapshot:
+        """
+        Пересобрать снимок (вызывать после commit изменений товаров).
+        source_version - версия темы catalog из уведомления шины: файл
+        каталога сверяется с ней без запроса в БД.
+        """
+        self._expect_source(source_version)
+        try:
+            # Пачка refresh после серии записей - одна пересборка после них
+            return await self._flight.fresh("snapshot", self._swap)
+        except Exception as e:
+            if self._snapshot is None:
+                raise
+            # Запись уже в БД; снимок догонит её при следующей попытке
+            logger.error(f"Каталог не пересобран, отдаётся прежний снимок: {e}")
+            return self._snapshot
+
+    def _expect_source(self, source_version: Optional[int]):
+        """Хотя бы один вызов без версии - следующая сборка сверяется с БД"""
+        if source_version is None:
+            self._check_source = True
+        else:
+            self._source_hint = max(self._source_hint or 0, source_version)
+
+    def _take_source(self) -> Optional[int]:
+        required = None if self._check_source else self._source_hint
+        self._source_hint, self._check_source = None, False
+        return required
+
+    def _revalidate(self):
+        """Пересобрать снимок в фоне, не задерживая запрос"""
+        if self._background is None:
+            self._background = asyncio.ensure_future(self._flight.do("snapshot", self._swap))
+            self._background.add_done_callback(self._revalidated)
+
+    def _revalidated(self, task: asyncio.Task):
+        self._background = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Фоновая пересборка каталога не удалась: {task.exception()}")
+
+    async def _swap(self) -> CatalogSnapshot:
+        previous = self._snapshot
+        try:
+            snapshot, verified_at = await self._build()
+        except Exception:
+            self._stale = True
+            self._retry_at = time.monotonic() + self.retry_interval
+            raise
+        self._snapshot = snapshot
+        self._stale = False
+        self._verified_at = verified_at
+
+        if previous is not None and (
+            snapshot.products_digest != previous.products_digest
+            or snapshot.categories_digest != previous.categories_digest
+        ):
+            for callback in self._listeners:
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    logger.error(f"Ошибка подписчика каталога: {e}")
+        return snapshot
+
+    async def _build(self) -> Tuple[CatalogSnapshot, float]:
+        """Снимок и момент (monotonic), на который его данные прочитаны из БД"""
+        if self._file is not None:
+            mapped = await self._file.load(
+                self._build_for_file, max_age=self.max_age, required=self._take_source(),
+            )
+            # Возраст снимка - возраст файла: его мог собрать другой воркер
+            verified_at = time.monotonic() - max(0.0, time.time() - mapped.built_at)
+            if self._snapshot is not None and mapped.version == self._mapped_version:
+                return self._snapshot, verified_at  # файл не менялся - снимок актуален
+            snapshot = snapshot_from_file(next(self._versions), mapped)
+            self._mapped_version = mapped.version
+        else:
+            verified_at = time.monotonic()
+            snapshot = await self._build_from_db(next(self._versions))
+            # Полный список (то, что грузит miniapp) готовим сразу при сборке
+            await snapshot.products_payload(limit=FULL_LIST_LIMIT)
+        logger.info(
+            "📦 Снимок каталога v%s: %s товаров, %s категорий",
+            snapshot.version, len(snapshot.items), len(snapshot.categories),
+        )
+        return snapshot, verified_at
+
+    async def _build_from_db(self, version: int) -> CatalogSnapshot:
+        async with AsyncSessionLocal() as session:
+            # Номер читаем до товаров: всё, что не больше него, они уже содержат
+            sync_version = await stamp_catalog(session)
+            products = (
+                await session.execute(
+                    select(Product).order_by(Product.categoryid, Product.name, Product.id)
+                )
+            ).scalars().all()
+            categories = (
+                await session.execute(select(Category).order_by(Category.sort_order))
+            ).scalars().all()
+        return build_snapshot(version, products, categories, sync_version)
+
+    async def _build_for_file(self) -> Tuple[CatalogSnapshot, Tuple[EncodedPayload, Optional[str]]]:
+        snapshot = await self._build_from_db(0)
+        return snapshot, await snapshot.products_payload(limit=FULL_LIST_LIMIT)
+
+
+def build_snapshot(version: int, products, categories, sync_version: int = 0) -> CatalogSnapshot:
+    """Собрать снимок из строк ORM (или любых объектов с теми же атрибутами)"""
+    # Сортируем в Python: сравнение курсоров идёт в памяти, и порядок
+    # не должен зависеть от collation БД
+    items = tuple(sorted(
+        (
+            CatalogItem(
+                product=ProductResponse.model_validate(p),
+                category=p.category,
+                in_stock=p.in_stock,
+            )
+            for p in products
+        ),
+        key=lambda i: i.sort_key,
+    ))
+    category_models = tuple(CategoryResponse.model_validate(c) for c in categories)
+    return CatalogSnapshot(
+        version=version,
+        items=items,
+        keys=tuple(i.sort_key for i in items),
+        categories=category_models,
+        by_id=MappingProxyType({i.product.id: i for i in items}),
+        by_code=MappingProxyType({i.product.code: i for i in items if i.product.code}),
+        products_digest=_digest(
+            f"{i.category}|{i.in_stock}|{i.product.model_dump_json()}" for i in items
+        ),
+        categories_digest=_digest(c.model_dump_json() for c in category_models),
+        sync_version=sync_version,
+    )
+
+
+def item_from_record(record: Dict[str, Any]) -> CatalogItem:
+    return CatalogItem(
+        product=ProductResponse.model_validate(record["p"]),
+        category=record["c"],
+        in_stock=record["s"],
+    )
+
+
+class MappedItems(Sequence[CatalogItem]):
+    """Товары снимка из файла: запись декодируется при первом обращении"""
+
+    def __init__(self, mapped: MappedCatalog, cache_size: int = DECODED_CACHE_SIZE):
+        self._mapped = mapped
+        self._cache_size = cache_size
+        self._decoded: "OrderedDict[int, CatalogItem]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._mapped)
+
+    def _index(self, n: int) -> int:
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(n)
+        return n
+
+    def item(self, n: int) -> CatalogItem:
+        """Товар по номеру записи; последние декодированные - из памяти"""
+        item = self._decoded.get(n)
+        if item is not None:
+            self._decoded.move_to_end(n)
+            return item
+        item = item_from_record(self._mapped.record(n))
+        self._decoded[n] = item
+        if len(self._decoded) > self._cache_size:
+            self._decoded.popitem(last=False)
+        return item
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self.item(i) for i in range(*n.indices(len(self)))]
+        return self.item(self._index(n))
+
+
+class MappedKeys(Sequence[tuple]):
+    """Ключи sort_key записей файла (для bisect) - без сборки ProductResponse"""
+
+    def __init__(self, items: MappedItems):
+        self._items = items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self[i] for i in range(*n.indices(len(self)))]
+        n = self._items._index(n)
+        item = self._items._decoded.get(n)
+        if item is not None:
+            return item.sort_key
+        p = self._items._mapped.record(n)["p"]
+        return (p["categoryid"] or 0, p["name"], p["id"])
+
+
+class MappedById(Mapping[int, CatalogItem]):
+    """Товары снимка из файла по id - двоичный поиск по id_index файла"""
+
+    def __init__(self, items: MappedItems):
+        self._items = items
+
+    def __getitem__(self, product_id: int) -> CatalogItem:
+        n = self._items._mapped.find_id(product_id)
+        if n is None:
+            raise KeyError(product_id)
+        return self._items.item(n)
+
+    def __iter__(self) -> Iterator[int]:
+        return self._items._mapped.ids()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class MappedByCode(Mapping[str, CatalogItem]):
+    """Товары снимка из файла по коду - двоичный поиск по code_index файла"""
+
+    def __init__(self, items: MappedItems):
+        self._items = items
+
+    def __getitem__(self, code: str) -> CatalogItem:
+        n = self._items._mapped.find_code(code)
+        if n is None:
+            raise KeyError(code)
+        return self._items.item(n)
+
+    def __iter__(self) -> Iterator[str]:
+        return (item.product.code for item in self._items if item.product.code)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def snapshot_from_file(version: int, mapped: MappedCatalog) -> CatalogSnapshot:
+    """Снимок поверх файла каталога; записи в файле уже в порядке каталога"""
+    meta = mapped.meta
+    items = MappedItems(mapped)
+    snapshot = CatalogSnapshot(
+        version=version,
+        items=items,
+        keys=MappedKeys(items),
+        categories=tuple(CategoryResponse.model_validate(c) for c in mapped.categories()),
+        by_id=MappedById(items),
+        by_code=MappedByCode(items),
+        products_digest=meta["products_digest"],
+        categories_digest=meta["categories_digest"],
+        sync_version=meta["sync_version"],
+    )
+    # Тело полного списка - срезы mmap, общие для всех воркеров
+    future = asyncio.get_running_loop().create_future()
+    future.set_result((mapped.list_payload(), meta.get("list_next_cursor")))
+    snapshot._payloads[(None, None, 0, FULL_LIST_LIMIT, None, None)] = future
+    return snapshot
+
+
+async def refresh_catalog(topic: str):
+    """Обработчик шины инвалидации: каталог изменил другой процесс"""
+    await catalog.refresh(invalidation_bus.version(CATALOG))
+
+
+async def stamp_catalog(session: AsyncSession) -> int:
+    """Пронумеровать изменения товаров и удаления (commit); текущая версия ленты"""
+    return await stamp(session, CATALOG_SEQ, Product.changeseq, ProductTombstone.changeseq)
+
+
+def parse_since(since: str) -> int:
+    """?since= в версию ленты изменений (X-Catalog-Version или version ответа)"""
+    since = since.strip()
+    if not since.isdigit():
+        raise ValueError("since: ожидается версия каталога (целое число)")
+    return int(since)
+
+
+def encode_cursor(key: tuple) -> str:
+    """Непрозрачный курсор из ключа (categoryid, name, id)"""
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Ключ из курсора; ValueError, если курсор испорчен"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        categoryid, name, product_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Некорректный cursor") from e
+    if not isinstance(categoryid, int) or not isinstance(name, str) or not isinstance(product_id, int):
+        raise ValueError("Некорректный cursor")
+    return (categoryid, name, product_id)
+
+
+def _digest(chunks) -> str:
+    h = hashlib.sha256()
+    for chunk in chunks:
+        h.update(chunk.encode())
+        h.update(b"\n")
+    return h.hexdigest()[:20]
+
+
+catalog = CatalogStore(settings.catalog_file or None)
@@ -0,0 +1,307 @@
+"""
+Общий файл снимка каталога для нескольких воркеров API.
+
+Один процесс (тот, кто первым взял flock) читает каталог из БД и
+записывает компактный бинарный файл; остальные ждут блокировку и
+отображают готовый файл через mmap только для чтения. Файл заменяется
+атомарно (os.replace): уже открытые отображения продолжают видеть
+старую версию, пока их снимок жив.
+
+Раскладка (little-endian, struct):
+
+    заголовок   magic, version, source_version, число секций
+    секции      (offset, length) для каждого имени из SECTIONS
+    meta        JSON: дайджесты, sync_version, дайджест полного списка
+    records     JSON-записи товаров подряд, в порядке каталога
+    record_index (offset, length) записи по номеру
+    id_index    (id, номер записи), по возрастанию id
+    code_index  (смещение кода, длина, номер записи), по возрастанию кода
+    codes       байты кодов товаров
+    categories  JSON-список категорий
+    list_*      готовое тело GET /api/products (raw/gzip/br)
+
+source_version - версия темы catalog в cache_versions, из которой
+собран файл: по ней процессы понимают, что файл устарел. Записи без
+notify() тема не видит, поэтому файл старше max_age тоже пересобирается
+(время сборки - mtime файла).
+"""
+
+import asyncio
+import fcntl
+import json
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import select
+
+from api.database import AsyncSessionLocal
+from api.http_cache import EncodedPayload
+from api.invalidation import CATALOG
+from api.models.cache_version import CacheVersion
+
+MAGIC = b"CPCAT\x00\x01\x00"
+HEADER = struct.Struct("<8sQQI")
+SECTION = struct.Struct("<QQ")
+RECORD = struct.Struct("<QI")
+ID_ENTRY = struct.Struct("<qI")
+CODE_ENTRY = struct.Struct("<QHI")
+
+SECTIONS = (
+    "meta", "records", "record_index", "id_index", "code_index", "codes",
+    "categories", "list_raw", "list_gzip", "list_br",
+)
+
+
+def _json(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def encode_catalog(
+    version: int, source_version: int, snapshot, payload: EncodedPayload, next_cursor: Optional[str]
+) -> bytes:
+    """Байты файла из собранного CatalogSnapshot и готового тела полного списка"""
+    records = bytearray()
+    record_index = bytearray()
+    for item in snapshot.items:
+        raw = _json({
+            "p": item.product.model_dump(mode="json"),
+            "c": item.category,
+            "s": item.in_stock,
+        })
+        record_index += RECORD.pack(len(records), len(raw))
+        records += raw
+
+    id_index = b"".join(
+        ID_ENTRY.pack(item.product.id, n)
+        for n, item in sorted(enumerate(snapshot.items), key=lambda e: e[1].product.id)
+    )
+
+    codes = bytearray()
+    code_index = bytearray()
+    by_code = sorted(
+        ((item.product.code.encode(), n) for n, item in enumerate(snapshot.items) if item.product.code),
+    )
+    for code, n in by_code:
+        code_index += CODE_ENTRY.pack(len(codes), len(code), n)
+        codes += code
+
+    sections = {
+        "meta": _json({
+            "products_digest": snapshot.products_digest,
+            "categories_digest": snapshot.categories_digest,
+            "sync_version": snapshot.sync_version,
+            "list_digest": payload.digest,
+            "list_next_cursor": next_cursor,
+        }),
+        "records": bytes(records),
+        "record_index": bytes(record_index),
+        "id_index": id_index,
+        "code_index": bytes(code_index),
+        "codes": bytes(codes),
+        "categories": _json([c.model_dump(mode="json") for c in snapshot.categories]),
+        "list_raw": payload.raw,
+        "list_gzip": payload.gzip,
+        "list_br": payload.br or b"",
+    }
+
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    table = bytearray()
+    for name in SECTIONS:
+        table += SECTION.pack(offset, len(sections[name]))
+        offset += len(sections[name])
+    return b"".join(
+        [HEADER.pack(MAGIC, version, source_version, len(SECTIONS)), bytes(table)]
+        + [sections[name] for name in SECTIONS]
+    )
+
+
+class MappedCatalog:
+    """Файл каталога, отображённый в память только для чтения"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Время сборки (unix): файл пишется целиком и подменяется через os.replace
+            self.built_at = os.fstat(f.fileno()).st_mtime
+        magic, self.version, self.source_version, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or count != len(SECTIONS):
+            raise ValueError(f"{path}: не файл каталога или другая версия формата")
+
+        self._sections: Dict[str, memoryview] = {}
+        view = memoryview(self._mm)
+        for n, name in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(self._mm, HEADER.size + n * SECTION.size)
+            self._sections[name] = view[offset:offset + length]
+        self.meta: Dict[str, Any] = json.loads(bytes(self._sections["meta"]))
+
+    def __len__(self) -> int:
+        return len(self._sections["record_index"]) // RECORD.size
+
+    def record(self, n: int) -> Dict[str, Any]:
+        """Запись товара по номеру (в порядке каталога)"""
+        offset, length = RECORD.unpack_from(self._sections["record_index"], n * RECORD.size)
+        return json.loads(bytes(self._sections["records"][offset:offset + length]))
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for n in range(len(self)):
+            yield self.record(n)
+
+    def find_id(self, product_id: int) -> Optional[int]:
+        """Номер записи товара по id (двоичный поиск по id_index)"""
+        index = self._sections["id_index"]
+        lo, hi = 0, len(index) // ID_ENTRY.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key, n = ID_ENTRY.unpack_from(index, mid * ID_ENTRY.size)
+            if key == product_id:
+                return n
+            if key < product_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def find_code(self, code: str) -> Optional[int]:
+        """Номер записи товара по коду (двоичный поиск по code_index)"""
+        index, codes = self._sections["code_index"], self._sections["codes"]
+        target = code.encode()
+        lo, hi = 0, len(index) // CODE_ENTRY.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length, n = CODE_ENTRY.unpack_from(index, mid * CODE_ENTRY.size)
+            key = bytes(codes[offset:offset + length])
+            if key == target:
+                return n
+            if key < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def ids(self) -> Iterator[int]:
+        """id товаров по возрастанию"""
+        for product_id, _ in ID_ENTRY.iter_unpack(self._sections["id_index"]):
+            yield product_id
+
+    def by_id(self, product_id: int) -> Optional[Dict[str, Any]]:
+        n = self.find_id(product_id)
+        return self.record(n) if n is not None else None
+
+    def by_code(self, code: str) -> Optional[Dict[str, Any]]:
+        n = self.find_code(code)
+        return self.record(n) if n is not None else None
+
+    def categories(self) -> List[Dict[str, Any]]:
+        return json.loads(bytes(self._sections["categories"]))
+
+    def list_payload(self) -> EncodedPayload:
+        """Готовое тело полного списка товаров - срезы отображения, без копии в памяти процесса"""
+        br = self._sections["list_br"]
+        return EncodedPayload(
+            raw=self._sections["list_raw"],
+            gzip=self._sections["list_gzip"],
+            br=br if len(br) else None,
+            digest=self.meta["list_digest"],
+        )
+
+
+def read_header(path: str) -> Optional[tuple]:
+    """(version, source_version) файла; None - файла нет или он чужой"""
+    try:
+        with open(path, "rb") as f:
+            magic, version, source_version, _ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return (version, source_version) if magic == MAGIC else None
+
+
+async def catalog_source_version() -> int:
+    """Текущая версия темы catalog в БД"""
+    async with AsyncSessionLocal() as session:
+        version = await session.scalar(
+            select(CacheVersion.version).where(CacheVersion.topic == CATALOG)
+        )
+    return version or 0
+
+
+@dataclass
+class CatalogFile:
+    """Файл каталога: сборка под flock одним процессом, чтение через mmap"""
+    path: str
+
+    def _fresh(self, header: Optional[tuple], required: int, max_age: Optional[float]) -> bool:
+        if header is None or header[1] < required:
+            return False
+        if max_age is None:
+            return True
+        try:
+            return time.time() - os.path.getmtime(self.path) <= max_age
+        except OSError:
+            return False
+
+    async def load(
+        self, build, force: bool = False, max_age: Optional[float] = None,
+        required: Optional[int] = None,
+    ) -> MappedCatalog:
+        """
+        Отобразить актуальный файл. Если его нет, source_version
+        отстаёт от БД или файл собран больше max_age секунд назад -
+        собрать: build() возвращает снимок и (тело полного списка,
+        курсор следующей страницы).
+        required - версия темы catalog, если она уже известна (шина
+        инвалидации); None - прочитать из БД.
+        Пересобирает тот, кто первым взял блокировку; остальные ждут
+        её и берут уже готовый файл.
+        """
+        if required is None:
+            required = await catalog_source_version()
+        if not force and self._fresh(read_header(self.path), required, max_age):
+            return MappedCatalog(self.path)
+
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+            header = read_header(self.path)
+            if force or not self._fresh(header, required, max_age):
+                # Версию темы читаем до выборки каталога: запись после неё
+                # снова сделает файл устаревшим, а не потеряется
+                source_version = await catalog_source_version()
+                snapshot, (payload, next_cursor) = await build()
+                version = header[0] + 1 if header else 1
+                data = encode_catalog(version, source_version, snapshot, payload, next_cursor)
+                await asyncio.to_thread(self._write, data)
+            return MappedCatalog(self.path)
+        finally:
+            os.close(fd)  # закрытие снимает flock
+
+    def _write(self, data: bytes):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+async def _main(argv: List[str]):
+    """python -m api.catalog_file [--rebuild] [id|code ...]"""
+    from api.catalog import CatalogStore
+    from api.config import settings
+
+    if not settings.catalog_file:
+        raise SystemExit("CATALOG_FILE не задан")
+    store = CatalogStore(settings.catalog_file)
+    mapped = await CatalogFile(settings.catalog_file).load(store._build_for_file, force="--rebuild" in argv)
+    print(f"{settings.catalog_file}: v{mapped.version}, source {mapped.source_version}, "
+          f"{len(mapped)} товаров, {os.path.getsize(settings.catalog_file)} байт")
+    for key in (a for a in argv if not a.startswith("--")):
+        print(key, mapped.by_id(int(key)) if key.isdigit() else mapped.by_code(key))
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(_main(sys.argv[1:]))
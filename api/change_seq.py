@@ -0,0 +1,89 @@
+"""
+Номера изменений в порядке commit - курсоры лент для клиентов
+(GET /api/products/changes, журнал событий заказов).
+
+id из sequence и now() выдаются при INSERT/UPDATE, а не при commit:
+транзакция с меньшим номером может закоммититься позже большей, и
+клиент с курсором "больше N" её уже не увидит. Поэтому строки пишутся
+без номера (NULL), а номер им ставит stamp() уже после commit - под
+транзакционной advisory-блокировкой PostgreSQL, одна пачка за раз.
+Пачка видна целиком после commit, так что всё с номером не больше
+значения счётчика уже видно читателю, а всё новое получит номер больше.
+В SQLite писатель и так один на всю БД.
+
+Номера берутся из строки change_counters, а не из max() по таблице:
+строка с наибольшим номером могла измениться (номер сброшен в NULL)
+или удалиться, и тот же номер выдался бы повторно - клиент, уже
+видевший его, изменение пропустил бы.
+"""
+
+from typing import Dict
+
+from sqlalchemy import Column, bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.models.change_counter import ChangeCounter
+
+CATALOG_SEQ = "catalog"
+ORDER_EVENTS_SEQ = "order_events"
+
+# Ключи pg_advisory_xact_lock: своя блокировка на каждый счётчик
+LOCKS = {
+    CATALOG_SEQ: 0x63686566_0001,
+    ORDER_EVENTS_SEQ: 0x63686566_0002,
+}
+
+
+async def last_seq(session: AsyncSession, *columns: Column) -> int:
+    """Наибольший номер в columns (начальное значение нового счётчика)"""
+    last = 0
+    for column in columns:
+        last = max(last, (await session.execute(select(func.max(column)))).scalar() or 0)
+    return last
+
+
+async def _counter(session: AsyncSession, name: str, *columns: Column) -> int:
+    """Текущее значение счётчика; нет строки - создать от max() по columns"""
+    value = await session.scalar(select(ChangeCounter.value).where(ChangeCounter.name == name))
+    if value is None:
+        value = await last_seq(session, *columns)
+        session.add(ChangeCounter(name=name, value=value))
+        await session.flush()
+    return value
+
+
+async def stamp(session: AsyncSession, counter: str, *columns: Column) -> int:
+    """
+    Пронумеровать закоммиченные строки с NULL в columns (один счётчик
+    на все, внутри таблицы - по возрастанию id). Делает commit;
+    возвращает значение счётчика после нумерации.
+    """
+    if session.bind.dialect.name == "postgresql":
+        await session.execute(select(func.pg_advisory_xact_lock(LOCKS[counter])))
+    last = start = await _counter(session, counter, *columns)
+
+    for column in columns:
+        table = column.table
+        pk = table.c.id
+        # Строки, которые сейчас меняет другая транзакция, пропускаем:
+        # после её commit номер снова будет NULL - пронумеруем в следующий раз
+        ids = (await session.execute(
+            select(pk).where(column.is_(None)).order_by(pk).with_for_update(skip_locked=True)
+        )).scalars().all()
+        if not ids:
+            continue
+        values: Dict[str, object] = {column.key: bindparam("_seq")}
+        # onupdate других колонок (updated_at) нумерация не трогает
+        values.update({c.key: c for c in table.c if c.onupdate is not None and c.key != column.key})
+        await session.execute(
+            update(table).where(pk == bindparam("_id")).values(values),
+            [{"_id": row_id, "_seq": last + n} for n, row_id in enumerate(ids, 1)],
+        )
+        last += len(ids)
+
+    if last != start:
+        await session.execute(
+            update(ChangeCounter).where(ChangeCounter.name == counter).values(value=last)
+        )
+    await session.commit()
+    return last
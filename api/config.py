@@ -8,11 +8,23 @@ class Settings(BaseSettings):
     
     # Telegram Bot
     bot_token: str
+    # Webhook: пустой webhook_url - бот работает отдельно через polling
+    webhook_url: str = ""               # https://example.com (без пути)
+    webhook_path: str = "/telegram/webhook"
+    webhook_secret: str = ""            # X-Telegram-Bot-Api-Secret-Token
+    telegram_api_url: str = ""          # свой Bot API сервер или локальная заглушка
     
     # FastAPI
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     secret_key: str
+    # Общий файл снимка каталога для воркеров (пусто - снимок у каждого из БД)
+    catalog_file: str = ""
+    # Дисковый кэш картинок произвольного размера (пусто - ./image_cache)
+    image_cache_dir: str = ""
+    image_cache_max_mb: int = 512
+    # Предел размера загружаемой картинки
+    upload_max_mb: int = 15
     
     # ЮКасса
     yookassa_shop_id: str = ""
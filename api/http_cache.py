@@ -0,0 +1,142 @@
+"""
+Условные HTTP-ответы (ETag / If-None-Match), политики Cache-Control
+и заранее сжатые тела ответов
+"""
+
+import gzip
+import hashlib
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli не обязателен: без него отдаём gzip
+    brotli = None
+
+# Клиент кэширует ответ, но перед каждым использованием сверяет ETag:
+# повторный запуск miniapp стоит один 304 без тела.
+REVALIDATE = "public, no-cache"
+
+
+def make_etag(kind: str, digest: str) -> str:
+    """Сильный ETag вида "kind-digest" """
+    return f'"{kind}-{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с If-None-Match (слабое сравнение, RFC 9110 13.1.2)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str = REVALIDATE) -> Response:
+    """Ответ 304 без тела"""
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
+
+
+def cache_headers(etag: str, cache_control: str = REVALIDATE) -> dict:
+    """Заголовки кэширования для ответа 200/304"""
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def conditional(
+    request: Request,
+    response: Response,
+    etag: str,
+    cache_control: str = REVALIDATE,
+) -> Optional[Response]:
+    """
+    Проставить заголовки кэширования; вернуть готовый 304,
+    если у клиента актуальная копия.
+    """
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+
+    response.headers.update(cache_headers(etag, cache_control))
+    return None
+
+
+# bytes или срез mmap общего файла каталога (api/catalog_file.py)
+Body = Union[bytes, memoryview]
+
+
+@dataclass(frozen=True)
+class EncodedPayload:
+    """JSON-тело, один раз сериализованное и сжатое во все кодировки"""
+    raw: Body
+    gzip: Body
+    br: Optional[Body]
+    digest: str
+
+
+def encode_payload(raw: bytes) -> EncodedPayload:
+    """Сжать тело (CPU-bound: вызывать через asyncio.to_thread)"""
+    return EncodedPayload(
+        raw=raw,
+        gzip=gzip.compress(raw, compresslevel=9, mtime=0),
+        br=brotli.compress(raw, quality=11) if brotli else None,
+        digest=hashlib.sha256(raw).hexdigest()[:20],
+    )
+
+
+def accepted_encodings(request: Request) -> set:
+    """Кодировки из Accept-Encoding с q > 0"""
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.lower())
+    return accepted
+
+
+def payload_response(
+    request: Request,
+    payload: EncodedPayload,
+    kind: str,
+    cache_control: str = REVALIDATE,
+    headers: Optional[dict] = None,
+) -> Response:
+    """
+    Готовый Response из EncodedPayload: вариант по Accept-Encoding,
+    свой сильный ETag у каждой кодировки, 304 при совпадении.
+    """
+    accepted = accepted_encodings(request)
+    if payload.br is not None and "br" in accepted:
+        body, encoding = payload.br, "br"
+    elif "gzip" in accepted:
+        body, encoding = payload.gzip, "gzip"
+    else:
+        body, encoding = payload.raw, None
+
+    etag = make_etag(kind, payload.digest + (f"-{encoding}" if encoding else ""))
+    response_headers = dict(headers or {})
+    response_headers.update(cache_headers(etag, cache_control))
+    response_headers["Vary"] = "Accept-Encoding"
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=response_headers)
+
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+    # bytes(bytes) не копирует; срез mmap копируется только на время ответа
+    return Response(content=bytes(body), media_type="application/json", headers=response_headers)
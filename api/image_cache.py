@@ -0,0 +1,111 @@
+"""
+Дисковый кэш картинок произвольного размера (GET /images/products/<имя>?w=&h=)
+с ограничением объёма и вытеснением давно не запрошенных файлов.
+
+Каталог общий для всех воркеров. Давность использования - mtime
+файла: попадание обновляет его (не чаще touch_interval), вытеснение
+удаляет самые старые. Объём каждый процесс считает сам по своим
+записям и при превышении пересчитывает его обходом каталога, так что
+чужие записи учитываются не позже следующей чистки.
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from api.config import settings
+from api.images import BASE_DIR
+
+
+class DiskLRU:
+    """Каталог файлов с вытеснением по mtime до low_water * max_bytes"""
+
+    def __init__(self, directory: str, max_bytes: int, low_water: float = 0.9, touch_interval: float = 60.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.touch_interval = touch_interval
+        self._total: Optional[int] = None  # None - ещё не считали
+        self._evicting = False
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "bytes": self._total or 0,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
+
+    def path(self, key: str, ext: str) -> str:
+        # Подкаталоги по первым символам ключа: тысячи файлов не в одной папке
+        return os.path.join(self.directory, key[:2], key + ext)
+
+    def hit(self, path: str) -> bool:
+        """Файл есть в кэше (и отмечен как использованный)"""
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        if time.time() - mtime > self.touch_interval:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass  # вытеснен другим воркером - отдаст ошибку, клиент повторит
+        return True
+
+    async def added(self, size: int):
+        """Учесть записанный файл; при переполнении - вытеснить старые"""
+        if self._total is None:
+            self._total = await asyncio.to_thread(self._size)
+        else:
+            self._total += size
+        if self._total > self.max_bytes and not self._evicting:
+            self._evicting = True
+            try:
+                await asyncio.to_thread(self.evict)
+            finally:
+                self._evicting = False
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def evict(self):
+        """Удалять самые давно использованные файлы, пока объём выше low_water"""
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * self.low_water
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evicted += 1
+        self._total = total
+
+
+image_cache = DiskLRU(
+    settings.image_cache_dir or os.path.join(BASE_DIR, "image_cache"),
+    settings.image_cache_max_mb * 2**20,
+)
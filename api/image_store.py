@@ -0,0 +1,286 @@
+"""
+Хранилище картинок товаров и категорий по содержимому.
+
+Имя файла - SHA-256 байтов: images/products/<sha256><ext> (расширение
+по содержимому, см. api.upload_stream). Повторная загрузка той же
+фотографии (карточки "100 гр" / "200 гр") не создаёт второй файл и не
+кодирует копии заново, а URL никогда не меняет содержимое - его можно
+кэшировать навсегда.
+
+image_blobs.refcount - сколько товаров и категорий ссылаются на файл.
+Роуты товаров ведут его в своей транзакции (retain/release), сборщик
+мусора (python -m api.image_store gc) сначала пересчитывает его по БД,
+затем удаляет файлы без ссылок старше grace: между загрузкой и
+сохранением товара ссылки ещё нет.
+
+Пересчёт и смена ссылок берут строки image_blobs FOR UPDATE (по порядку
+digest) до того, как читать или менять товары: сохранение товара ждёт
+конца сборки, или сборка ждёт его commit. Иначе пересчёт, прочитавший
+товары до commit сохранения, записал бы refcount = 0 поверх его
+увеличения и удалил файл, на который товар уже ссылается.
+"""
+
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database import AsyncSessionLocal
+from api.images import (
+    FORMATS, IMAGES_URL, PRODUCT_IMAGES_DIR, VARIANTS, VARIANTS_DIR,
+    canonical_url, generate_variants, variant_name, variants_for_url,
+)
+from api.models.category import Category
+from api.models.image_blob import ImageBlob
+from api.models.product import Product
+from api.upload_stream import ReceivedUpload
+
+HASHED_NAME = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]+)$")
+HASHED_VARIANT = re.compile(r"^[0-9a-f]{64}-")
+BLOBS_URL = IMAGES_URL + "products/"
+
+
+@dataclass
+class StoredImage:
+    digest: str
+    url: str
+    variants: Optional[Dict[str, Dict[str, str]]]
+    created: bool  # False - такой файл уже был
+
+
+def blob_url(digest: str, ext: str) -> str:
+    return f"{BLOBS_URL}{digest}{ext}"
+
+
+def blob_path(digest: str, ext: str) -> str:
+    return os.path.join(PRODUCT_IMAGES_DIR, digest + ext)
+
+
+def digest_of(image_url: Optional[str]) -> Optional[str]:
+    """SHA-256 из URL хранилища; None - картинка не из хранилища"""
+    image_url = canonical_url(image_url)
+    if not image_url or not image_url.startswith(BLOBS_URL):
+        return None
+    match = HASHED_NAME.match(image_url[len(BLOBS_URL):])
+    return match.group(1) if match else None
+
+
+def is_blob_variant(name: str) -> bool:
+    """Имя файла в variants/ - копия картинки из хранилища"""
+    return HASHED_VARIANT.match(name) is not None
+
+
+def _insert(session: AsyncSession):
+    if session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(ImageBlob)
+
+
+async def store_image(db: AsyncSession, upload: ReceivedUpload) -> StoredImage:
+    """
+    Перенести принятую загрузку (receive_upload: хэш уже посчитан по
+    ходу приёма) в хранилище и сделать уменьшенные копии, если их ещё
+    нет. ValueError - файл не картинка. Делает commit.
+    """
+    digest, ext, size = upload.digest, upload.ext, upload.size
+    path = blob_path(digest, ext)
+    created = not os.path.exists(path)
+    # Заменяем и существующий файл (байты те же): его мог удалить сборщик мусора
+    os.replace(upload.path, path)
+
+    url = blob_url(digest, ext)
+    variants = None if created else variants_for_url(url)
+    if variants is None:
+        try:
+            variants = await generate_variants(path, url)
+        except ValueError:
+            if created:
+                os.remove(path)
+            raise
+
+    # Повторная загрузка продлевает срок до сборки мусора
+    stmt = _insert(db).values(digest=digest, ext=ext, size=size, refcount=0)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[ImageBlob.digest],
+        set_={"createdat": datetime.now(timezone.utc)},
+    ))
+    await db.commit()
+    return StoredImage(digest=digest, url=url, variants=variants, created=created)
+
+
+async def lock_blobs(session: AsyncSession, digests: Optional[Iterable[str]] = None) -> Set[str]:
+    """
+    SELECT ... FOR UPDATE строк картинок (None - всех) в транзакции
+    вызывающего; вернуть найденные digest. Несохранённые изменения
+    сессии (товар с новым image_url) до блокировки в БД не уходят.
+    """
+    query = select(ImageBlob.digest).order_by(ImageBlob.digest).with_for_update()
+    if digests is not None:
+        digests = set(digests)
+        if not digests:
+            return set()
+        query = query.where(ImageBlob.digest.in_(digests))
+    with session.no_autoflush:
+        return set((await session.execute(query)).scalars())
+
+
+async def _update_refcount(session: AsyncSession, digest: str, delta: int):
+    refcount = ImageBlob.refcount + delta
+    await session.execute(
+        update(ImageBlob)
+        .where(ImageBlob.digest == digest)
+        .values(refcount=case((refcount < 0, 0), else_=refcount))
+    )
+
+
+async def _add_ref(session: AsyncSession, image_url: Optional[str], delta: int):
+    digest = digest_of(image_url)
+    if digest is not None:
+        await lock_blobs(session, [digest])
+        await _update_refcount(session, digest, delta)
+
+
+async def retain(session: AsyncSession, image_url: Optional[str]):
+    """Ещё одна ссылка на картинку (в транзакции вызывающего)"""
+    await _add_ref(session, image_url, 1)
+
+
+async def release(session: AsyncSession, image_url: Optional[str]):
+    """Ссылка на картинку убрана (в транзакции вызывающего)"""
+    await _add_ref(session, image_url, -1)
+
+
+async def rebind(session: AsyncSession, old_url: Optional[str], new_url: Optional[str]):
+    """
+    Товар сменил картинку (в транзакции вызывающего). ValueError - новой
+    картинки уже нет в хранилище (удалил сборщик мусора).
+    """
+    old, new = digest_of(old_url), digest_of(new_url)
+    if old == new:
+        return
+    # Обе строки - одним запросом в порядке digest, как у сборщика
+    found = await lock_blobs(session, [d for d in (old, new) if d is not None])
+    if new is not None and new not in found:
+        raise ValueError("Картинка не найдена в хранилище, загрузите её заново")
+    if old is not None:
+        await _update_refcount(session, old, -1)
+    if new is not None:
+        await _update_refcount(session, new, 1)
+
+
+# ----- сборка мусора -----
+
+async def recount(session: AsyncSession) -> int:
+    """Пересчитать refcount по товарам и категориям; число исправленных строк"""
+    # Блокировка до чтения товаров: смена ссылок ждёт commit пересчёта
+    await lock_blobs(session)
+    urls = (await session.execute(
+        select(Product.image_url).where(Product.image_url.isnot(None))
+        .union_all(select(Category.image_url).where(Category.image_url.isnot(None)))
+    )).scalars()
+    counts = Counter(digest_of(url) for url in urls)
+    blobs = (await session.execute(select(ImageBlob.digest, ImageBlob.refcount))).all()
+    changes = [
+        {"digest": digest, "refcount": counts.get(digest, 0)}
+        for digest, refcount in blobs if refcount != counts.get(digest, 0)
+    ]
+    if changes:
+        await session.execute(update(ImageBlob), changes)
+    return len(changes)
+
+
+def blob_files(digest: str, ext: str) -> List[str]:
+    """Оригинал и его копии"""
+    variants_dir = os.path.join(PRODUCT_IMAGES_DIR, VARIANTS_DIR)
+    return [blob_path(digest, ext)] + [
+        os.path.join(variants_dir, variant_name(digest, variant, fmt))
+        for variant in VARIANTS for fmt in FORMATS
+    ]
+
+
+def _remove(paths: List[str]) -> int:
+    freed = 0
+    for path in paths:
+        try:
+            freed += os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return freed
+
+
+async def collect_garbage(grace: timedelta = timedelta(hours=24), dry_run: bool = False) -> Dict[str, int]:
+    """Удалить картинки без ссылок, загруженные раньше чем grace назад"""
+    cutoff = datetime.now(timezone.utc) - grace
+    unreferenced = (ImageBlob.refcount == 0) & (ImageBlob.createdat < cutoff)
+    async with AsyncSessionLocal() as session:
+        fixed = await recount(session)
+        if dry_run:
+            doomed = (await session.execute(
+                select(ImageBlob.digest, ImageBlob.ext).where(unreferenced)
+            )).all()
+            await session.rollback()
+        else:
+            doomed = (await session.execute(
+                delete(ImageBlob).where(unreferenced).returning(ImageBlob.digest, ImageBlob.ext)
+            )).all()
+            await session.commit()
+        known = set((await session.execute(select(ImageBlob.digest))).scalars())
+
+    freed = 0
+    if not dry_run:
+        for digest, ext in doomed:
+            # Ту же картинку могли загрузить заново, пока шло удаление
+            if digest not in known:
+                freed += _remove(blob_files(digest, ext))
+
+    # Файлы без строки (запись в БД не прошла после сохранения файла)
+    orphans: List[Tuple[str, str]] = []
+    skip = known | {digest for digest, _ in doomed}
+    for name in os.listdir(PRODUCT_IMAGES_DIR):
+        match = HASHED_NAME.match(name)
+        if match and match.group(1) not in skip:
+            mtime = datetime.fromtimestamp(os.path.getmtime(os.path.join(PRODUCT_IMAGES_DIR, name)), timezone.utc)
+            if mtime < cutoff:
+                orphans.append((match.group(1), match.group(2)))
+    if not dry_run:
+        for digest, ext in orphans:
+            freed += _remove(blob_files(digest, ext))
+
+    return {"recounted": fixed, "deleted": len(doomed), "orphans": len(orphans), "freed_bytes": freed}
+
+
+async def _main(argv: List[str]):
+    """python -m api.image_store gc [--grace-hours 24] [--dry-run] | stats"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m api.image_store")
+    parser.add_argument("command", choices=("gc", "stats"))
+    parser.add_argument("--grace-hours", type=float, default=24)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "gc":
+        result = await collect_garbage(timedelta(hours=args.grace_hours), args.dry_run)
+        print(("[dry-run] " if args.dry_run else "") + ", ".join(f"{k}: {v}" for k, v in result.items()))
+        return
+
+    async with AsyncSessionLocal() as session:
+        blobs = (await session.execute(select(ImageBlob.refcount, ImageBlob.size))).all()
+    shared = [b for b in blobs if b.refcount > 1]
+    print(f"Картинок: {len(blobs)}, {sum(b.size for b in blobs) / 2**20:.1f} МБ; "
+          f"без ссылок: {sum(1 for b in blobs if b.refcount == 0)}; "
+          f"общих: {len(shared)} (дубликатов не сохранено: {sum(b.refcount - 1 for b in shared)})")
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,216 @@
+"""
+Производные изображений товаров: уменьшенные копии фиксированных
+размеров в WebP и JPEG (запасной вариант для старых клиентов).
+
+Оригинал поворачивается по EXIF Orientation, метаданные (EXIF, GPS,
+ICC) в копии не попадают. Кодирование - CPU-bound, поэтому идёт в
+пуле процессов, а не в цикле событий.
+
+Раскладка: оригинал images/<каталог>/<имя>.<ext>,
+копии images/<каталог>/variants/<имя>-<вариант>.<webp|jpg>.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+# Вариант -> максимальная сторона, px (меньшие картинки не увеличиваем)
+VARIANTS = {
+    "thumb": 240,   # карточка в списке
+    "card": 640,    # карточка товара
+    "full": 1280,   # просмотр
+}
+
+# Формат -> (формат Pillow, расширение, параметры сохранения)
+FORMATS = {
+    "webp": ("WEBP", ".webp", {"quality": 80, "method": 6}),
+    "jpeg": ("JPEG", ".jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+VARIANTS_DIR = "variants"
+
+IMAGES_URL = "/images/"
+# Старые скрипты записывали пути через монтирование /web
+LEGACY_IMAGES_URL = "/web/images/"
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES_DIR = os.path.join(BASE_DIR, "web", "images")
+PRODUCT_IMAGES_DIR = os.path.join(IMAGES_DIR, "products")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def variant_name(stem: str, variant: str, fmt: str) -> str:
+    return f"{stem}-{variant}{FORMATS[fmt][1]}"
+
+
+def _open(src_path: str):
+    """Оригинал, повёрнутый по EXIF, в RGB/RGBA; ValueError - не картинка"""
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(src_path) as original:
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except FileNotFoundError:
+        raise
+    # Обрезанный или битый файл Pillow сообщает OSError/SyntaxError
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f"{os.path.basename(src_path)}: {e}") from None
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def _save(image, path: str, fmt: str):
+    """Атомарная запись без метаданных"""
+    from PIL import Image
+
+    pil_format, _, options = FORMATS[fmt]
+    if fmt == "jpeg" and image.mode == "RGBA":
+        # В JPEG нет прозрачности: кладём на белый фон
+        flat = Image.new("RGB", image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel("A"))
+        image = flat
+    tmp = f"{path}.{os.getpid()}.tmp"
+    # Без exif=/icc_profile= Pillow метаданные не пишет
+    image.save(tmp, pil_format, **options)
+    os.replace(tmp, path)
+
+
+def render_variants(src_path: str) -> Dict[str, Dict[str, str]]:
+    """
+    Записать все копии оригинала (выполняется в процессе пула).
+    Возвращает {вариант: {формат: имя файла в variants/}}.
+    ValueError - файл не картинка или слишком большая.
+    """
+    from PIL import Image
+
+    stem = os.path.splitext(os.path.basename(src_path))[0]
+    out_dir = os.path.join(os.path.dirname(src_path), VARIANTS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    image = _open(src_path)
+
+    result: Dict[str, Dict[str, str]] = {}
+    for variant, size in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        result[variant] = {}
+        for fmt in FORMATS:
+            name = variant_name(stem, variant, fmt)
+            _save(resized, os.path.join(out_dir, name), fmt)
+            result[variant][fmt] = name
+    return result
+
+
+def render_resized(src_path: str, dest_path: str, width: Optional[int], height: Optional[int], fmt: str):
+    """
+    Копия произвольного размера (выполняется в процессе пула).
+    Задана одна сторона - вписываем с сохранением пропорций, обе -
+    заполняем рамку с обрезкой по центру (как object-fit: cover).
+    Больше оригинала не увеличиваем.
+    """
+    from PIL import Image, ImageOps
+
+    image = _open(src_path)
+    if width and height:
+        scale = min(1.0, image.width / width, image.height / height)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        image.thumbnail((width or image.width, height or image.height), Image.LANCZOS)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    _save(image, dest_path, fmt)
+    return os.path.getsize(dest_path)
+
+
+def variant_urls(image_url: str, names: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+    base = image_url.rsplit("/", 1)[0] + f"/{VARIANTS_DIR}/"
+    return {variant: {fmt: base + name for fmt, name in formats.items()} for variant, formats in names.items()}
+
+
+def canonical_url(image_url: Optional[str]) -> Optional[str]:
+    """/web/images/... -> /images/...; прочие URL без изменений"""
+    if image_url and image_url.startswith(LEGACY_IMAGES_URL):
+        return IMAGES_URL + image_url[len(LEGACY_IMAGES_URL):]
+    return image_url
+
+
+def image_path(image_url: Optional[str], images_dir: str = IMAGES_DIR) -> Optional[str]:
+    """Файл оригинала для URL картинки; None - URL внешний или это сама копия"""
+    image_url = canonical_url(image_url)
+    if not image_url or not image_url.startswith(IMAGES_URL):
+        return None
+    parts = image_url[len(IMAGES_URL):].split("/")
+    if any(part in ("", ".", "..") for part in parts) or VARIANTS_DIR in parts[:-1]:
+        return None
+    return os.path.join(images_dir, *parts)
+
+
+def variants_for_url(
+    image_url: Optional[str], images_dir: str = IMAGES_DIR
+) -> Optional[Dict[str, Dict[str, str]]]:
+    """URL готовых копий картинки из /images/; None - копий нет"""
+    path = image_path(image_url, images_dir)
+    if path is None:
+        return None
+    stem = os.path.splitext(os.path.basename(path))[0]
+
+    names = {
+        variant: {fmt: variant_name(stem, variant, fmt) for fmt in FORMATS}
+        for variant in VARIANTS
+    }
+    out_dir = os.path.join(os.path.dirname(path), VARIANTS_DIR)
+    for formats in names.values():
+        for name in formats.values():
+            if not os.path.exists(os.path.join(out_dir, name)):
+                return None
+    return variant_urls(canonical_url(image_url), names)
+
+
+def dump_variants(variants: Optional[Dict[str, Dict[str, str]]]) -> Optional[str]:
+    """Значение колонки products.image_variants"""
+    return json.dumps(variants, separators=(",", ":")) if variants else None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: не наследуем от uvicorn открытые сокеты и соединения с БД
+        _pool = ProcessPoolExecutor(
+            max_workers=min(4, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def run_in_pool(fn, *args):
+    """Выполнить fn(*args) в пуле процессов кодирования"""
+    global _pool
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    try:
+        return await loop.run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        # Процесс пула упал (OOM и т.п.) - следующий вызов создаст новый пул
+        if _pool is pool:
+            _pool = None
+        raise
+
+
+async def generate_variants(src_path: str, image_url: str) -> Dict[str, Dict[str, str]]:
+    """Сделать копии в пуле процессов; вернуть их URL"""
+    names = await run_in_pool(render_variants, src_path)
+    return variant_urls(image_url, names)
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
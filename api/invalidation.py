@@ -0,0 +1,246 @@
+"""
+Шина инвалидации кэшей между процессами (API-воркеры, бот) на
+PostgreSQL LISTEN/NOTIFY.
+
+Писатель в своей транзакции вызывает notify(session, тема): версия
+темы в cache_versions увеличивается, а pg_notify уходит подписчикам
+только после commit. Каждый процесс держит одно отдельное соединение
+asyncpg с LISTEN и по уведомлению обновляет свои кэши (обработчики
+по теме). Темы - только общие кэши (каталог, настройки): тема на
+пользователя копила бы строки cache_versions без предела.
+
+Данные пользователя (профиль, адреса, корзина, заказы) процессы не
+кэшируют: каждое чтение идёт в БД, и инвалидировать нечего. FSM бота
+в webhook-режиме работает без кэша (bot/fsm_storage.py). Если кэш
+данных пользователя понадобится, его свежесть проверяется по строке
+самого пользователя (updatedat) или ограничивается TTL, а не темой шины.
+
+Уведомления, пришедшие, пока соединения не было, теряются. Поэтому
+после переподключения шина сверяет версии тем с cache_versions
+(resync). Свои уведомления процесс пропускает: писатель обновляет
+кэш сам.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import settings
+from api.models.cache_version import CacheVersion
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "chefport_invalidate"
+
+CATALOG = "catalog"
+CATEGORY = "category"
+SETTINGS = "settings"
+
+# Идентификатор процесса в уведомлениях
+ORIGIN = uuid.uuid4().hex[:12]
+
+Handler = Callable[[str], Awaitable[None]]
+
+
+def _insert(session: AsyncSession):
+    if session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(CacheVersion)
+
+
+async def notify(session: AsyncSession, topic: str) -> int:
+    """
+    Увеличить версию темы и отправить NOTIFY в текущей транзакции
+    (commit делает вызывающий). Возвращает новую версию.
+    """
+    now = datetime.now(timezone.utc)
+    stmt = _insert(session).values(topic=topic, version=1, updatedat=now)
+    # Блокировка строки темы упорядочивает версии одной темы по commit
+    version = (await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CacheVersion.topic],
+            set_={"version": CacheVersion.version + 1, "updatedat": now},
+        ).returning(CacheVersion.version)
+    )).scalar_one()
+
+    if session.bind.dialect.name == "postgresql":
+        await session.execute(select(func.pg_notify(CHANNEL, notify_payload(topic, version))))
+    return version
+
+
+def notify_payload(topic: str, version: int, origin: str = ORIGIN) -> str:
+    """Тело NOTIFY: тема, версия и процесс-писатель"""
+    return json.dumps({"t": topic, "v": version, "o": origin}, separators=(",", ":"))
+
+
+def listener_dsn(database_url: str) -> Optional[str]:
+    """DSN для asyncpg из URL SQLAlchemy; None - не PostgreSQL"""
+    if not database_url.startswith("postgresql"):
+        return None
+    return "postgresql://" + database_url.split("://", 1)[1]
+
+
+class InvalidationBus:
+    """LISTEN-соединение процесса и обработчики тем"""
+
+    def __init__(
+        self,
+        database_url: str,
+        channel: str = CHANNEL,
+        keepalive: float = 30.0,
+        max_backoff: float = 30.0,
+    ):
+        self.dsn = listener_dsn(database_url)
+        self.channel = channel
+        self.keepalive = keepalive
+        self.max_backoff = max_backoff
+
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._versions: Dict[str, int] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._dirty: Set[str] = set()
+        self._lost: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.connected = False
+        self.received = 0
+        self.resyncs = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connected": int(self.connected),
+            "received": self.received,
+            "resyncs": self.resyncs,
+        }
+
+    def subscribe(self, topic: str, handler: Handler):
+        """Обработчик темы (повторная подписка того же обработчика не дублирует его)"""
+        handlers = self._handlers.setdefault(topic, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def version(self, topic: str) -> Optional[int]:
+        """Известная шине версия темы; None - шина не подключена и версия может отставать"""
+        return self._versions.get(topic, 0) if self.connected else None
+
+    # ----- приём -----
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        try:
+            message = json.loads(payload)
+            topic, version, origin = message["t"], int(message["v"]), message.get("o")
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Некорректное уведомление инвалидации: {payload!r}")
+            return
+
+        self.received += 1
+        if version <= self._versions.get(topic, 0):
+            return  # повтор или уже учтено при resync
+        self._versions[topic] = version
+        if origin == ORIGIN:
+            return
+        # Пропуск версий (known + 1 < version) не страшен: обработчик
+        # перечитывает актуальное состояние, а не применяет дельту
+        self._schedule(topic)
+
+    def _schedule(self, topic: str):
+        """Запустить обработчики темы; пока они идут, новые уведомления склеиваются"""
+        if topic in self._running:
+            self._dirty.add(topic)
+            return
+        self._running[topic] = asyncio.create_task(self._run_handlers(topic))
+
+    async def _run_handlers(self, topic: str):
+        try:
+            while True:
+                self._dirty.discard(topic)
+                for handler in list(self._handlers.get(topic, ())):
+                    try:
+                        await handler(topic)
+                    except Exception as e:
+                        logger.error(f"Ошибка обработчика инвалидации {topic}: {e}")
+                if topic not in self._dirty:
+                    return
+        finally:
+            del self._running[topic]
+
+    # ----- соединение -----
+
+    async def _connect(self):
+        import asyncpg
+
+        conn = await asyncpg.connect(self.dsn)
+        self._lost = asyncio.Event()
+        conn.add_termination_listener(lambda _: self._lost.set())
+        await conn.add_listener(self.channel, self._on_notify)
+        return conn
+
+    async def _load_versions(self, conn) -> Dict[str, int]:
+        rows = await conn.fetch("SELECT topic, version FROM cache_versions")
+        return {row["topic"]: row["version"] for row in rows}
+
+    async def resync(self, conn):
+        """Сверить версии после обрыва: обновить изменившиеся темы"""
+        self.resyncs += 1
+        for topic, version in (await self._load_versions(conn)).items():
+            if version > self._versions.get(topic, 0):
+                self._versions[topic] = version
+                self._schedule(topic)
+
+    async def _run(self):
+        backoff = 1.0
+        first = True
+        while True:
+            conn = None
+            try:
+                conn = await self._connect()
+                if first:
+                    self._versions.update(await self._load_versions(conn))
+                    first = False
+                else:
+                    await self.resync(conn)
+                self.connected = True
+                backoff = 1.0
+                logger.info(f"🔔 Шина инвалидации: LISTEN {self.channel}")
+
+                # Проверяем соединение: обрыв сети без FIN иначе не заметить
+                while not self._lost.is_set():
+                    try:
+                        await asyncio.wait_for(self._lost.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        await asyncio.wait_for(conn.fetchval("SELECT 1"), 10)
+                raise ConnectionError("соединение закрыто")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Шина инвалидации: {e}; переподключение через {backoff:.0f} с")
+            finally:
+                self.connected = False
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def start(self):
+        """Запустить слушателя (только для PostgreSQL)"""
+        if self.dsn is None:
+            logger.info("Шина инвалидации отключена: БД не PostgreSQL")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+invalidation_bus = InvalidationBus(settings.database_url)
@@ -1,20 +1,24 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from typing import List
 import os
 
 from api.config import settings
 from api.routes import products, orders, users, settings as settings_router, uploads
-from api.routes import upload
-from api.database import get_db
-from api.models.product import Product
-from api.schemas.product import ProductResponse
-from api.models.category import Category
+from api.routes import upload, cart, delivery, realtime, images
+from api.catalog import catalog, refresh_catalog
+from api.http_cache import conditional, make_etag
+from api.image_cache import image_cache
+from api.images import shutdown_pool
+from api.invalidation import CATALOG, CATEGORY, SETTINGS, invalidation_bus
+from api.realtime import hub
+from api.shop_settings import shop_settings
+from api.singleflight import singleflight_stats
 from api.schemas.category import CategoryResponse
+from bot.send_queue import send_queue
+from bot.webhook import setup_webhook
 
 # Создаём приложение FastAPI
 app = FastAPI(
@@ -30,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Age", "X-Next-Cursor", "X-Catalog-Version", "X-Order-Events-Cursor"],
 )
 
 # Подключаем роуты
@@ -39,17 +44,48 @@ app.include_router(settings_router.router, prefix="/api/settings", tags=["Нас
 app.include_router(uploads.router, prefix="/api/uploads", tags=["Загрузка"])
 app.include_router(upload.router, prefix="/api", tags=["Загрузка 2"])
 app.include_router(products.router, prefix="/api/products", tags=["Товары"])
+app.include_router(cart.router, prefix="/api/cart", tags=["Корзина"])
+app.include_router(delivery.router, prefix="/api/delivery", tags=["Доставка"])
+app.include_router(realtime.router, prefix="/api/realtime", tags=["Realtime"])
+# Раньше монтирования /images: ?w=&h=&fmt= обрабатывает роут, прочее - статика
+app.include_router(images.router, prefix="/images", tags=["Картинки"])
+
+# Бот в webhook-режиме (если задан WEBHOOK_URL)
+setup_webhook(app)
+
+
+# Кэши процесса обновляются по изменениям из других воркеров и бота
+async def refresh_settings(topic: str):
+    await shop_settings.refresh()
+
+@app.on_event("startup")
+async def start_invalidation_bus():
+    invalidation_bus.subscribe(CATALOG, refresh_catalog)
+    invalidation_bus.subscribe(CATEGORY, refresh_catalog)
+    invalidation_bus.subscribe(SETTINGS, refresh_settings)
+    invalidation_bus.start()
+
+@app.on_event("shutdown")
+async def stop_invalidation_bus():
+    await invalidation_bus.stop()
+
+@app.on_event("shutdown")
+async def stop_image_pool():
+    shutdown_pool()
 # app.include_router(categories.router, prefix="/api/categories", tags=["Категории"]) # If categories router exists
 
 # API: Категории (Inline v1.4 - Keeping this if categories.py router is not fully ready/imported)
 # Actually, let's check if categories router exists. If not, keep inline.
 # Ideally we should move this to category router too, but let's fix products first.
 @app.get("/api/categories", response_model=List[CategoryResponse], tags=["Категории"])
-async def get_categories(db: AsyncSession = Depends(get_db)):
-    """Получить все категории"""
-    result = await db.execute(select(Category).order_by(Category.sort_order))
-    categories = result.scalars().all()
-    return categories
+async def get_categories(request: Request, response: Response):
+    """Получить все категории (из снимка каталога)"""
+    snapshot = await catalog.get()
+    response.headers["Age"] = str(catalog.age)
+    cached = conditional(request, response, make_etag("categories", snapshot.categories_digest))
+    if cached:
+        return cached
+    return snapshot.categories
 
 # NOTE: Removed inline /api/products because we included products.router above
 
@@ -91,7 +127,16 @@ async def root_page():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    health = {
+        "status": "ok",
+        "realtime": hub.stats(),
+        "invalidation": invalidation_bus.stats(),
+        "singleflight": singleflight_stats(),
+        "image_cache": image_cache.stats(),
+    }
+    if send_queue.running:  # бот в webhook-режиме в этом процессе
+        health["send_queue"] = send_queue.stats()
+    return health
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,6 @@
 from api.models.user import User
 from api.models.product import Product
+from api.models.product_tombstone import ProductTombstone
 from api.models.category import Category
 from api.models.cart import Cart
 from api.models.user_profile import UserProfile
@@ -7,10 +8,17 @@ from api.models.order import Order, OrderItem
 from api.models.order_history import OrderHistory
 from api.models.order_message import OrderMessage
 from api.models.user_address import UserAddress
+from api.models.idempotency_key import IdempotencyKey
+from api.models.fsm_state import FSMState
+from api.models.order_event import OrderEvent
+from api.models.cache_version import CacheVersion
+from api.models.image_blob import ImageBlob
+from api.models.change_counter import ChangeCounter
 
 __all__ = [
     "User",
     "Product",
+    "ProductTombstone",
     "Category",
     "Cart",
     "UserProfile",
@@ -19,4 +27,10 @@ __all__ = [
     "OrderItem",
     "OrderHistory",
     "OrderMessage",
+    "IdempotencyKey",
+    "FSMState",
+    "OrderEvent",
+    "CacheVersion",
+    "ImageBlob",
+    "ChangeCounter",
 ]
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+from api.database import Base
+
+
+class CacheVersion(Base):
+    """Версия темы инвалидации общих кэшей (catalog, category, settings)"""
+    __tablename__ = "cache_versions"
+
+    topic = Column(String(100), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updatedat = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<CacheVersion(topic={self.topic}, version={self.version})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, UniqueConstraint
 from sqlalchemy.sql import func
 from api.database import Base
 
@@ -6,6 +6,10 @@ from api.database import Base
 class Cart(Base):
     """Корзина пользователя"""
     __tablename__ = "cart"
+    __table_args__ = (
+        # Одна строка на товар: на ней держится INSERT ... ON CONFLICT в add_to_cart_db
+        UniqueConstraint("userid", "productcode", name="uq_cart_userid_productcode"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     userid = Column(BigInteger, nullable=False)
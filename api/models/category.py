@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, ForeignKey
 from sqlalchemy.orm import relationship, backref
 from api.database import Base
 
@@ -6,13 +6,14 @@ class Category(Base):
     __tablename__ = "categories"
 
     id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(50), nullable=False)
+    code = Column(String(50), nullable=False, index=True)
     name = Column(String(255), index=True)
     sort_order = Column(Integer, default=0)
     icon = Column(String)
     parent_id = Column(Integer, ForeignKey('categories.id'), nullable=True)
     # v1.5 field
     image_url = Column(String, nullable=True)
+    image_variants = Column(Text, nullable=True)  # JSON, как у Product
     
     children = relationship("Category", 
                           backref=backref('parent', remote_side=[id]),
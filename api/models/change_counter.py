@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, BigInteger
+from api.database import Base
+
+
+class ChangeCounter(Base):
+    """Счётчик номеров изменений (api.change_seq): только растёт"""
+    __tablename__ = "change_counters"
+
+    name = Column(String(50), primary_key=True)     # catalog / order_events
+    value = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ChangeCounter(name={self.name}, value={self.value})>"
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy.sql import func
+from api.database import Base
+
+
+class FSMState(Base):
+    """Состояние FSM бота (aiogram) и его данные"""
+    __tablename__ = "fsm_states"
+
+    key = Column(String(255), primary_key=True)   # bot:chat:user:thread:business:destiny
+    state = Column(String(255), nullable=True)
+    data = Column(Text, nullable=True)            # компактный JSON, NULL - нет данных
+    updatedat = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<FSMState(key={self.key}, state={self.state})>"
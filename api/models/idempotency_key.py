@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from api.database import Base
+
+
+class IdempotencyKey(Base):
+    """Idempotency-Key запроса создания заказа (защита от повторов и двойных нажатий)"""
+    __tablename__ = "idempotency_keys"
+
+    userid = Column(BigInteger, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    requesthash = Column(String(64), nullable=False)
+    orderid = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    createdat = Column(DateTime(timezone=True), server_default=func.now())
+
+    order = relationship("Order")
+
+    def __repr__(self):
+        return f"<IdempotencyKey(userid={self.userid}, key={self.key}, orderid={self.orderid})>"
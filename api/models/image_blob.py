@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime
+from sqlalchemy.sql import func
+from api.database import Base
+
+
+class ImageBlob(Base):
+    """Картинка в хранилище по содержимому: файл images/products/<sha256><ext>"""
+    __tablename__ = "image_blobs"
+
+    digest = Column(String(64), primary_key=True)  # SHA-256 содержимого, hex
+    ext = Column(String(10), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)  # товары и категории с этим image_url
+    createdat = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ImageBlob(digest={self.digest[:12]}, refcount={self.refcount})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Float, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Text, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from api.database import Base
@@ -7,6 +7,19 @@ from api.database import Base
 class Order(Base):
     """Заказ"""
     __tablename__ = "orders"
+    __table_args__ = (
+        # "Мои заказы", админка по статусу, последние заказы
+        Index("ix_orders_userid_createdat", "userid", "createdat"),
+        Index("ix_orders_status_createdat", "status", "createdat"),
+        Index("ix_orders_createdat", "createdat"),
+        # Очередь новых заказов - маленький частичный индекс
+        Index("ix_orders_new_createdat", "createdat", postgresql_where=text("status = 'new'")),
+        # Активные заказы доставщиков
+        Index(
+            "ix_orders_delivery_active", "createdat",
+            postgresql_where=text("status IN ('ready', 'delivering')"),
+        ),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     userid = Column(BigInteger, nullable=False)
@@ -32,7 +45,7 @@ class OrderItem(Base):
     __tablename__ = "orderitems"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    orderid = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    orderid = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     productcode = Column(String(50), nullable=True)
     name = Column(String(255), nullable=False)
     price = Column(Float, nullable=False)
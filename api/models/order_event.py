@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from api.database import Base
+
+
+class OrderEvent(Base):
+    """Событие заказа (outbox): пишется в одной транзакции с изменением заказа"""
+    __tablename__ = "order_events"
+    __table_args__ = (
+        # Очередь диспетчера - только необработанные события
+        Index("ix_order_events_pending", "id", postgresql_where=text("processedat IS NULL")),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    orderid = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    userid = Column(BigInteger, nullable=True)
+    kind = Column(String(30), nullable=False)        # created / status_changed
+    status = Column(String(50), nullable=False)
+    paymentstatus = Column(String(20), nullable=True)
+    payload = Column(Text, nullable=True)            # JSON с деталями для уведомлений
+    createdat = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    processedat = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    lasterror = Column(Text, nullable=True)
+    # Номер в порядке commit - курсор ленты (api.change_seq); NULL - ещё не пронумеровано
+    feedseq = Column(BigInteger, nullable=True, unique=True, index=True)
+
+    order = relationship("Order")
+
+    def __repr__(self):
+        return f"<OrderEvent(id={self.id}, orderid={self.orderid}, kind={self.kind}, status={self.status})>"
@@ -8,7 +8,7 @@ class OrderHistory(Base):
     __tablename__ = "orderhistory"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    orderid = Column(Integer, nullable=False)
+    orderid = Column(Integer, nullable=False, index=True)
     status = Column(String(50), nullable=False)
     paymentstatus = Column(String(20), nullable=False)
     changedat = Column(DateTime(timezone=True), server_default=func.now())
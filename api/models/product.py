@@ -1,11 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Text, Boolean, DateTime, Index
+from sqlalchemy.sql import func, null
 from api.database import Base
 
 
 class Product(Base):
     """Модель товара (морепродукты) v1.5"""
     __tablename__ = "products"
+    __table_args__ = (
+        # Порядок каталога и keyset-пагинация: (categoryid, name, id)
+        Index("ix_products_categoryid_name_id", "categoryid", "name", "id"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     categoryid = Column(Integer, nullable=False)
@@ -26,12 +30,16 @@ class Product(Base):
     is_discount = Column(Boolean, default=False)
     discount_percent = Column(Integer, default=0)  # NEW: процент скидки
     image_url = Column(String, nullable=True)
+    image_variants = Column(Text, nullable=True)  # JSON: {вариант: {формат: URL}}
     cost_price = Column(Float, default=0)
     markup = Column(Integer, default=0)
     
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), index=True)
+    # Номер изменения для ленты /changes: любая запись сбрасывает в NULL,
+    # номер ставит api.change_seq.stamp после commit
+    changeseq = Column(BigInteger, nullable=True, onupdate=null(), unique=True, index=True)
     
     def __repr__(self):
         return f"<Product(id={self.id}, code={self.code}, name={self.name})>"
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.sql import func
+from api.database import Base
+
+
+class ProductTombstone(Base):
+    """Запись об удалённом товаре (для ленты изменений каталога)"""
+    __tablename__ = "product_tombstones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = Column(Integer, nullable=False)
+    code = Column(String(50), nullable=True)
+    deleted_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
+    changeseq = Column(BigInteger, nullable=True, unique=True, index=True)  # см. Product.changeseq
+
+    def __repr__(self):
+        return f"<ProductTombstone(product_id={self.product_id}, deleted_at={self.deleted_at})>"
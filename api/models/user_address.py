@@ -7,7 +7,7 @@ class UserAddress(Base):
     __tablename__ = "useraddresses"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    userid = Column(BigInteger, nullable=False)
+    userid = Column(BigInteger, nullable=False, index=True)
     label = Column(String(255), nullable=True)          # Название адреса: "Дом", "Работа"
     address = Column(String(500), nullable=False)       # Полный текст адреса
     isdefault = Column(Boolean, nullable=False, default=False)
@@ -0,0 +1,194 @@
+"""
+Outbox событий заказа: order_events пишется в той же транзакции,
+что и изменение заказа, а уведомления рассылает диспетчер.
+
+Диспетчер забирает пачки необработанных событий через
+FOR UPDATE SKIP LOCKED (несколько процессов не мешают друг другу)
+и отдаёт каждое всем приёмникам (sinks). Приёмник, который только
+ставит доставку в очередь (уведомления Telegram), возвращает awaitable
+её завершения: событие ждёт его вне транзакции и до тех пор не
+выдаётся этим процессом повторно.
+
+Событие помечается обработанным только после успеха всех приёмников
+и всех их доставок; упавшее повторяется до max_attempts раз. Доставка
+"хотя бы один раз": процесс упал после отправки, но до отметки, или
+одна из доставок события не удалась - при повторе событие целиком
+уходит снова, и уведомление может прийти дважды.
+
+Миниаппы (доставка, админка) читают тот же журнал по курсору feedseq -
+номеру в порядке commit (stamp_order_events).
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api.change_seq import ORDER_EVENTS_SEQ, stamp
+from api.models.order import Order
+from api.models.order_event import OrderEvent
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = "created"
+STATUS_CHANGED = "status_changed"
+
+# Приёмник: None - событие обработано, awaitable - завершение доставки
+Sink = Callable[[OrderEvent], Awaitable[Optional[Awaitable[Any]]]]
+
+
+def add_order_event(
+    session: AsyncSession,
+    order: Union[int, Order],
+    status: str,
+    kind: str = STATUS_CHANGED,
+    user_id: Optional[int] = None,
+    payment_status: Optional[str] = None,
+    payload: Optional[Dict[str, Any]] = None,
+) -> OrderEvent:
+    """
+    Добавить событие в текущую транзакцию (commit делает вызывающий).
+    order - id заказа или ещё не сохранённый Order (id подставится при flush).
+    """
+    event = OrderEvent(
+        userid=user_id,
+        kind=kind,
+        status=status,
+        paymentstatus=payment_status,
+        payload=json.dumps(payload, ensure_ascii=False, separators=(",", ":")) if payload else None,
+    )
+    if isinstance(order, Order):
+        event.order = order
+    else:
+        event.orderid = order
+    session.add(event)
+    return event
+
+
+async def stamp_order_events(session: AsyncSession) -> int:
+    """Пронумеровать закоммиченные события (commit); текущий курсор журнала"""
+    return await stamp(session, ORDER_EVENTS_SEQ, OrderEvent.feedseq)
+
+
+def event_payload(event: OrderEvent) -> Dict[str, Any]:
+    return json.loads(event.payload) if event.payload else {}
+
+
+class OrderEventDispatcher:
+    """Рассылка событий outbox по приёмникам"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        sinks: List[Sink],
+        batch_size: int = 50,
+        interval: float = 1.0,
+        max_attempts: int = 5,
+    ):
+        self.session_factory = session_factory
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task] = None
+        # События, чьи доставки ещё не завершились, и задачи их ожидания
+        self._in_flight: Set[int] = set()
+        self._settling: Set[asyncio.Task] = set()
+
+    def _failed(self, event: OrderEvent, error: Exception):
+        """Учесть ошибку; попытки кончились - событие больше не повторяется"""
+        event.attempts += 1
+        event.lasterror = str(error)[:1000]
+        logger.error(f"Событие заказа {event.id}: ошибка приёмника ({event.attempts}): {error}")
+        if event.attempts >= self.max_attempts:
+            event.processedat = datetime.now(timezone.utc)
+
+    async def dispatch_batch(self) -> int:
+        """Обработать одну пачку; вернуть число взятых событий"""
+        query = (
+            select(OrderEvent)
+            .where(OrderEvent.processedat.is_(None))
+            .order_by(OrderEvent.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        if self._in_flight:
+            query = query.where(OrderEvent.id.not_in(self._in_flight))
+
+        async with self.session_factory() as session:
+            events = (await session.execute(query)).scalars().all()
+
+            for event in events:
+                deliveries = []
+                try:
+                    for sink in self.sinks:
+                        delivery = await sink(event)
+                        if delivery is not None:
+                            deliveries.append(delivery)
+                except Exception as e:
+                    self._failed(event, e)
+                    continue
+                if deliveries:
+                    self._settle(event.id, deliveries)
+                else:
+                    event.processedat = datetime.now(timezone.utc)
+
+            await session.commit()
+            return len(events)
+
+    def _settle(self, event_id: int, deliveries: List[Awaitable[Any]]):
+        """Отметить событие, когда завершатся его доставки"""
+        self._in_flight.add(event_id)
+        task = asyncio.create_task(self._wait_deliveries(event_id, deliveries))
+        self._settling.add(task)
+        task.add_done_callback(self._settling.discard)
+
+    async def _wait_deliveries(self, event_id: int, deliveries: List[Awaitable[Any]]):
+        try:
+            results = await asyncio.gather(*deliveries, return_exceptions=True)
+            errors = [r for r in results if isinstance(r, BaseException)]
+            # Доставка отменена (очередь остановлена) - событие остаётся
+            # необработанным и уйдёт после перезапуска
+            if any(isinstance(e, asyncio.CancelledError) for e in errors):
+                return
+            async with self.session_factory() as session:
+                event = await session.get(OrderEvent, event_id)
+                if event is None or event.processedat is not None:
+                    return
+                if errors:
+                    self._failed(event, errors[0])
+                else:
+                    event.processedat = datetime.now(timezone.utc)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Событие заказа {event_id}: не удалось отметить доставку: {e}")
+        finally:
+            self._in_flight.discard(event_id)
+
+    async def _run(self):
+        while True:
+            try:
+                # Полная пачка - возможно, есть ещё: берём следующую сразу
+                if await self.dispatch_batch() == self.batch_size:
+                    continue
+            except Exception as e:
+                logger.error(f"Ошибка диспетчера событий заказов: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Остановить выборку и дождаться доставок в пути (не дольше timeout)"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._settling:
+            _, pending = await asyncio.wait(set(self._settling), timeout=timeout)
+            for task in pending:
+                task.cancel()
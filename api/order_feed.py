@@ -0,0 +1,81 @@
+"""
+Общий опрос журнала order_events для long-poll клиентов.
+
+Сколько бы курьеров ни ждало изменений, процесс раз в interval секунд
+нумерует новые события и читает max(feedseq) - и только пока есть
+ожидающие. Курсор клиента - feedseq последнего известного ему события:
+в отличие от id он выдаётся после commit, и событие, закоммиченное
+позже соседнего с большим id, за курсором не потеряется.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from api.database import AsyncSessionLocal
+from api.order_events import stamp_order_events
+
+logger = logging.getLogger(__name__)
+
+
+class OrderFeed:
+    """Курсор журнала событий заказов с ожиданием изменений"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._cursor: Optional[int] = None
+        self._changed = asyncio.Condition()
+        self._waiters = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _fetch(self) -> int:
+        async with AsyncSessionLocal() as session:
+            return await stamp_order_events(session)
+
+    async def current(self) -> int:
+        """Актуальный курсор (запрос в БД)"""
+        await self.publish(await self._fetch())
+        return self._cursor
+
+    async def publish(self, cursor: int):
+        """Сообщить о новом курсоре и разбудить ожидающих"""
+        if self._cursor is not None and cursor <= self._cursor:
+            return
+        self._cursor = cursor
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait(self, after: int, timeout: float) -> int:
+        """Дождаться событий новее after (не дольше timeout); вернуть курсор"""
+        if self._cursor is None:
+            await self.current()
+        if self._cursor > after:
+            return self._cursor
+
+        self._waiters += 1
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll())
+        try:
+            async with self._changed:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self._cursor > after), timeout
+                )
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters -= 1
+        return self._cursor
+
+    async def _poll(self):
+        try:
+            while self._waiters:
+                await asyncio.sleep(self.interval)
+                try:
+                    await self.publish(await self._fetch())
+                except Exception as e:
+                    logger.error(f"Ошибка опроса order_events: {e}")
+        finally:
+            self._task = None
+
+
+order_feed = OrderFeed()
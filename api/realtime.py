@@ -0,0 +1,206 @@
+"""
+Realtime-шлюз для miniapp: один SSE-поток на клиента вместо опроса
+/api/orders и перезагрузки каталога.
+
+Источник статусов заказов - журнал order_events: один фоновый насос
+на процесс читает новые события по курсору feedseq (OrderFeed) и раздаёт их
+подписчикам по userid. Версия каталога рассылается всем после
+catalog.refresh(). У каждого подписчика ограниченная очередь: если
+клиент не успевает читать, очередь сбрасывается и ему уходит resync -
+память процесса не растёт от медленных соединений.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from api.catalog import CatalogSnapshot, catalog
+from api.database import AsyncSessionLocal
+from api.models.order_event import OrderEvent
+from api.order_feed import order_feed
+
+logger = logging.getLogger(__name__)
+
+# Столько событий отдаём при переподключении; больше - клиенту resync
+REPLAY_LIMIT = 100
+
+
+def sse_message(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Кадр text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def order_message(event: OrderEvent) -> str:
+    return sse_message("order", {
+        "order_id": event.orderid,
+        "kind": event.kind,
+        "status": event.status,
+        "payment_status": event.paymentstatus,
+    }, event.feedseq)
+
+
+def catalog_message(snapshot: CatalogSnapshot) -> str:
+    return sse_message("catalog", {
+        "version": snapshot.sync_version,
+        "products": snapshot.products_digest,
+        "categories": snapshot.categories_digest,
+    })
+
+
+class Subscriber:
+    """Одно SSE-соединение"""
+
+    def __init__(self, user_id: Optional[int], catalog: bool, queue_size: int):
+        self.user_id = user_id
+        self.catalog = catalog
+        # (feedseq события заказа или None, кадр)
+        self.queue: "asyncio.Queue[Tuple[Optional[int], str]]" = asyncio.Queue(queue_size)
+        self.last_order_event = 0
+
+    def push(self, message: str, event_id: Optional[int] = None) -> bool:
+        """Положить кадр; при переполнении - сбросить очередь и отправить resync"""
+        try:
+            self.queue.put_nowait((event_id, message))
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((None, sse_message("resync", {"reason": "lagged"})))
+            return False
+
+    async def get(self, timeout: float) -> str:
+        """Следующий кадр; события, уже отданные при replay, пропускаются"""
+        while True:
+            event_id, message = await asyncio.wait_for(self.queue.get(), timeout)
+            if event_id is None:
+                return message
+            if event_id > self.last_order_event:
+                self.last_order_event = event_id
+                return message
+
+
+class RealtimeHub:
+    """Подписчики процесса и насос событий заказов"""
+
+    def __init__(self, max_subscribers: int = 10_000, queue_size: int = 32, batch_size: int = 500):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._by_user: Dict[int, Set[Subscriber]] = {}
+        self._subscribers: Set[Subscriber] = set()
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.lagged = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "users": len(self._by_user),
+            "cursor": self._cursor,
+            "delivered": self.delivered,
+            "lagged": self.lagged,
+        }
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    async def subscribe(self, user_id: Optional[int], catalog: bool = True) -> Subscriber:
+        """Зарегистрировать соединение (насос запускается с первым подписчиком)"""
+        if self._task is None:
+            cursor = await order_feed.current()
+            if self._task is None:
+                self._cursor = cursor
+                self._task = asyncio.create_task(self._pump())
+
+        sub = Subscriber(user_id, catalog, self.queue_size)
+        self._subscribers.add(sub)
+        if user_id is not None:
+            self._by_user.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self._subscribers.discard(sub)
+        subs = self._by_user.get(sub.user_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._by_user[sub.user_id]
+
+    async def replay(self, sub: Subscriber, after: int) -> List[str]:
+        """
+        События пользователя новее after - для переподключения
+        (Last-Event-ID). Больше REPLAY_LIMIT - вместо них resync.
+        """
+        sub.last_order_event = after
+        if sub.user_id is None:
+            return []
+
+        async with AsyncSessionLocal() as session:
+            events = (await session.execute(
+                select(OrderEvent)
+                .where(OrderEvent.feedseq > after, OrderEvent.userid == sub.user_id)
+                .order_by(OrderEvent.feedseq)
+                .limit(REPLAY_LIMIT + 1)
+            )).scalars().all()
+
+        if not events:
+            return []
+        sub.last_order_event = events[-1].feedseq
+        if len(events) > REPLAY_LIMIT:
+            return [sse_message("resync", {"reason": "gap"}, events[-1].feedseq)]
+        return [order_message(event) for event in events]
+
+    def publish_order(self, event: OrderEvent):
+        subs = self._by_user.get(event.userid)
+        if subs:
+            message = order_message(event)
+            for sub in subs:
+                self._deliver(sub, message, event.feedseq)
+
+    def publish_catalog(self, snapshot: CatalogSnapshot):
+        message = catalog_message(snapshot)
+        for sub in self._subscribers:
+            if sub.catalog:
+                self._deliver(sub, message)
+
+    def _deliver(self, sub: Subscriber, message: str, event_id: Optional[int] = None):
+        if sub.push(message, event_id):
+            self.delivered += 1
+        else:
+            self.lagged += 1
+
+    async def _pump(self):
+        try:
+            while self._subscribers:
+                try:
+                    cursor = await order_feed.wait(self._cursor, 25)
+                    while self._cursor < cursor:
+                        async with AsyncSessionLocal() as session:
+                            events = (await session.execute(
+                                select(OrderEvent)
+                                .where(OrderEvent.feedseq > self._cursor, OrderEvent.feedseq <= cursor)
+                                .order_by(OrderEvent.feedseq)
+                                .limit(self.batch_size)
+                            )).scalars().all()
+                        for event in events:
+                            self.publish_order(event)
+                        self._cursor = events[-1].feedseq if len(events) == self.batch_size else cursor
+                except Exception as e:
+                    logger.error(f"Ошибка realtime-насоса заказов: {e}")
+                    await asyncio.sleep(1)
+        finally:
+            self._task = None
+
+
+hub = RealtimeHub()
+catalog.add_listener(hub.publish_catalog)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.cart_view import load_cart_view
+from api.database import get_db
+from api.schemas.cart import CartViewResponse
+
+router = APIRouter()
+
+@router.get("/{user_id}", response_model=CartViewResponse)
+async def get_cart(user_id: int, db: AsyncSession = Depends(get_db)):
+    """Корзина пользователя: строки, цены со скидкой и итог"""
+    return await load_cart_view(db, user_id)
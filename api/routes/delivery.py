@@ -0,0 +1,156 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from api.database import get_db
+from api.models.order import Order
+from api.models.order_history import OrderHistory
+from api.order_events import add_order_event
+from api.order_feed import order_feed
+from api.schemas.delivery import (
+    DeliveryBulkResult,
+    DeliveryBulkUpdate,
+    DeliveryFeed,
+    DeliveryOrder,
+    DeliveryStatusUpdate,
+)
+
+router = APIRouter()
+
+# Заказы, которые видит доставщик (частичный индекс ix_orders_delivery_active)
+ACTIVE_STATUSES = ("ready", "delivering")
+
+# Допустимые переходы: новый статус -> из каких статусов
+TRANSITIONS: Dict[str, tuple] = {
+    "delivering": ("ready",),
+    "completed": ("delivering",),
+}
+
+CURSOR_HEADER = "X-Order-Events-Cursor"
+
+
+def build_delivery_order(order: Order) -> DeliveryOrder:
+    return DeliveryOrder(
+        id=order.id,
+        status=order.status,
+        name=order.name,
+        phone=order.phone,
+        address=order.address,
+        items=[
+            {"name": item.name, "qty": item.quantity, "price": item.price}
+            for item in order.items
+        ],
+        total=order.total,
+    )
+
+
+async def load_active_orders(db: AsyncSession) -> List[DeliveryOrder]:
+    result = await db.execute(
+        select(Order)
+        .options(selectinload(Order.items))
+        .where(Order.status.in_(ACTIVE_STATUSES))
+        .order_by(Order.createdat)
+    )
+    return [build_delivery_order(order) for order in result.scalars().all()]
+
+
+@router.get("/orders", response_model=List[DeliveryOrder])
+async def get_delivery_orders(response: Response, db: AsyncSession = Depends(get_db)):
+    """Активные заказы доставки; в заголовке - курсор для /orders/poll"""
+    # Курсор читаем до заказов: изменение между запросами не потеряется
+    response.headers[CURSOR_HEADER] = str(await order_feed.current())
+    return await load_active_orders(db)
+
+
+@router.get("/orders/poll", response_model=DeliveryFeed)
+async def poll_delivery_orders(
+    cursor: int = Query(..., ge=0),
+    timeout: float = Query(25, ge=0, le=60),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Long-poll: ждёт событий заказов новее cursor (не дольше timeout секунд).
+    Есть изменения - новый курсор и список заказов, нет - changed=false.
+    """
+    new_cursor = await order_feed.wait(cursor, timeout)
+    if new_cursor <= cursor:
+        return DeliveryFeed(cursor=new_cursor, changed=False)
+    return DeliveryFeed(cursor=new_cursor, changed=True, orders=await load_active_orders(db))
+
+
+async def apply_transition(
+    db: AsyncSession, order_ids: List[int], status: str, courier_id: Optional[int]
+) -> List[int]:
+    """
+    Перевести заказы в status одним условным UPDATE, записать историю
+    и события. Возвращает id заказов, которые действительно сменили статус.
+    """
+    result = await db.execute(
+        update(Order)
+        .where(Order.id.in_(order_ids), Order.status.in_(TRANSITIONS[status]))
+        .values(status=status, updatedat=datetime.now(timezone.utc))
+        .returning(Order.id, Order.userid, Order.paymentstatus)
+    )
+    rows = result.all()
+
+    db.add_all([
+        OrderHistory(
+            orderid=row.id,
+            status=status,
+            paymentstatus=row.paymentstatus,
+            changedby=courier_id,
+            comment="Доставка",
+        )
+        for row in rows
+    ])
+    for row in rows:
+        add_order_event(db, row.id, status, user_id=row.userid, payment_status=row.paymentstatus)
+    return [row.id for row in rows]
+
+
+@router.put("/orders/{order_id}/status", response_model=DeliveryOrder)
+async def update_delivery_status(
+    order_id: int, status_data: DeliveryStatusUpdate, db: AsyncSession = Depends(get_db)
+):
+    """Сменить статус заказа (ready -> delivering -> completed)"""
+    if status_data.status not in TRANSITIONS:
+        raise HTTPException(status_code=422, detail=f"Недопустимый статус: {status_data.status}")
+
+    updated = await apply_transition(db, [order_id], status_data.status, status_data.courier_id)
+    if not updated:
+        await db.rollback()
+        exists = await db.scalar(select(Order.id).where(Order.id == order_id))
+        if not exists:
+            raise HTTPException(status_code=404, detail="Заказ не найден")
+        raise HTTPException(status_code=409, detail="Переход из текущего статуса недопустим")
+    await db.commit()
+
+    result = await db.execute(
+        select(Order).options(selectinload(Order.items)).where(Order.id == order_id)
+    )
+    return build_delivery_order(result.scalar_one())
+
+
+@router.post("/orders/status", response_model=DeliveryBulkResult)
+async def bulk_update_delivery_status(bulk: DeliveryBulkUpdate, db: AsyncSession = Depends(get_db)):
+    """
+    Сменить статус нескольких заказов одной транзакцией: по одному UPDATE
+    на целевой статус, история и события - в той же транзакции.
+    """
+    by_status: Dict[str, List[int]] = {}
+    for item in bulk.updates:
+        if item.status not in TRANSITIONS:
+            raise HTTPException(status_code=422, detail=f"Недопустимый статус: {item.status}")
+        by_status.setdefault(item.status, []).append(item.order_id)
+
+    updated: List[int] = []
+    for status, order_ids in by_status.items():
+        updated += await apply_transition(db, order_ids, status, bulk.courier_id)
+    await db.commit()
+
+    done = set(updated)
+    rejected = [item.order_id for item in bulk.updates if item.order_id not in done]
+    return DeliveryBulkResult(updated=sorted(done), rejected=rejected)
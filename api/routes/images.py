@@ -0,0 +1,82 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+from typing import Optional
+import bisect
+import hashlib
+import os
+
+from api.image_cache import image_cache
+from api.image_store import digest_of, is_blob_variant
+from api.images import FORMATS, PRODUCT_IMAGES_DIR, VARIANTS_DIR, image_path, render_resized, run_in_pool
+from api.singleflight import SingleFlight
+
+router = APIRouter()
+
+MAX_SIDE = 2000
+# Стороны копий: запрошенная округляется вверх до ближайшей, так что
+# копий одной картинки не больше len(SIDES)² на формат, а не MAX_SIDE²
+SIDES = (64, 128, 240, 320, 480, 640, 960, 1280, 1600, MAX_SIDE)
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+# Ключ кэша копий включает размер и mtime оригинала: заменённый файл - новый ключ
+IMMUTABLE = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+resizes = SingleFlight("image_resize")
+
+
+def snap_side(side: Optional[int]) -> Optional[int]:
+    """Сторона копии: ближайшая не меньшая из SIDES"""
+    if side is None:
+        return None
+    return SIDES[bisect.bisect_left(SIDES, side)]
+
+
+async def _render(src: str, path: str, w: Optional[int], h: Optional[int], fmt: str):
+    size = await run_in_pool(render_resized, src, path, w, h, fmt)
+    await image_cache.added(size)
+
+
+@router.api_route("/products/{name}", methods=["GET", "HEAD"])
+async def product_image(
+    name: str,
+    w: Optional[int] = Query(None, ge=1, le=MAX_SIDE),
+    h: Optional[int] = Query(None, ge=1, le=MAX_SIDE),
+    fmt: Optional[str] = Query(None, pattern="^(webp|jpeg)$"),
+):
+    """
+    Картинка товара. Без параметров - оригинал, как раньше отдавала
+    статика. С w/h/fmt - уменьшенная копия: при первом запросе
+    делается в пуле процессов и сохраняется в дисковый кэш, дальше
+    отдаётся файлом. Одновременные одинаковые запросы ждут одну копию.
+    w/h округляются вверх до размеров из SIDES: копия может быть
+    чуть больше запрошенной, клиент масштабирует её сам (object-fit).
+    """
+    url = f"/images/products/{name}"
+    src = image_path(url)
+    if src is None or not os.path.isfile(src):
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not (w or h or fmt):
+        # Имя из хранилища - хэш содержимого: файл по этому URL не меняется
+        return FileResponse(src, headers=IMMUTABLE if digest_of(url) else None)
+
+    fmt = fmt or "jpeg"
+    w, h = snap_side(w), snap_side(h)
+    st = os.stat(src)
+    key = hashlib.sha1(f"products/{name}|{st.st_size}|{st.st_mtime_ns}|{w}|{h}|{fmt}".encode()).hexdigest()
+    path = image_cache.path(key, FORMATS[fmt][1])
+    if not image_cache.hit(path):
+        try:
+            await resizes.do(key, lambda: _render(src, path, w, h, fmt))
+        except ValueError:
+            raise HTTPException(status_code=415, detail="Файл не является картинкой")
+    return FileResponse(path, media_type=MEDIA_TYPES[fmt], headers=IMMUTABLE)
+
+
+@router.api_route("/products/variants/{name}", methods=["GET", "HEAD"])
+async def product_image_variant(name: str):
+    """Готовая копия (api.images); копии картинок из хранилища кэшируются навсегда"""
+    if name.startswith("."):
+        raise HTTPException(status_code=404, detail="Not Found")
+    path = os.path.join(PRODUCT_IMAGES_DIR, VARIANTS_DIR, name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return FileResponse(path, headers=IMMUTABLE if is_blob_variant(name) else None)
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from typing import List
+from datetime import datetime, timezone
+from typing import List, Optional
+import hashlib
 
+from api.cart_view import discounted_price
 from api.database import get_db
 from api.models.order import Order, OrderItem
+from api.models.idempotency_key import IdempotencyKey
 from api.models.user import User
 from api.models.product import Product
+from api.order_events import ORDER_CREATED, add_order_event
 from api.schemas.order import OrderCreate, OrderResponse
 
 router = APIRouter()
@@ -44,17 +50,88 @@ async def get_order(order_id: int, db: AsyncSession = Depends(get_db)):
     
     return order
 
+def build_order_response(order: Order) -> OrderResponse:
+    """OrderResponse из загруженного заказа (без повторного запроса в БД)"""
+    # Manually construct response to avoid Pydantic alias issues
+    return OrderResponse(
+        id=order.id,
+        user_id=order.userid,
+        total_amount=order.total,
+        status=order.status,
+        delivery_address=order.address,
+        comment=None, # Поля comment нет в модели Order
+        payment_method=order.paymenttype,
+        payment_status=order.paymentstatus,
+        created_at=order.createdat,
+        updated_at=order.updatedat,
+        items=[
+            {
+                "id": item.id,
+                "productcode": item.productcode,
+                "name": item.name,
+                "quantity": item.quantity,
+                "price": item.price
+            } for item in order.items
+        ]
+    )
+
+
+def request_fingerprint(order_data: OrderCreate) -> str:
+    """Хэш тела запроса: один Idempotency-Key - одно содержимое заказа"""
+    return hashlib.sha256(order_data.model_dump_json().encode()).hexdigest()
+
+
+async def find_idempotent_order(
+    db: AsyncSession, user_id: int, key: str, fingerprint: str
+) -> Optional[Order]:
+    """Заказ, уже созданный по этому Idempotency-Key"""
+    result = await db.execute(
+        select(IdempotencyKey)
+        .options(selectinload(IdempotencyKey.order).selectinload(Order.items))
+        .where(IdempotencyKey.userid == user_id, IdempotencyKey.key == key)
+    )
+    stored = result.scalar_one_or_none()
+    if not stored:
+        return None
+
+    if stored.requesthash != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key уже использован для другого заказа",
+        )
+    return stored.order
+
+
 @router.post("/", response_model=OrderResponse, status_code=201)
-async def create_order(order_data: OrderCreate, db: AsyncSession = Depends(get_db)):
-    """Создать новый заказ"""
-    
+async def create_order(
+    order_data: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Создать новый заказ.
+
+    Товары читаются одним IN-запросом, заказ с позициями вставляется одним
+    flush. С заголовком Idempotency-Key повтор запроса возвращает уже
+    созданный заказ вместо дубля.
+    """
+    fingerprint = request_fingerprint(order_data)
+    if idempotency_key:
+        existing = await find_idempotent_order(db, order_data.user_id, idempotency_key, fingerprint)
+        if existing:
+            return build_order_response(existing)
+
+    # Все товары заказа - одним запросом
+    product_ids = {item.product_id for item in order_data.items}
+    result = await db.execute(select(Product).where(Product.id.in_(product_ids)))
+    products = {p.id: p for p in result.scalars().all()}
+
     # Проверяем товары и считаем сумму
     total_amount = 0.0
     order_items = []
     
     for item in order_data.items:
-        result = await db.execute(select(Product).where(Product.id == item.product_id))
-        product = result.scalar_one_or_none()
+        product = products.get(item.product_id)
         
         if not product:
             raise HTTPException(status_code=404, detail=f"Товар {item.product_id} не найден")
@@ -63,7 +140,8 @@ async def create_order(order_data: OrderCreate, db: AsyncSession = Depends(get_d
         # if not product.in_stock:
         #     raise HTTPException(status_code=400, detail=f"Товар {product.name} нет в наличии")
         
-        price = product.priceperkg if product.priceperkg else 0
+        # Та же цена со скидкой, что показывает корзина (api.cart_view)
+        price = discounted_price(product)
         item_price = price * item.quantity
         total_amount += item_price
         
@@ -79,50 +157,49 @@ async def create_order(order_data: OrderCreate, db: AsyncSession = Depends(get_d
     if order_data.delivery_method == "pickup":
         delivery_address = "Самовывоз"
     
-    # Создаём заказ
+    # Создаём заказ; значения по умолчанию задаём явно, чтобы собрать ответ
+    # из объекта в памяти, не перечитывая заказ
     db_order = Order(
         userid=order_data.user_id,
         total=total_amount,
         address=delivery_address,
         deliverytype=order_data.delivery_method,
         paymenttype=order_data.payment_method,
+        status="new",
+        paymentstatus="not_paid",
+        createdat=datetime.now(timezone.utc),
         # comment=order_data.comment, # Комментарий пока некуда сохранять в модели
         items=order_items
     )
-    
     db.add(db_order)
-    await db.commit()
-    await db.refresh(db_order)
-    
-    # Загружаем связи
-    result = await db.execute(
-        select(Order).options(selectinload(Order.items)).where(Order.id == db_order.id)
-    )
-    order = result.scalar_one()
-    
-    # Manually construct response to avoid Pydantic alias issues
-    return OrderResponse(
-        id=order.id,
-        user_id=order.userid,
-        total_amount=order.total,
-        status=order.status,
-        delivery_address=order.address,
-        comment=None, # Поля comment нет в модели Order
-        payment_method=order.paymenttype,
-        payment_status=order.paymentstatus,
-        created_at=order.createdat,
-        updated_at=order.updatedat,
-        items=[
-            {
-                "id": item.id,
-                "productcode": item.productcode,
-                "name": item.name,
-                "quantity": item.quantity,
-                "price": item.price
-            } for item in order.items
-        ]
+    add_order_event(
+        db, db_order, "new", kind=ORDER_CREATED, user_id=order_data.user_id,
+        payment_status="not_paid",
+        payload={"comment": order_data.comment} if order_data.comment else None,
     )
 
+    if idempotency_key:
+        db.add(IdempotencyKey(
+            userid=order_data.user_id,
+            key=idempotency_key,
+            requesthash=fingerprint,
+            order=db_order,
+        ))
+
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Параллельный запрос с тем же ключом успел раньше - отдаём его заказ
+        await db.rollback()
+        if not idempotency_key:
+            raise
+        existing = await find_idempotent_order(db, order_data.user_id, idempotency_key, fingerprint)
+        if not existing:
+            raise
+        return build_order_response(existing)
+
+    return build_order_response(db_order)
+
 from pydantic import BaseModel
 
 class OrderStatusUpdate(BaseModel):
@@ -140,7 +217,10 @@ async def update_order_status(order_id: int, status_data: OrderStatusUpdate, db:
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
     
-    order.status = status_data.status
+    if order.status != status_data.status:
+        order.status = status_data.status
+        add_order_event(db, order.id, order.status, user_id=order.userid,
+                        payment_status=order.paymentstatus)
     await db.commit()
     await db.refresh(order)
     
@@ -1,46 +1,115 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 import uuid
 
+from api.catalog import FULL_LIST_LIMIT, catalog, decode_cursor, parse_since, stamp_catalog
 from api.database import get_db
+from api.http_cache import conditional, make_etag, payload_response
+from api.image_store import rebind, release
+from api.images import dump_variants, variants_for_url
+from api.invalidation import CATALOG, notify
 from api.models.product import Product
-from api.schemas.product import ProductCreate, ProductUpdate, ProductResponse
+from api.models.product_tombstone import ProductTombstone
+from api.schemas.product import (
+    ProductCreate, ProductUpdate, ProductResponse, ProductChanges, PRODUCT_LIST_FIELDS,
+)
 
 router = APIRouter()
 
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Разобрать ?fields=: "list" или перечень полей ProductResponse"""
+    if not fields:
+        return None
+    if fields == "list":
+        return list(PRODUCT_LIST_FIELDS)
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in ProductResponse.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(unknown)}")
+    return requested
+
+
 @router.get("/", response_model=List[ProductResponse])
 async def get_products(
-    skip: int = 0,
-    limit: int = 2000,
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(FULL_LIST_LIMIT, ge=1, le=FULL_LIST_LIMIT),
     category: str = None,
     in_stock: bool = None,
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
 ):
-    """Получить список товаров с фильтрацией"""
-    query = select(Product)
-    
-    if category:
-        query = query.where(Product.category == category)
-    if in_stock is not None:
-        query = query.where(Product.in_stock == in_stock)
-    
-    query = query.offset(skip).limit(limit)
-    result = await db.execute(query)
-    products = result.scalars().all()
-    
-    return products
+    """
+    Получить список товаров с фильтрацией (готовое тело из снимка каталога).
+
+    Пагинация keyset: порядок (categoryid, name, id); если товары не
+    поместились в limit, курсор следующей страницы приходит в X-Next-Cursor.
+    fields - список полей через запятую или "list" для карточек списка.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    snapshot = await catalog.get()
+    payload, next_cursor = await snapshot.products_payload(
+        category=category, in_stock=in_stock, skip=skip, limit=limit,
+        after=after, fields=parse_fields(fields),
+    )
+    headers = {"X-Catalog-Version": str(snapshot.sync_version), "Age": str(catalog.age)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return payload_response(request, payload, "products", headers=headers)
+
+@router.get("/changes", response_model=ProductChanges)
+async def get_product_changes(since: str, db: AsyncSession = Depends(get_db)):
+    """
+    Изменения каталога после версии since.
+
+    Начальная версия - заголовок X-Catalog-Version у GET /api/products,
+    дальше - version из ответа. Версия - номер изменения в порядке
+    commit (api.change_seq), а не время: запись, закоммиченная позже,
+    всегда получает номер больше уже выданных.
+    """
+    try:
+        since_version = parse_since(since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    version = await stamp_catalog(db)
+    changed = (await db.execute(
+        select(Product)
+        .where(Product.changeseq > since_version, Product.changeseq <= version)
+        .order_by(Product.changeseq)
+    )).scalars().all()
+    deleted = (await db.execute(
+        select(ProductTombstone.product_id)
+        .where(ProductTombstone.changeseq > since_version, ProductTombstone.changeseq <= version)
+    )).scalars().all()
+
+    return ProductChanges(
+        version=version,
+        changed=[ProductResponse.model_validate(p) for p in changed],
+        deleted=sorted(set(deleted)),
+    )
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: int, db: AsyncSession = Depends(get_db)):
+async def get_product(product_id: int, request: Request, response: Response):
     """Получить один товар по ID"""
-    result = await db.execute(select(Product).where(Product.id == product_id))
-    product = result.scalar_one_or_none()
+    snapshot = await catalog.get()
+    product = snapshot.get(product_id)
     
     if not product:
         raise HTTPException(status_code=404, detail="Товар не найден")
     
+    response.headers["Age"] = str(catalog.age)
+    cached = conditional(request, response, make_etag("products", snapshot.products_digest))
+    if cached:
+        return cached
     return product
 
 @router.post("/", response_model=ProductResponse, status_code=201)
@@ -50,8 +119,10 @@ async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_
         product.code = str(uuid.uuid4())[:8]
     db_product = Product(**product.model_dump())
     db.add(db_product)
+    await notify(db, CATALOG)
     await db.commit()
     await db.refresh(db_product)
+    await catalog.refresh()
     
     return db_product
 
@@ -71,11 +142,20 @@ async def update_product(
     
     # Обновляем только переданные поля
     update_data = product_update.model_dump(exclude_unset=True)
+    old_image_url = db_product.image_url
     for field, value in update_data.items():
         setattr(db_product, field, value)
+    if "image_url" in update_data:
+        db_product.image_variants = dump_variants(variants_for_url(db_product.image_url))
+        try:
+            await rebind(db, old_image_url, db_product.image_url)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
     
+    await notify(db, CATALOG)
     await db.commit()
     await db.refresh(db_product)
+    await catalog.refresh()
     
     return db_product
 
@@ -98,8 +178,12 @@ async def delete_product(product_id: int, db: AsyncSession = Depends(get_db)):
     if not db_product:
         raise HTTPException(status_code=404, detail="Товар не найден")
     
-    # Hard delete for simplicity now, or soft delete if model supports it
+    # Hard delete + надгробие в той же транзакции для ленты изменений
+    db.add(ProductTombstone(product_id=db_product.id, code=db_product.code))
+    await release(db, db_product.image_url)
     await db.delete(db_product) 
+    await notify(db, CATALOG)
     await db.commit()
+    await catalog.refresh()
     
     return None
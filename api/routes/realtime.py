@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+
+from api.catalog import catalog
+from api.order_feed import order_feed
+from api.realtime import hub, sse_message
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/stream")
+async def realtime_stream(
+    user_id: Optional[int] = None,
+    topics: str = Query("orders,catalog"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    SSE-поток: event: order - статусы заказов user_id, event: catalog -
+    новая версия каталога, event: resync - клиент отстал, перечитать всё.
+    При переподключении EventSource сам передаёт Last-Event-ID,
+    пропущенные события заказов досылаются.
+    """
+    wanted = {t.strip() for t in topics.split(",") if t.strip()}
+    if hub.full:
+        raise HTTPException(status_code=503, detail="Слишком много подключений")
+
+    after = last_event_id if last_event_id is not None else await order_feed.current()
+
+    async def stream():
+        # Подписка внутри генератора: finally отпишет при любом обрыве
+        sub = await hub.subscribe(user_id if "orders" in wanted else None, "catalog" in wanted)
+        try:
+            # id в hello - курсор, с которого продолжать после обрыва
+            snapshot = await catalog.get()
+            yield sse_message("hello", {"catalog": snapshot.sync_version}, after)
+            for message in await hub.replay(sub, after):
+                yield message
+            while True:
+                try:
+                    yield await sub.get(HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,26 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Dict
 
 from api.database import get_db
+from api.http_cache import conditional, make_etag
+from api.invalidation import SETTINGS, notify
 from api.models.settings import ShopSettings
 from api.schemas.settings import SettingSchema, SettingsUpdate
+from api.shop_settings import shop_settings
 
 router = APIRouter()
 
 @router.get("/", response_model=List[SettingSchema])
-async def get_all_settings(db: AsyncSession = Depends(get_db)):
+async def get_all_settings(request: Request, response: Response):
     """Получить все настройки магазина"""
-    result = await db.execute(select(ShopSettings))
-    return result.scalars().all()
+    snapshot = await shop_settings.get()
+    cached = conditional(request, response, make_etag("settings", snapshot.digest))
+    if cached:
+        return cached
+    return snapshot.items
 
 @router.get("/map", response_model=Dict[str, str])
-async def get_settings_map(db: AsyncSession = Depends(get_db)):
+async def get_settings_map(request: Request, response: Response):
     """Получить настройки в виде словаря key-value"""
-    result = await db.execute(select(ShopSettings))
-    settings = result.scalars().all()
-    return {s.key: s.value for s in settings}
+    snapshot = await shop_settings.get()
+    cached = conditional(request, response, make_etag("settings-map", snapshot.digest))
+    if cached:
+        return cached
+    return dict(snapshot.values)
 
 @router.post("/")
 async def update_settings(data: SettingsUpdate, db: AsyncSession = Depends(get_db)):
@@ -28,12 +36,14 @@ async def update_settings(data: SettingsUpdate, db: AsyncSession = Depends(get_d
     for key, value in data.settings.items():
         result = await db.execute(select(ShopSettings).where(ShopSettings.key == key))
         setting = result.scalar_one_or_none()
-        
+
         if setting:
             setting.value = value
         else:
             new_setting = ShopSettings(key=key, value=value)
             db.add(new_setting)
-    
+
+    await notify(db, SETTINGS)
     await db.commit()
+    await shop_settings.refresh()
     return {"status": "ok"}
@@ -1,34 +1,34 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from pathlib import Path
-import uuid
-import shutil
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-router = APIRouter(prefix="/upload", tags=["upload"])
+from api.config import settings
+from api.database import get_db
+from api.image_store import store_image
+from api.images import PRODUCT_IMAGES_DIR
+from api.upload_stream import UPLOAD_OPENAPI, receive_upload
 
-UPLOAD_DIR = Path("/root/chefport-bot/web/images/products")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+router = APIRouter(prefix="/upload", tags=["upload"])
 
-@router.post("/product-image")
-async def upload_product_image(file: UploadFile = File(...)):
+@router.post("/product-image", openapi_extra=UPLOAD_OPENAPI)
+async def upload_product_image(request: Request, db: AsyncSession = Depends(get_db)):
     """Upload product image"""
     try:
-        # Validate file type
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
+        # Приём потоком: предел размера (413), тип по содержимому, а не content_type (415)
+        upload = await receive_upload(request, PRODUCT_IMAGES_DIR, settings.upload_max_mb * 2**20)
         
-        # Generate unique filename
-        ext = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-        filename = f"{uuid.uuid4()}.{ext}"
-        file_path = UPLOAD_DIR / filename
-        
-        # Save file
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Файл по SHA-256 содержимого + уменьшенные копии (WebP + JPEG)
+        try:
+            stored = await store_image(db, upload)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="File must be an image")
         
         # Return URL path
         return {
             "success": True,
-            "url": f"/images/products/{filename}"
+            "url": stored.url,
+            "variants": stored.variants,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
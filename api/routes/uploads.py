@@ -1,32 +1,28 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import shutil
-import os
-import uuid
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-router = APIRouter()
+from api.config import settings
+from api.database import get_db
+from api.image_store import store_image
+from api.images import PRODUCT_IMAGES_DIR
+from api.upload_stream import UPLOAD_OPENAPI, receive_upload
 
-# Calculate WEB_DIR independently to avoid circular import
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-WEB_DIR = os.path.join(BASE_DIR, "web")
-UPLOAD_DIR = os.path.join(WEB_DIR, "images", "products")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+router = APIRouter()
 
-@router.post("/")
-async def upload_file(file: UploadFile = File(...)):
+@router.post("/", openapi_extra=UPLOAD_OPENAPI)
+async def upload_file(request: Request, db: AsyncSession = Depends(get_db)):
     try:
-        # Validate extension
-        ext = os.path.splitext(file.filename)[1].lower()
-        if ext not in [".jpg", ".jpeg", ".png", ".webp"]:
-            raise HTTPException(status_code=400, detail="Only images allowed")
+        # Validate: тип по первым байтам файла, а не по расширению; предел размера при приёме
+        upload = await receive_upload(request, PRODUCT_IMAGES_DIR, settings.upload_max_mb * 2**20)
             
-        # Generate unique name
-        filename = f"{uuid.uuid4()}{ext}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        
-        # Save
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Save: файл по SHA-256 содержимого, дубликаты не сохраняются
+        try:
+            stored = await store_image(db, upload)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Only images allowed")
             
-        return {"url": f"/images/products/{filename}"}
+        return {"url": stored.url, "variants": stored.variants}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import List
+
+class CartLineResponse(BaseModel):
+    """Строка корзины"""
+    product_code: str
+    name: str
+    quantity: float
+    is_weighted: bool
+    base_price: float
+    price: float  # с учётом скидки, как при оформлении заказа
+    discount_percent: int
+    line_total: float
+
+    class Config:
+        from_attributes = True
+
+class CartViewResponse(BaseModel):
+    """Корзина пользователя с итогами"""
+    user_id: int
+    lines: List[CartLineResponse]
+    total: float
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, field_validator
+from typing import Dict, Optional
+import json
 
 class CategoryBase(BaseModel):
     name: str
@@ -25,6 +26,12 @@ class CategoryUpdate(BaseModel):
 class CategoryResponse(CategoryBase):
     """Схема ответа категории"""
     id: int
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
     
     class Config:
         from_attributes = True
+
+    @field_validator("image_variants", mode="before")
+    @classmethod
+    def parse_image_variants(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
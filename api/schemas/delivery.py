@@ -0,0 +1,40 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class DeliveryItem(BaseModel):
+    """Позиция заказа для курьера"""
+    name: str
+    qty: float
+    price: float
+
+class DeliveryOrder(BaseModel):
+    """Активный заказ курьера"""
+    id: int
+    status: str
+    name: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    items: List[DeliveryItem] = []
+    total: float
+
+class DeliveryFeed(BaseModel):
+    """Ответ long-poll: cursor - id последнего события заказов"""
+    cursor: int
+    changed: bool
+    orders: Optional[List[DeliveryOrder]] = None
+
+class DeliveryStatusUpdate(BaseModel):
+    status: str
+    courier_id: Optional[int] = None
+
+class DeliveryBulkItem(BaseModel):
+    order_id: int
+    status: str
+
+class DeliveryBulkUpdate(BaseModel):
+    updates: List[DeliveryBulkItem] = Field(..., min_length=1, max_length=200)
+    courier_id: Optional[int] = None
+
+class DeliveryBulkResult(BaseModel):
+    updated: List[int]
+    rejected: List[int]  # нет заказа или переход из текущего статуса запрещён
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Optional
+import json
 from datetime import datetime
 
 class ProductBase(BaseModel):
@@ -31,6 +32,7 @@ class ProductUpdate(BaseModel):
     category: Optional[str] = None
     in_stock: Optional[bool] = None
     is_active: Optional[bool] = None
+    image_url: Optional[str] = None
 
 class ProductResponse(BaseModel):
     """Схема ответа товара"""
@@ -49,7 +51,32 @@ class ProductResponse(BaseModel):
     is_discount: Optional[bool] = False
     discount_percent: Optional[int] = 0
     image_url: Optional[str] = None
+    # Уменьшенные копии: {"thumb"|"card"|"full": {"webp": URL, "jpeg": URL}}
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
     externalid: Optional[str] = None
     
     class Config:
         from_attributes = True
+
+    @field_validator("image_variants", mode="before")
+    @classmethod
+    def parse_image_variants(cls, value):
+        """В БД копии хранятся строкой JSON"""
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+
+# Поля для списков (без длинного description и служебных цен): fields=list
+PRODUCT_LIST_FIELDS = (
+    "id", "categoryid", "code", "name", "priceperkg", "is_weighted",
+    "min_weight", "is_hit", "is_discount", "discount_percent", "image_url",
+    "image_variants",
+)
+
+
+class ProductChanges(BaseModel):
+    """Лента изменений каталога с версии since"""
+    version: int  # передать как since в следующий запрос
+    changed: List[ProductResponse] = []
+    deleted: List[int] = []
@@ -0,0 +1,72 @@
+"""
+Снимок настроек магазина в памяти процесса
+Читается из БД один раз и пересобирается после POST /api/settings;
+одновременные сборки объединяются (api/singleflight.py).
+"""
+
+import hashlib
+import itertools
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from sqlalchemy import select
+
+from api.database import AsyncSessionLocal
+from api.models.settings import ShopSettings
+from api.singleflight import SingleFlight
+from api.schemas.settings import SettingSchema
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Неизменяемый снимок настроек"""
+    version: int
+    items: Tuple[SettingSchema, ...]
+    values: Mapping[str, str]
+    digest: str
+
+
+class SettingsStore:
+    """Держит текущий снимок настроек и атомарно подменяет его"""
+
+    def __init__(self):
+        self._snapshot: Optional[SettingsSnapshot] = None
+        self._versions = itertools.count(1)
+        self._flight = SingleFlight("settings")
+
+    async def get(self) -> SettingsSnapshot:
+        """Текущий снимок настроек"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        return await self._flight.do("snapshot", self._swap)
+
+    async def refresh(self) -> SettingsSnapshot:
+        """Пересобрать снимок (вызывать после commit изменений настроек)"""
+        return await self._flight.fresh("snapshot", self._swap)
+
+    async def _swap(self) -> SettingsSnapshot:
+        self._snapshot = snapshot = await self._build()
+        return snapshot
+
+    async def _build(self) -> SettingsSnapshot:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(ShopSettings).order_by(ShopSettings.key))
+            rows = result.scalars().all()
+
+        items = tuple(SettingSchema.model_validate(s) for s in rows)
+        h = hashlib.sha256()
+        for item in items:
+            h.update(item.model_dump_json().encode())
+            h.update(b"\n")
+
+        return SettingsSnapshot(
+            version=next(self._versions),
+            items=items,
+            values=MappingProxyType({s.key: s.value for s in items}),
+            digest=h.hexdigest()[:20],
+        )
+
+
+shop_settings = SettingsStore()
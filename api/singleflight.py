@@ -0,0 +1,75 @@
+"""
+Single-flight: одновременные одинаковые загрузки ждут один запрос в БД.
+
+Холодный или только что сброшенный кэш под нагрузкой иначе даёт
+десятки одинаковых запросов разом. Группа SingleFlight держит по
+ключу одну выполняющуюся задачу; остальные вызовы с тем же ключом
+ждут её результат (или её исключение). Результат общий для всех
+ожидающих - менять его нельзя.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Все группы процесса - для /health
+_groups: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    """Группа загрузок с объединением одновременных вызовов по ключу"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.loads = 0       # реально выполненных загрузок
+        self.coalesced = 0   # вызовов, дождавшихся чужой загрузки
+        self.errors = 0
+        _groups[name] = self
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "inflight": len(self._inflight),
+        }
+
+    def inflight(self, key: Hashable) -> Optional[asyncio.Future]:
+        return self._inflight.get(key)
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        """Результат load(); если загрузка с этим ключом уже идёт - её результат"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.loads += 1
+            future = asyncio.ensure_future(load())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+        # shield: отмена одного ожидающего не отменяет загрузку для остальных
+        return await asyncio.shield(future)
+
+    async def fresh(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        """
+        Как do(), но загрузка начата не раньше вызова: идущую (возможно,
+        до commit вызывающего) дожидаемся и берём следующую.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            await asyncio.wait([future])
+        return await self.do(key, load)
+
+    def _done(self, key: Hashable, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.errors += 1
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: group.stats() for name, group in _groups.items()}
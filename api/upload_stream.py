@@ -0,0 +1,217 @@
+"""
+Приём загрузки картинки потоком прямо из тела запроса.
+
+Starlette перед вызовом роута целиком складывает multipart-файл во
+временный файл без ограничения размера, а затем роут копировал его
+ещё раз синхронно - цикл событий стоял на каждом мегабайте. Здесь
+тело разбирается по мере прихода (python-multipart, как в Starlette),
+запись на диск и SHA-256 идут в потоке (asyncio.to_thread), лимит
+размера проверяется на лету, тип файла определяется по первым байтам,
+а не по Content-Type и расширению от клиента.
+"""
+
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional
+
+from fastapi import HTTPException, Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import ClientDisconnect
+
+# Сигнатура -> расширение в хранилище
+SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+)
+SNIFF_BYTES = 12
+FLUSH_BYTES = 1 << 20
+# Заголовки частей и прочие поля формы сверх размера файла
+FORM_OVERHEAD = 64 * 1024
+
+# Схема тела для OpenAPI: файл читается из запроса, а не параметром File(...)
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+def sniff_image(head: bytes) -> Optional[str]:
+    """Расширение по сигнатуре файла; None - не JPEG/PNG/WebP"""
+    for signature, ext in SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+@dataclass
+class ReceivedUpload:
+    """Файл из формы, уже на диске во временном файле"""
+    filename: Optional[str]
+    path: str
+    size: int
+    digest: str  # SHA-256, hex
+    ext: str     # по содержимому
+
+
+class _Receiver:
+    """Состояние разбора: колбэки парсера синхронные, запись - после них"""
+
+    def __init__(self, field: str, directory: str, max_bytes: int):
+        self.field = field
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.header_field = b""
+        self.header_value = b""
+        self.headers: dict = {}
+        self.in_file = False
+        self.done = False  # нужный файл уже принят, остальные части пропускаем
+
+        self.filename: Optional[str] = None
+        self.path: Optional[str] = None
+        self.out = None
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self.ext: Optional[str] = None
+        self.pending: List[bytes] = []
+        self.pending_bytes = 0
+
+    # ----- колбэки python-multipart -----
+
+    def on_part_begin(self):
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        self.in_file = not self.done and name == self.field and b"filename" in options
+        if self.in_file:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if not self.in_file:
+            return
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+        if self.size <= self.max_bytes:
+            self.pending.append(chunk)
+            self.pending_bytes += len(chunk)
+
+    def on_part_end(self):
+        if self.in_file:
+            self.in_file = False
+            self.done = True
+
+    # ----- запись -----
+
+    def _write(self, chunks: List[bytes]):
+        if self.out is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, f".upload-{uuid.uuid4().hex}.tmp")
+            self.out = open(self.path, "wb")
+        for chunk in chunks:
+            # hashlib отпускает GIL на больших блоках
+            self.sha256.update(chunk)
+            self.out.write(chunk)
+
+    async def flush(self, force: bool = False):
+        if self.size > self.max_bytes:
+            raise HTTPException(
+                status_code=413, detail=f"Файл больше {self.max_bytes // 2**20} МБ"
+            )
+        if self.ext is None and (len(self.head) >= SNIFF_BYTES or (self.done and self.head)):
+            self.ext = sniff_image(self.head)
+            if self.ext is None:
+                raise HTTPException(status_code=415, detail="Только JPEG, PNG или WebP")
+        if self.pending and (force or self.pending_bytes >= FLUSH_BYTES):
+            chunks, self.pending, self.pending_bytes = self.pending, [], 0
+            await asyncio.to_thread(self._write, chunks)
+
+    def close(self):
+        if self.out is not None:
+            self.out.close()
+
+
+async def receive_upload(request: Request, directory: str, max_bytes: int, field: str = "file") -> ReceivedUpload:
+    """
+    Принять файл поля field из multipart-тела во временный файл в
+    directory (той же ФС, что и хранилище - потом os.replace).
+    413 - больше max_bytes, 415 - не картинка, 400 - нет файла.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Ожидается multipart/form-data")
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes + FORM_OVERHEAD:
+        # Отказ до чтения тела
+        raise HTTPException(status_code=413, detail=f"Файл больше {max_bytes // 2**20} МБ")
+
+    receiver = _Receiver(field, directory, max_bytes)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": receiver.on_part_begin,
+        "on_part_data": receiver.on_part_data,
+        "on_part_end": receiver.on_part_end,
+        "on_header_field": receiver.on_header_field,
+        "on_header_value": receiver.on_header_value,
+        "on_header_end": receiver.on_header_end,
+        "on_headers_finished": receiver.on_headers_finished,
+    })
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes + FORM_OVERHEAD:
+                raise HTTPException(status_code=413, detail=f"Файл больше {max_bytes // 2**20} МБ")
+            parser.write(chunk)
+            await receiver.flush()
+        parser.finalize()
+        await receiver.flush(force=True)
+        if not receiver.done or not receiver.size:
+            raise HTTPException(status_code=400, detail="Нет файла в поле " + field)
+    except BaseException as e:
+        receiver.close()
+        if receiver.path and os.path.exists(receiver.path):
+            os.remove(receiver.path)
+        if isinstance(e, ClientDisconnect):
+            raise HTTPException(status_code=400, detail="Загрузка прервана") from None
+        if isinstance(e, MultipartParseError):
+            raise HTTPException(status_code=400, detail="Некорректное тело multipart") from None
+        raise
+    receiver.close()
+
+    return ReceivedUpload(
+        filename=receiver.filename,
+        path=receiver.path,
+        size=receiver.size,
+        digest=receiver.sha256.hexdigest(),
+        ext=receiver.ext,
+    )
@@ -0,0 +1,100 @@
+"""
+Бенчмарк GET /api/products: сериализация через response_model
+против готовых байтов из снимка каталога.
+
+БД не нужна: снимок собирается из синтетических товаров.
+Запуск: python bench_catalog.py --products 2000 --requests 300
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+
+from api.catalog import build_snapshot, catalog
+from api.routes import products
+from api.schemas.product import ProductResponse
+
+
+def fake_rows(count: int):
+    products_rows = [
+        SimpleNamespace(
+            id=i, categoryid=i % 12 + 1, code=f"sku{i}", name=f"Товар №{i} свежемороженый, кг",
+            description="Описание товара " * 12, priceperkg=100.0 + i, cost_price=80.0,
+            markup=25, weight=1.0, is_weighted=bool(i % 2), min_weight=0.5, is_hit=i % 7 == 0,
+            is_discount=i % 5 == 0, discount_percent=10, image_url=f"/images/products/{i}.jpg",
+            externalid=None, category=f"cat{i % 12}", in_stock=True,
+        )
+        for i in range(1, count + 1)
+    ]
+    categories_rows = [
+        SimpleNamespace(id=i, code=f"cat{i}", name=f"Категория {i}", icon=None,
+                        parent_id=None, sort_order=i, image_url=None)
+        for i in range(1, 13)
+    ]
+    return products_rows, categories_rows
+
+
+def legacy_app(snapshot) -> FastAPI:
+    """Поведение до предсериализации: список моделей через response_model"""
+    app = FastAPI()
+
+    @app.get("/api/products/", response_model=List[ProductResponse])
+    async def get_products():
+        return snapshot.products(limit=2000)
+
+    return app
+
+
+def current_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(products.router, prefix="/api/products")
+    return app
+
+
+async def measure(app: FastAPI, requests: int, concurrency: int, headers: dict) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/api/products/", headers=headers)  # прогрев
+
+        queue = iter(range(requests))
+
+        async def worker():
+            for _ in queue:
+                r = await client.get("/api/products/", headers=headers)
+                assert r.status_code == 200, r.status_code
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    snapshot = build_snapshot(1, *fake_rows(args.products))
+    catalog._snapshot = snapshot
+    payload, _ = await snapshot.products_payload()
+    print(f"Товаров: {args.products}; тело: {len(payload.raw)} Б, "
+          f"gzip: {len(payload.gzip)} Б, br: {len(payload.br) if payload.br else '-'} Б")
+
+    cases = [
+        ("до: response_model", legacy_app(snapshot), {}),
+        ("после: identity", current_app(), {"Accept-Encoding": "identity"}),
+        ("после: gzip", current_app(), {"Accept-Encoding": "gzip"}),
+        ("после: br", current_app(), {"Accept-Encoding": "br, gzip"}),
+    ]
+    for title, app, headers in cases:
+        rps = await measure(app, args.requests, args.concurrency, headers)
+        print(f"{title:<22} {rps:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
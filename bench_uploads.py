@@ -0,0 +1,95 @@
+"""
+Бенчмарк задержки чтения каталога во время загрузок картинок.
+
+Запросы GET /api/products/ идут с постоянной частотой, параллельно -
+загрузки большой фотографии в POST /api/uploads/. Печатает p50/p95/p99
+чтения без загрузок и с ними: если приём файла держит цикл событий,
+p99 вырастает на время записи файла.
+
+Нужен запущенный API (uvicorn api.main:app) с одним воркером.
+Предел p99 в процессе, без сервера, проверяет tests/test_uploads.py.
+Запуск: python bench_uploads.py --url http://127.0.0.1:8000 --uploads 4 --size-mb 10
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+from typing import List
+
+import httpx
+from PIL import Image
+
+
+def make_photo(size_mb: float) -> bytes:
+    """JPEG из шума: почти не сжимается, размер растёт со стороной"""
+    side = int((size_mb * 2**20 / 1.2) ** 0.5)
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=95)
+    return out.getvalue()
+
+
+def percentiles(samples: List[float]) -> str:
+    q = statistics.quantiles(samples, n=100)
+    return f"p50 {q[49] * 1000:7.1f} мс  p95 {q[94] * 1000:7.1f} мс  p99 {q[98] * 1000:7.1f} мс"
+
+
+async def read_loop(client: httpx.AsyncClient, seconds: float, rate: float) -> List[float]:
+    """Чтения с постоянной частотой rate в секунду, независимо от ответов"""
+    samples: List[float] = []
+
+    async def one():
+        started = time.perf_counter()
+        r = await client.get("/api/products/")
+        assert r.status_code == 200, r.status_code
+        samples.append(time.perf_counter() - started)
+
+    tasks = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    return samples
+
+
+async def upload_loop(client: httpx.AsyncClient, photo: bytes, stop: asyncio.Event, counter: List[int]):
+    while not stop.is_set():
+        # Каждый раз другие байты в конце: без дедупликации, полная запись файла
+        body = photo + os.urandom(16)
+        r = await client.post("/api/uploads/", files={"file": ("photo.jpg", body, "image/jpeg")})
+        assert r.status_code == 200, (r.status_code, r.text)
+        counter[0] += 1
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--uploads", type=int, default=4, help="одновременных загрузок")
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--rate", type=float, default=50, help="чтений в секунду")
+    args = parser.parse_args()
+
+    photo = make_photo(args.size_mb)
+    print(f"Фото: {len(photo) / 2**20:.1f} МБ; чтений {args.rate:.0f}/с по {args.seconds:.0f} с")
+
+    limits = httpx.Limits(max_connections=args.uploads + 200)
+    async with httpx.AsyncClient(base_url=args.url, timeout=120, limits=limits) as client:
+        await client.get("/api/products/")  # прогрев
+
+        idle = await read_loop(client, args.seconds, args.rate)
+        print(f"{'без загрузок':<14} {percentiles(idle)}")
+
+        stop, counter = asyncio.Event(), [0]
+        uploaders = [asyncio.create_task(upload_loop(client, photo, stop, counter)) for _ in range(args.uploads)]
+        busy = await read_loop(client, args.seconds, args.rate)
+        stop.set()
+        await asyncio.gather(*uploaders)
+        print(f"{'с загрузками':<14} {percentiles(busy)}  (загружено {counter[0]})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
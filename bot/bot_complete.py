@@ -7,7 +7,6 @@ from dotenv import load_dotenv
 # ✅ Импорты aiogram
 from aiogram import Bot, Dispatcher
 from aiogram.types import BotCommand, BotCommandScopeAllPrivateChats, BotCommandScopeChat
-from aiogram.fsm.storage.memory import MemoryStorage
 
 # ✅ Импорты обработчиков
 from bot.handlers.user_handlers import router as user_router
@@ -21,7 +20,11 @@ from bot.handlers.checkout_handlers import router as checkout_router
 from bot.config import BOT_TOKEN, ADMIN_IDS
 
 # Инициализация БД и демо-данных
-from bot.db_postgres import create_tables, init_demo_catalog
+from bot.db_postgres import create_tables, init_demo_catalog, subscribe_catalog_invalidation
+from api.invalidation import invalidation_bus
+from bot.fsm_storage import DBStorage
+from bot.send_queue import send_queue
+from bot.order_notifications import order_dispatcher
 
 ADMIN_IDS = [878283648]
 
@@ -40,7 +43,7 @@ if not BOT_TOKEN:
     raise ValueError("❌ BOT_TOKEN не найден в .env")
 
 
-async def on_startup(bot: Bot):
+async def on_startup(bot: Bot, storage: DBStorage):
     """Действия при запуске бота"""
     logger.info("🚀 Chef Port Bot запущен")
     
@@ -58,6 +61,12 @@ async def on_startup(bot: Bot):
     # Создаём таблицы БД
     await create_tables()
     await init_demo_catalog()
+    storage.start_eviction()
+    # Изменения каталога из API и других процессов (в webhook-режиме шина общая с API)
+    subscribe_catalog_invalidation(invalidation_bus)
+    invalidation_bus.start()
+    send_queue.start(bot)
+    order_dispatcher.start()
     
     # ✅ ШАГ 2: Команды для обычных пользователей
     user_commands = [
@@ -86,10 +95,9 @@ async def on_startup(bot: Bot):
     logger.info("✅ Команды установлены")
 
 
-async def main():
-    """Главная функция запуска бота"""
-    bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+def create_dispatcher(bot: Bot, storage: DBStorage) -> Dispatcher:
+    """Диспетчер со всеми роутерами (общий для polling и webhook)"""
+    dp = Dispatcher(storage=storage)
     
     # Регистрация роутеров
     dp.include_router(user_router)
@@ -99,13 +107,28 @@ async def main():
     dp.include_router(checkout_router)  # ← Новый checkout роутер
     
     # Регистрируем on_startup
-    dp.startup.register(partial(on_startup, bot))
+    dp.startup.register(partial(on_startup, bot, storage))
+    dp.shutdown.register(storage.close)
+    dp.shutdown.register(order_dispatcher.stop)
+    dp.shutdown.register(send_queue.stop)
+    dp.shutdown.register(invalidation_bus.stop)
     
     logger.info("✅ Все обработчики зарегистрированы")
+    return dp
+
+
+async def main():
+    """Главная функция запуска бота"""
+    bot = Bot(token=BOT_TOKEN)
+    # FSM в БД: оформление заказа переживает перезапуск бота
+    storage = DBStorage()
+    dp = create_dispatcher(bot, storage)
+    
     logger.info("🟢 Chef Port Bot готов к работе")
     
-    # Запуск polling
-    await dp.start_polling(bot)
+    # Запуск polling (getUpdates не работает, пока установлен webhook)
+    await bot.delete_webhook()
+    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
 
 if __name__ == "__main__":
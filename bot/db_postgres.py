@@ -4,17 +4,24 @@ PostgreSQL Database Layer для Telegram Bot
 """
 
 import logging
+import time
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
 from sqlalchemy import select, update, delete, func, and_, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, joinedload
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     create_async_engine,
     async_sessionmaker,
 )
 from api.database import Base
+from api.cart_view import CartView, load_cart_view
+from api.catalog import CatalogSnapshot, catalog, refresh_catalog
+from api.config import settings
+from api.invalidation import CATALOG, CATEGORY, InvalidationBus, notify
+from api.singleflight import SingleFlight
+from api.order_events import ORDER_CREATED, add_order_event
 from api.models.category import Category
 from api.models.product import Product
 from api.models.cart import Cart
@@ -31,6 +38,64 @@ from bot.config import DATABASE_URL
 engine = create_async_engine(DATABASE_URL, echo=False)
 async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+# Каталог в боте читается на каждом экране меню: одинаковые запросы объединяем
+catalog_reads = SingleFlight("bot_catalog")
+# Последний удачный результат по ключу - на случай недоступности БД
+_catalog_last_good: Dict[Any, tuple] = {}
+CATALOG_MAX_STALE = 24 * 3600
+
+
+async def read_catalog(key, load):
+    """
+    Чтение каталога для экранов бота: одновременные вызовы - один запрос,
+    при ошибке БД - последний удачный результат (не старше CATALOG_MAX_STALE)
+    """
+    try:
+        value = await catalog_reads.do(key, load)
+    except Exception as e:
+        cached = _catalog_last_good.get(key)
+        if cached is None or time.monotonic() - cached[0] > CATALOG_MAX_STALE:
+            raise
+        logger.warning(f"Каталог {key}: БД недоступна, отдаём данные {time.monotonic() - cached[0]:.0f} с давности: {e}")
+        return cached[1]
+    if value:  # пустые выборки (в т.ч. по чужим кодам) не копим
+        _catalog_last_good[key] = (time.monotonic(), value)
+    return value
+
+
+async def drop_catalog_fallback(topic: str):
+    """Каталог изменился (шина инвалидации): прежние результаты не отдаём и при сбое БД"""
+    _catalog_last_good.clear()
+
+
+def subscribe_catalog_invalidation(bus: InvalidationBus):
+    """Изменения каталога из API и других процессов сбрасывают запасные результаты"""
+    bus.subscribe(CATALOG, drop_catalog_fallback)
+    bus.subscribe(CATEGORY, drop_catalog_fallback)
+    if settings.catalog_file:
+        # Тот же обработчик, что у API: в webhook-режиме подписка одна
+        bus.subscribe(CATALOG, refresh_catalog)
+        bus.subscribe(CATEGORY, refresh_catalog)
+
+
+async def mapped_catalog() -> Optional[CatalogSnapshot]:
+    """Снимок каталога из общего файла (CATALOG_FILE); None - файла нет, читаем из БД"""
+    if not settings.catalog_file:
+        return None
+    return await catalog.get()
+
+
+def dialect_insert(model):
+    """insert() с поддержкой ON CONFLICT для текущей СУБД (PostgreSQL/SQLite)"""
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT не поддерживается для {dialect}")
+    return insert(model)
+
 
 # ===== ИНИЦИАЛИЗАЦИЯ БД =====
 
@@ -92,6 +157,7 @@ async def init_demo_catalog():
         ]
 
         session.add_all(products)
+        await notify(session, CATALOG)
         await session.commit()
         logger.info("✅ Демо-каталог инициализирован")
 
@@ -99,7 +165,14 @@ async def init_demo_catalog():
 # ===== КАТЕГОРИИ =====
 
 async def get_categories() -> List[tuple]:
-    """Получить все категории"""
+    """Получить все категории (одновременные вызовы - один запрос)"""
+    snapshot = await mapped_catalog()
+    if snapshot is not None:
+        return [(c.id, c.code, c.name, c.sort_order) for c in snapshot.categories]
+    return await read_catalog("categories", _load_categories)
+
+
+async def _load_categories() -> List[tuple]:
     async with async_session() as session:
         result = await session.execute(
             select(Category).order_by(Category.sort_order)
@@ -111,7 +184,23 @@ async def get_categories() -> List[tuple]:
 # ===== ТОВАРЫ =====
 
 async def get_products_by_category(cat_code: str) -> List[tuple]:
-    """Получить товары категории"""
+    """Получить товары категории (одновременные вызовы - один запрос)"""
+    snapshot = await mapped_catalog()
+    if snapshot is not None:
+        categoryid = next((c.id for c in snapshot.categories if c.code == cat_code), None)
+        if categoryid is None:
+            return []
+        return [
+            (p.id, p.categoryid, p.code, p.name, p.priceperkg,
+             p.is_weighted, p.min_weight, p.description)
+            for p in snapshot.category_products(categoryid)
+        ]
+    return await read_catalog(
+        ("products_by_category", cat_code), lambda: _load_products_by_category(cat_code)
+    )
+
+
+async def _load_products_by_category(cat_code: str) -> List[tuple]:
     async with async_session() as session:
         result = await session.execute(
             select(Product)
@@ -130,6 +219,13 @@ async def get_products_by_category(cat_code: str) -> List[tuple]:
 
 async def get_product_by_code(code: str) -> Optional[tuple]:
     """Получить товар по коду"""
+    snapshot = await mapped_catalog()
+    if snapshot is not None:
+        p = snapshot.get_by_code(code)
+        if not p:
+            return None
+        return (p.id, p.categoryid, p.name, p.priceperkg, p.is_weighted, p.min_weight, p.description)
+
     async with async_session() as session:
         result = await session.execute(
             select(Product).where(Product.code == code)
@@ -148,6 +244,16 @@ async def get_product_by_code(code: str) -> Optional[tuple]:
 
 async def get_product_by_id(product_id: int) -> Optional[tuple]:
     """Получить товар по ID"""
+    snapshot = await mapped_catalog()
+    if snapshot is not None:
+        p = snapshot.get(product_id)
+        if not p:
+            return None
+        return (
+            p.id, p.categoryid, p.code, p.name,
+            p.priceperkg, p.is_weighted, p.min_weight, p.description,
+        )
+
     async with async_session() as session:
         result = await session.execute(
             select(Product).where(Product.id == product_id)
@@ -167,52 +273,52 @@ async def get_product_by_id(product_id: int) -> Optional[tuple]:
 # ===== КОРЗИНА =====
 
 async def add_to_cart_db(user_id: int, product_code: str, quantity: float):
-    """Добавить товар в корзину"""
+    """
+    Добавить товар в корзину (quantity < 0 - уменьшить).
+    Каждое изменение - атомарный оператор по строке (userid, productcode),
+    параллельные нажатия "+" не создают дублей и не теряют количество.
+    """
     async with async_session() as session:
-        result = await session.execute(
-            select(Cart).where(
-                and_(Cart.userid == user_id, Cart.productcode == product_code)
-            )
-        )
-        cart_item = result.scalar_one_or_none()
+        key = and_(Cart.userid == user_id, Cart.productcode == product_code)
 
-        if cart_item:
-            new_qty = cart_item.quantity + quantity
-            if new_qty <= 0:
-                await session.delete(cart_item)
-            else:
-                cart_item.quantity = new_qty
-        else:
-            if quantity > 0:
-                cart_item = Cart(
-                    userid=user_id,
-                    productcode=product_code,
-                    quantity=quantity
+        if quantity > 0:
+            stmt = dialect_insert(Cart).values(
+                userid=user_id, productcode=product_code, quantity=quantity
+            )
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[Cart.userid, Cart.productcode],
+                    set_={"quantity": Cart.quantity + stmt.excluded.quantity},
                 )
-                session.add(cart_item)
+            )
+        elif quantity < 0:
+            await session.execute(
+                update(Cart).where(key).values(quantity=Cart.quantity + quantity)
+            )
+            # Удаляет тот, кто довёл количество до нуля; параллельный "+" строку сохранит
+            await session.execute(delete(Cart).where(and_(key, Cart.quantity <= 0)))
 
         await session.commit()
 
 
-async def get_cart_db(user_id: int) -> List[Dict[str, Any]]:
-    """Получить корзину пользователя"""
+async def get_cart_view(user_id: int) -> CartView:
+    """Корзина для экранов бота: строки, весовой признак, итоги - один запрос"""
     async with async_session() as session:
-        result = await session.execute(
-            select(Cart, Product)
-            .join(Product, Cart.productcode == Product.code)
-            .where(Cart.userid == user_id)
-        )
-        items = result.all()
+        return await load_cart_view(session, user_id)
 
-        return [
-            {
-                "product_code": cart.productcode,
-                "name": product.name,
-                "price": product.priceperkg,
-                "quantity": cart.quantity,
-            }
-            for cart, product in items
-        ]
+
+async def get_cart_db(user_id: int) -> List[Dict[str, Any]]:
+    """Получить корзину пользователя (цены со скидкой, как в POST /api/orders)"""
+    view = await get_cart_view(user_id)
+    return [
+        {
+            "product_code": line.product_code,
+            "name": line.name,
+            "price": line.price,
+            "quantity": line.quantity,
+        }
+        for line in view.lines
+    ]
 
 
 async def clear_cart_db(user_id: int):
@@ -449,6 +555,8 @@ async def create_order_db(
             comment="Создан заказ"
         )
         session.add(history)
+        add_order_event(session, order.id, "new", kind=ORDER_CREATED, user_id=user_id,
+                        payment_status="not_paid")
 
         await session.commit()
         return order.id
@@ -477,9 +585,14 @@ async def get_user_orders(user_id: int) -> List[Dict[str, Any]]:
 
 
 async def get_orders_with_items(user_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-    """Получение заказов с товарами"""
+    """Получение заказов с товарами (2 запроса при любом числе заказов)"""
     async with async_session() as session:
-        query = select(Order).where(Order.userid == user_id).order_by(Order.id.desc())
+        query = (
+            select(Order)
+            .options(selectinload(Order.items))
+            .where(Order.userid == user_id)
+            .order_by(Order.id.desc())
+        )
 
         if limit:
             query = query.limit(limit)
@@ -487,15 +600,8 @@ async def get_orders_with_items(user_id: int, limit: Optional[int] = None) -> Li
         result = await session.execute(query)
         orders = result.scalars().all()
 
-        output = []
-        for order in orders:
-            # Получаем items отдельно
-            items_result = await session.execute(
-                select(OrderItem).where(OrderItem.orderid == order.id)
-            )
-            items = items_result.scalars().all()
-
-            output.append({
+        return [
+            {
                 "id": order.id,
                 "total": order.total,
                 "status": order.status,
@@ -506,30 +612,26 @@ async def get_orders_with_items(user_id: int, limit: Optional[int] = None) -> Li
                         "qty": item.quantity,
                         "price": item.price,
                     }
-                    for item in items
+                    for item in order.items
                 ]
-            })
-
-        return output
+            }
+            for order in orders
+        ]
 
 
 async def get_order_details(order_id: int) -> Optional[Dict[str, Any]]:
-    """Получение полных данных заказа"""
+    """Получение полных данных заказа (один запрос с JOIN позиций)"""
     async with async_session() as session:
         result = await session.execute(
-            select(Order).where(Order.id == order_id)
+            select(Order)
+            .options(joinedload(Order.items))
+            .where(Order.id == order_id)
         )
-        order = result.scalar_one_or_none()
+        order = result.unique().scalar_one_or_none()
 
         if not order:
             return None
 
-        # Получаем items
-        items_result = await session.execute(
-            select(OrderItem).where(OrderItem.orderid == order_id)
-        )
-        items = items_result.scalars().all()
-
         return {
             "order_id": order.id,
             "user_id": order.userid,
@@ -549,7 +651,7 @@ async def get_order_details(order_id: int) -> Optional[Dict[str, Any]]:
                     "quantity": item.quantity,
                     "price": item.price,
                 }
-                for item in items
+                for item in order.items
             ]
         }
 
@@ -627,19 +729,25 @@ async def update_order_status_by_id(order_id: int, new_status: str) -> bool:
             update(Order)
             .where(Order.id == order_id)
             .values(status=new_status, updatedat=now)
+            .returning(Order.userid, Order.paymentstatus)
         )
+        order = result.one_or_none()
+        if order is None:
+            return False
         
         history = OrderHistory(
             orderid=order_id,
             status=new_status,
-            paymentstatus="not_paid",
+            paymentstatus=order.paymentstatus,
             changedat=now,
             comment=f"Статус изменён на {new_status}"
         )
         session.add(history)
+        add_order_event(session, order_id, new_status, user_id=order.userid,
+                        payment_status=order.paymentstatus)
         
         await session.commit()
-        return result.rowcount > 0
+        return True
 # ===== МАРКЕТИНГ =====
 
 async def update_marketing_consent(user_id: int, consent: bool):
@@ -734,6 +842,13 @@ async def save_order(user_id: int, order_data: Dict[str, Any]) -> str:
             )
             session.add(order_item)
 
+        # Уведомление админам отправит диспетчер событий (bot/order_notifications.py)
+        add_order_event(
+            session, order.id, "new", kind=ORDER_CREATED, user_id=user_id,
+            payment_status="not_paid",
+            payload={"order_number": order_number, "comment": order_data.get("comment")},
+        )
+
         await session.commit()
         return order_number
 
@@ -796,24 +911,19 @@ async def update_order_status_db(
         now = datetime.now()
 
         # Обновляем заказ
+        values = {"status": new_status, "updatedat": now}
         if payment_status:
-            await session.execute(
-                update(Order)
-                .where(Order.id == order_id)
-                .values(status=new_status, paymentstatus=payment_status, updatedat=now)
-            )
-        else:
-            await session.execute(
-                update(Order)
-                .where(Order.id == order_id)
-                .values(status=new_status, updatedat=now)
-            )
-
-            # Получаем текущий payment_status
-            result = await session.execute(
-                select(Order.paymentstatus).where(Order.id == order_id)
-            )
-            payment_status = result.scalar_one_or_none() or "not_paid"
+            values["paymentstatus"] = payment_status
+        result = await session.execute(
+            update(Order)
+            .where(Order.id == order_id)
+            .values(**values)
+            .returning(Order.userid, Order.paymentstatus)
+        )
+        order = result.one_or_none()
+        if order is None:
+            return
+        payment_status = order.paymentstatus
 
         # Записываем в историю
         history = OrderHistory(
@@ -825,29 +935,25 @@ async def update_order_status_db(
             comment=comment
         )
         session.add(history)
+        add_order_event(session, order_id, new_status, user_id=order.userid,
+                        payment_status=payment_status)
 
         await session.commit()
 
 
 async def get_all_orders(limit: int = 50) -> List[Dict[str, Any]]:
-    """Получить все заказы (для админа)"""
+    """Получить все заказы (для админа; 2 запроса при любом числе заказов)"""
     async with async_session() as session:
         result = await session.execute(
             select(Order)
+            .options(selectinload(Order.items))
             .order_by(Order.createdat.desc())
             .limit(limit)
         )
         orders = result.scalars().all()
 
-        output = []
-        for order in orders:
-            # Получаем items
-            items_result = await session.execute(
-                select(OrderItem).where(OrderItem.orderid == order.id)
-            )
-            items = items_result.scalars().all()
-
-            output.append({
+        return [
+            {
                 'id': order.id,
                 'order_number': f"#{order.id}",
                 'user_id': order.userid,
@@ -862,14 +968,14 @@ async def get_all_orders(limit: int = 50) -> List[Dict[str, Any]]:
                         "quantity": item.quantity,
                         "price": item.price,
                     }
-                    for item in items
+                    for item in order.items
                 ],
                 'delivery_method': order.deliverytype,
                 'payment_method': order.paymenttype,
                 'delivery_address': order.address,
-            })
-
-        return output
+            }
+            for order in orders
+        ]
 
 
 async def update_order_status(order_number: str, new_status: str) -> bool:
@@ -0,0 +1,190 @@
+"""
+Хранилище FSM aiogram в БД бота (PostgreSQL или SQLite по DATABASE_URL)
+вместо MemoryStorage: состояния переживают перезапуск, брошенные
+оформления заказа удаляются по TTL.
+
+Перед БД - write-through LRU: запись сразу уходит в БД, чтение
+(get_state/get_data на каждом апдейте) обслуживается из памяти.
+Кэш у каждого процесса свой: если апдейты одного чата могут попасть
+в разные процессы, запускайте с lru_size=0.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import delete, select
+
+from api.models.fsm_state import FSMState
+from bot.db_postgres import async_session, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# (state, data в JSON, срок в time.monotonic(): последняя запись + TTL)
+CacheEntry = Tuple[Optional[str], Optional[str], float]
+
+
+def storage_key(key: StorageKey) -> str:
+    """Строковый ключ строки fsm_states"""
+    return ":".join(
+        str(part) if part is not None else ""
+        for part in (
+            key.bot_id, key.chat_id, key.user_id,
+            key.thread_id, key.business_connection_id, key.destiny,
+        )
+    )
+
+
+def dump_data(data: Dict[str, Any]) -> Optional[str]:
+    """Компактный JSON без пробелов и \\u-экранирования кириллицы; пустые данные - NULL"""
+    if not data:
+        return None
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_data(raw: Optional[str]) -> Dict[str, Any]:
+    return json.loads(raw) if raw else {}
+
+
+class DBStorage(BaseStorage):
+    """FSM-хранилище на таблице fsm_states с TTL и LRU-кэшем"""
+
+    def __init__(
+        self,
+        ttl: timedelta = timedelta(hours=24),
+        lru_size: int = 10_000,
+        evict_interval: float = 600,
+    ):
+        self.ttl = ttl
+        self.lru_size = lru_size
+        self.evict_interval = evict_interval
+        self._cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._evict_task: Optional[asyncio.Task] = None
+
+    # ----- кэш -----
+
+    def _cache_get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() > entry[2]:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _cache_put(
+        self, key: str, state: Optional[str], data: Optional[str], age: float = 0,
+    ) -> CacheEntry:
+        """age - сколько секунд прошло с последней записи строки в БД"""
+        entry = (state, data, time.monotonic() + self.ttl.total_seconds() - age)
+        if self.lru_size <= 0:
+            return entry
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.lru_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    # ----- БД -----
+
+    def _cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - self.ttl
+
+    async def _load(self, key: str) -> CacheEntry:
+        """Строка из кэша или из БД (просроченная считается пустой)"""
+        entry = self._cache_get(key)
+        if entry is not None:
+            return entry
+
+        async with async_session() as session:
+            row = (await session.execute(
+                select(FSMState.state, FSMState.data, FSMState.updatedat)
+                .where(FSMState.key == key)
+            )).one_or_none()
+
+        state = data = None
+        age = 0.0
+        if row is not None:
+            updatedat = row.updatedat
+            if updatedat.tzinfo is None:  # SQLite возвращает naive UTC
+                updatedat = updatedat.replace(tzinfo=timezone.utc)
+            if updatedat >= self._cutoff():
+                state, data = row.state, row.data
+                # TTL отсчитывается от последней записи, а не от загрузки в кэш
+                age = (datetime.now(timezone.utc) - updatedat).total_seconds()
+
+        return self._cache_put(key, state, data, age)
+
+    async def _write(self, key: str, state: Optional[str], data: Optional[str]):
+        """Записать строку целиком; без state и data - удалить"""
+        async with async_session() as session:
+            if state is None and data is None:
+                await session.execute(delete(FSMState).where(FSMState.key == key))
+            else:
+                values = {"state": state, "data": data, "updatedat": datetime.now(timezone.utc)}
+                stmt = dialect_insert(FSMState).values(key=key, **values)
+                await session.execute(
+                    stmt.on_conflict_do_update(index_elements=[FSMState.key], set_=values)
+                )
+            await session.commit()
+        self._cache_put(key, state, data)
+
+    # ----- BaseStorage -----
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        db_key = storage_key(key)
+        _, data, _ = await self._load(db_key)
+        await self._write(db_key, state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = await self._load(storage_key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        db_key = storage_key(key)
+        state, _, _ = await self._load(db_key)
+        await self._write(db_key, state, dump_data(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, raw, _ = await self._load(storage_key(key))
+        return load_data(raw)
+
+    # ----- TTL -----
+
+    async def evict_expired(self) -> int:
+        """Удалить состояния, не менявшиеся дольше TTL"""
+        async with async_session() as session:
+            result = await session.execute(
+                delete(FSMState).where(FSMState.updatedat < self._cutoff())
+            )
+            await session.commit()
+        return result.rowcount or 0
+
+    async def _evict_loop(self):
+        while True:
+            try:
+                removed = await self.evict_expired()
+                if removed:
+                    logger.info(f"🧹 FSM: удалено просроченных состояний: {removed}")
+            except Exception as e:
+                logger.error(f"Ошибка очистки FSM-состояний: {e}")
+            await asyncio.sleep(self.evict_interval)
+
+    def start_eviction(self):
+        """Запустить фоновую очистку по TTL (после создания таблиц)"""
+        if self._evict_task is None:
+            self._evict_task = asyncio.create_task(self._evict_loop())
+
+    async def close(self) -> None:
+        if self._evict_task is not None:
+            self._evict_task.cancel()
+            self._evict_task = None
+        self._cache.clear()
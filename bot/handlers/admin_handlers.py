@@ -1,5 +1,5 @@
 import logging
-from aiogram import Router, F, Bot
+from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
@@ -12,7 +12,6 @@ from bot.db_postgres import (
     get_orders_by_status,
     get_order_details,
     update_order_status_by_id,
-    get_order_message,
     get_user_profile,
 )
 
@@ -156,7 +155,7 @@ async def admin_view_order(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("admin:confirm:"))
-async def admin_confirm_order(callback: CallbackQuery, bot: Bot):
+async def admin_confirm_order(callback: CallbackQuery):
     """Подтвердить заказ"""
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("❌ Нет доступа", show_alert=True)
@@ -164,26 +163,13 @@ async def admin_confirm_order(callback: CallbackQuery, bot: Bot):
 
     order_id = int(callback.data.split(":")[-1])
     
-    # Обновляем статус
+    # Обновляем статус (клиента уведомит диспетчер событий заказа)
     success = await update_order_status_by_id(order_id, "cooking")
     
     if not success:
         await callback.answer("❌ Ошибка обновления", show_alert=True)
         return
 
-    # Уведомляем клиента
-    order = await get_order_details(order_id)
-    order_msg = await get_order_message(order_id)
-    
-    if order_msg:
-        try:
-            await bot.send_message(
-                chat_id=order_msg["chat_id"],
-                text=f"✅ Ваш заказ #{order_id} подтверждён и готовится!"
-            )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить клиента: {e}")
-
     await callback.answer("✅ Заказ подтверждён!", show_alert=True)
     
     # Перерисовываем карточку заказа
@@ -192,7 +178,7 @@ async def admin_confirm_order(callback: CallbackQuery, bot: Bot):
 
 
 @router.callback_query(F.data.startswith("admin:deliver:"))
-async def admin_deliver_order(callback: CallbackQuery, bot: Bot):
+async def admin_deliver_order(callback: CallbackQuery):
     """Передать в доставку"""
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("❌ Нет доступа", show_alert=True)
@@ -206,16 +192,6 @@ async def admin_deliver_order(callback: CallbackQuery, bot: Bot):
         await callback.answer("❌ Ошибка обновления", show_alert=True)
         return
 
-    order_msg = await get_order_message(order_id)
-    if order_msg:
-        try:
-            await bot.send_message(
-                chat_id=order_msg["chat_id"],
-                text=f"🚚 Ваш заказ #{order_id} передан в доставку!"
-            )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить клиента: {e}")
-
     await callback.answer("✅ Передано в доставку!", show_alert=True)
     
     callback.data = f"admin:order:{order_id}"
@@ -223,7 +199,7 @@ async def admin_deliver_order(callback: CallbackQuery, bot: Bot):
 
 
 @router.callback_query(F.data.startswith("admin:complete:"))
-async def admin_complete_order(callback: CallbackQuery, bot: Bot):
+async def admin_complete_order(callback: CallbackQuery):
     """Завершить заказ"""
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("❌ Нет доступа", show_alert=True)
@@ -237,16 +213,6 @@ async def admin_complete_order(callback: CallbackQuery, bot: Bot):
         await callback.answer("❌ Ошибка обновления", show_alert=True)
         return
 
-    order_msg = await get_order_message(order_id)
-    if order_msg:
-        try:
-            await bot.send_message(
-                chat_id=order_msg["chat_id"],
-                text=f"🎉 Ваш заказ #{order_id} выполнен!\n\nСпасибо за покупку! Ждём вас снова! 😊"
-            )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить клиента: {e}")
-
     await callback.answer("✅ Заказ завершён!", show_alert=True)
     
     callback.data = f"admin:order:{order_id}"
@@ -254,7 +220,7 @@ async def admin_complete_order(callback: CallbackQuery, bot: Bot):
 
 
 @router.callback_query(F.data.startswith("admin:cancel:"))
-async def admin_cancel_order(callback: CallbackQuery, bot: Bot):
+async def admin_cancel_order(callback: CallbackQuery):
     """Отменить заказ"""
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("❌ Нет доступа", show_alert=True)
@@ -268,16 +234,6 @@ async def admin_cancel_order(callback: CallbackQuery, bot: Bot):
         await callback.answer("❌ Ошибка обновления", show_alert=True)
         return
 
-    order_msg = await get_order_message(order_id)
-    if order_msg:
-        try:
-            await bot.send_message(
-                chat_id=order_msg["chat_id"],
-                text=f"❌ Ваш заказ #{order_id} отменён.\n\nПо вопросам обращайтесь к администратору."
-            )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить клиента: {e}")
-
     await callback.answer("❌ Заказ отменён", show_alert=True)
     
     callback.data = f"admin:order:{order_id}"
@@ -21,8 +21,6 @@ from bot.db_postgres  import (
 logger = logging.getLogger(__name__)
 router = Router()
 
-# ID администраторов (для уведомлений)
-ADMIN_IDS = [878283648]  # ✅ ИСПРАВИЛ НА СПИСОК
 PICKUP_ADDRESS = "г. Смоленск, ул. Багратиона, д. 2Б"
 
 # ===== ЭМОДЗИ ДЛЯ ТОВАРОВ =====
@@ -751,50 +749,11 @@ async def confirm_order(callback: CallbackQuery, state: FSMContext):
     
     await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb.as_markup())
     await state.update_data(last_bot_message_id=callback.message.message_id)
-    # ✅ УВЕДОМЛЕНИЕ АДМИНУ
-    await notify_admin_new_order(callback.bot, order_number, order_data, total)
-    
     # Очищаем state
     await state.clear()
     await callback.answer("🎊 Спасибо за заказ!", show_alert=False)
 
 
-async def notify_admin_new_order(bot, order_number: str, order_data: dict, total: float):
-    """Отправить уведомление админу о новом заказе"""
-    text = "🔔 НОВЫЙ ЗАКАЗ!\n\n"
-    text += f"📦 Номер: {order_number}\n"
-    text += f"💰 Сумма: {int(total)} ₽\n\n"
-    text += f"👤 Клиент: {order_data['customer_name']}\n"
-    text += f"📞 Телефон: {order_data['customer_phone']}\n\n"
-    
-    if order_data['delivery_method'] == 'delivery':
-        text += f"🚚 Доставка\n"
-        text += f"📍 {order_data['delivery_address']}\n\n"
-    else:
-        text += "🏃 Самовывоз\n\n"
-    
-    payment_methods = {
-        'cash': '💵 Наличные',
-        'card': '💳 Картой',
-        'online': '🌐 Онлайн'
-    }
-    text += f"💳 {payment_methods[order_data['payment_method']]}\n\n"
-    
-    text += "🛒 Товары:\n"
-    for item in order_data['items']:
-        emoji = get_product_emoji(item["product_code"])
-        text += f"• {emoji} {item['name']}: {item['quantity']} × {int(item['price'])} ₽\n"
-    
-    if order_data.get('comment'):
-        text += f"\n💬 Комментарий: {order_data['comment']}"
-    
-    for admin_id in ADMIN_IDS:
-        try:
-            await bot.send_message(admin_id, text, parse_mode="HTML")
-        except Exception as e:
-            logger.error(f"Не удалось отправить уведомление админу {admin_id}: {e}")
-
-
 # ===== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ =====
 async def ask_order_comment(callback: CallbackQuery, state: FSMContext):
     """Спросить комментарий к заказу (после callback)"""
@@ -13,7 +13,7 @@ from bot.db_postgres import (
     get_products_by_category,
     get_product_by_code,
     add_to_cart_db,
-    get_cart_db,
+    get_cart_view,
     clear_cart_db,
     remove_item_from_cart_db,
     get_user_profile,
@@ -120,6 +120,29 @@ def get_category_emoji(cat_code: str) -> str:
     return CATEGORY_EMOJI.get(cat_code, "🐟")
 
 
+def format_cart_qty(line) -> str:
+    """Строка "количество × цена = сумма" для позиции корзины"""
+    if line.is_weighted:
+        qty = f"{line.quantity} кг"
+    else:
+        qty = f"{int(line.quantity)} шт"
+    return f"{qty} × {int(line.price)} ₽ = {int(line.line_total)} ₽"
+
+
+def format_cart_summary(cart) -> str:
+    """Краткая корзина над каталогом и карточкой товара"""
+    if not cart.lines:
+        return "🛒 <b>Корзина пуста</b>"
+
+    cart_summary = "🛒 <b>В корзине:</b>\n"
+    for line in cart.lines:
+        emoji = get_product_emoji(line.product_code)
+        cart_summary += f"{emoji} {line.name}: {format_cart_qty(line)}\n"
+
+    cart_summary += f"\n💰 <b>Итого: {int(cart.total)} ₽</b>"
+    return cart_summary
+
+
 # ===== ГЛАВНОЕ МЕНЮ =====
 
 @router.message(CommandStart())
@@ -225,28 +248,8 @@ async def show_catalog(callback: CallbackQuery):
         return
     
     # ✅ ПОКАЗЫВАЕМ КОРЗИНУ СВЕРХУ
-    cart_items = await get_cart_db(callback.from_user.id)
-    
-    if not cart_items:
-        cart_summary = "🛒 <b>Корзина пуста</b>"
-    else:
-        total = sum(item["price"] * item["quantity"] for item in cart_items)
-        cart_summary = "🛒 <b>В корзине:</b>\n"
-        
-        for item in cart_items:
-            emoji = get_product_emoji(item["product_code"])
-            product = await get_product_by_code(item["product_code"])
-            
-            if product:
-                is_weighted = product[4]
-                item_total = item["price"] * item["quantity"]
-                
-                if is_weighted:
-                    cart_summary += f"{emoji} {item['name']}: {item['quantity']} кг × {int(item['price'])} ₽ = {int(item_total)} ₽\n"
-                else:
-                    cart_summary += f"{emoji} {item['name']}: {int(item['quantity'])} шт × {int(item['price'])} ₽ = {int(item_total)} ₽\n"
-        
-        cart_summary += f"\n💰 <b>Итого: {int(total)} ₽</b>"
+    cart = await get_cart_view(callback.from_user.id)
+    cart_summary = format_cart_summary(cart)
     
     text = "🛍️ <b>Каталог товаров</b>\n"
     text += "━━━━━━━━━━━━━━━━\n\n"
@@ -289,28 +292,8 @@ async def show_category_products(callback: CallbackQuery):
     cat_emoji = get_category_emoji(cat_code)
     
     # ✅ ПОКАЗЫВАЕМ КОРЗИНУ СВЕРХУ
-    cart_items = await get_cart_db(callback.from_user.id)
-    
-    if not cart_items:
-        cart_summary = "🛒 <b>Корзина пуста</b>"
-    else:
-        total = sum(item["price"] * item["quantity"] for item in cart_items)
-        cart_summary = "🛒 <b>В корзине:</b>\n"
-        
-        for item in cart_items:
-            emoji = get_product_emoji(item["product_code"])
-            product = await get_product_by_code(item["product_code"])
-            
-            if product:
-                is_weighted = product[4]
-                item_total = item["price"] * item["quantity"]
-                
-                if is_weighted:
-                    cart_summary += f"{emoji} {item['name']}: {item['quantity']} кг × {int(item['price'])} ₽ = {int(item_total)} ₽\n"
-                else:
-                    cart_summary += f"{emoji} {item['name']}: {int(item['quantity'])} шт × {int(item['price'])} ₽ = {int(item_total)} ₽\n"
-        
-        cart_summary += f"\n💰 <b>Итого: {int(total)} ₽</b>"
+    cart = await get_cart_view(callback.from_user.id)
+    cart_summary = format_cart_summary(cart)
     
     text = f"{cat_emoji} <b>{cat_name}</b>\n"
     text += "━━━━━━━━━━━━━━━━\n\n"
@@ -356,39 +339,15 @@ async def show_product_detail(callback: CallbackQuery):
     
     prod_id, cat_id, prod_name, price_per_kg, is_weighted, min_weight_kg, description = product
     
-    # Получаем текущее количество в корзине
-    cart_items = await get_cart_db(callback.from_user.id)
-    current_qty = 0
-    
-    for item in cart_items:
-        if item["product_code"] == prod_code:
-            current_qty = item["quantity"]
-            break
+    # Текущее количество в корзине
+    cart = await get_cart_view(callback.from_user.id)
+    current_qty = cart.quantity_of(prod_code)
     
     # ✅ ЭМОДЗИ ДЛЯ ТОВАРА
     emoji = get_product_emoji(prod_code)
     
     # ✅ ПОКАЗЫВАЕМ КОРЗИНУ СВЕРХУ
-    if not cart_items:
-        cart_summary = "🛒 <b>Корзина пуста</b>"
-    else:
-        total = sum(item["price"] * item["quantity"] for item in cart_items)
-        cart_summary = "🛒 <b>В корзине:</b>\n"
-        
-        for item in cart_items:
-            item_emoji = get_product_emoji(item["product_code"])
-            item_product = await get_product_by_code(item["product_code"])
-            
-            if item_product:
-                item_is_weighted = item_product[4]
-                item_total = item["price"] * item["quantity"]
-                
-                if item_is_weighted:
-                    cart_summary += f"{item_emoji} {item['name']}: {item['quantity']} кг × {int(item['price'])} ₽ = {int(item_total)} ₽\n"
-                else:
-                    cart_summary += f"{item_emoji} {item['name']}: {int(item['quantity'])} шт × {int(item['price'])} ₽ = {int(item_total)} ₽\n"
-        
-        cart_summary += f"\n💰 <b>Итого: {int(total)} ₽</b>"
+    cart_summary = format_cart_summary(cart)
     
     # ✅ КРАСИВОЕ ОФОРМЛЕНИЕ
     text = cart_summary + "\n\n"
@@ -402,18 +361,13 @@ async def show_product_detail(callback: CallbackQuery):
     if is_weighted:
         text += f"💰 Цена: <b>{int(price_per_kg)} ₽/кг</b>\n"
         text += f"⚖️ Минимум: {min_weight_kg} кг\n\n"
-        
-        if current_qty > 0:
-            total_price = current_qty * price_per_kg
-            text += f"✅ <b>Этого товара в корзине:</b>\n"
-            text += f"   {current_qty} кг × {int(price_per_kg)} ₽ = <b>{int(total_price)} ₽</b>"
     else:
         text += f"💰 Цена: <b>{int(price_per_kg)} ₽/шт</b>\n\n"
-        
-        if current_qty > 0:
-            total_price = current_qty * price_per_kg
-            text += f"✅ <b>Этого товара в корзине:</b>\n"
-            text += f"   {int(current_qty)} шт × {int(price_per_kg)} ₽ = <b>{int(total_price)} ₽</b>"
+    
+    cart_line = cart.get(prod_code)
+    if cart_line:
+        text += f"✅ <b>Этого товара в корзине:</b>\n"
+        text += f"   {format_cart_qty(cart_line)}"
     
     kb = InlineKeyboardBuilder()
     
@@ -455,7 +409,7 @@ async def show_product_detail(callback: CallbackQuery):
     kb.button(text="🏠 Главное меню", callback_data="main_menu")
     
     # ✅ РЯД 4: ДЕЙСТВИЯ (2 кнопки)
-    if cart_items:
+    if cart.lines:
         kb.button(text="✅ Оформить заказ", callback_data="checkout")
     kb.button(text="🛒 Корзина", callback_data="cart")
     
@@ -540,9 +494,9 @@ async def subtract_from_cart(callback: CallbackQuery):
 async def show_cart(callback: CallbackQuery):
     """Показать корзину"""
     user_id = callback.from_user.id
-    cart_items = await get_cart_db(user_id)
+    cart = await get_cart_view(user_id)
     
-    if not cart_items:
+    if not cart.lines:
         text = "🛒 <b>Ваша корзина пуста</b>\n"
         text += "━━━━━━━━━━━━━━━━\n\n"
         text += "😔 Добавьте товары из каталога!"
@@ -552,36 +506,27 @@ async def show_cart(callback: CallbackQuery):
         kb.button(text="◀️ Главное меню", callback_data="main_menu")
         kb.adjust(1)
     else:
-        total = sum(item["price"] * item["quantity"] for item in cart_items)
-        
         text = "🛒 <b>Ваша корзина</b>\n"
         text += "━━━━━━━━━━━━━━━━\n\n"
         
         # ✅ Показываем все товары с ЭМОДЗИ
-        for i, item in enumerate(cart_items, 1):
-            product = await get_product_by_code(item["product_code"])
-            if product:
-                is_weighted = product[4]
-                emoji = get_product_emoji(item["product_code"])
-                
-                if is_weighted:
-                    text += f"{i}. {emoji} <b>{item['name']}</b>\n"
-                    text += f"   ⚖️ {item['quantity']} кг × {int(item['price'])} ₽ = <b>{int(item['price'] * item['quantity'])} ₽</b>\n\n"
-                else:
-                    text += f"{i}. {emoji} <b>{item['name']}</b>\n"
-                    text += f"   📦 {int(item['quantity'])} шт × {int(item['price'])} ₽ = <b>{int(item['price'] * item['quantity'])} ₽</b>\n\n"
+        for i, line in enumerate(cart.lines, 1):
+            emoji = get_product_emoji(line.product_code)
+            icon = "⚖️" if line.is_weighted else "📦"
+            text += f"{i}. {emoji} <b>{line.name}</b>\n"
+            text += f"   {icon} {format_cart_qty(line)}\n\n"
         
         text += "━━━━━━━━━━━━━━━━\n"
-        text += f"💰 <b>Итого: {int(total)} ₽</b>"
+        text += f"💰 <b>Итого: {int(cart.total)} ₽</b>"
         
         kb = InlineKeyboardBuilder()
         
         # Кнопки удаления товаров
-        for item in cart_items:
-            emoji = get_product_emoji(item["product_code"])
+        for line in cart.lines:
+            emoji = get_product_emoji(line.product_code)
             kb.button(
-                text=f"🗑 {emoji} {item['name'][:12]}",
-                callback_data=f"remove:{item['product_code']}"
+                text=f"🗑 {emoji} {line.name[:12]}",
+                callback_data=f"remove:{line.product_code}"
             )
         
         kb.button(text="✅ Оформить заказ", callback_data="checkout")
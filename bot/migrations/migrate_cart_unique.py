@@ -0,0 +1,42 @@
+import sqlite3
+import os
+
+DB_PATH = os.getenv("DB_PATH", "shop.db")
+
+def migrate():
+    """Уникальность (user_id, product_code) в корзине для атомарного upsert"""
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'cart'")
+    if not c.fetchone():
+        conn.close()
+        print("ℹ️ Таблицы cart нет, пропускаем")
+        return
+
+    # Сливаем дубли: суммарное количество - в самую раннюю строку
+    c.execute("""
+        UPDATE cart SET quantity = (
+            SELECT SUM(c2.quantity) FROM cart c2
+            WHERE c2.user_id = cart.user_id AND c2.product_code = cart.product_code
+        )
+        WHERE rowid IN (
+            SELECT MIN(rowid) FROM cart GROUP BY user_id, product_code HAVING COUNT(*) > 1
+        )
+    """)
+    c.execute("""
+        DELETE FROM cart WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM cart GROUP BY user_id, product_code
+        )
+    """)
+    c.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_user_id_product_code
+        ON cart (user_id, product_code)
+    """)
+
+    conn.commit()
+    conn.close()
+    print("✅ Дубли в cart объединены, уникальный индекс создан!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,85 @@
+"""
+Telegram-уведомления по событиям заказа (outbox order_events):
+клиенту - о смене статуса, админам - о новом заказе.
+
+Событие помечается обработанным, только когда Telegram принял все его
+сообщения (send_queue.deliver); доставка - "хотя бы один раз", см.
+api/order_events.py.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, List, Optional
+
+from api.models.order_event import OrderEvent
+from api.order_events import ORDER_CREATED, STATUS_CHANGED, OrderEventDispatcher, event_payload
+from bot.config import ADMIN_IDS
+from bot.db_postgres import async_session, get_order_details
+from bot.handlers.user_handlers import get_product_emoji
+from bot.send_queue import send_queue
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER_STATUS_TEXT = {
+    "cooking": "✅ Ваш заказ #{order_id} подтверждён и готовится!",
+    "delivering": "🚚 Ваш заказ #{order_id} передан в доставку!",
+    "ready": "🏃 Ваш заказ #{order_id} готов к самовывозу!",
+    "completed": "🎉 Ваш заказ #{order_id} выполнен!\n\nСпасибо за покупку! Ждём вас снова! 😊",
+    "cancelled": "❌ Ваш заказ #{order_id} отменён.\n\nПо вопросам обращайтесь к администратору.",
+}
+
+PAYMENT_METHODS = {
+    'cash': '💵 Наличные',
+    'card': '💳 Картой',
+    'online': '🌐 Онлайн'
+}
+
+
+def format_admin_new_order(order: Dict[str, Any], payload: Dict[str, Any]) -> str:
+    """Текст уведомления админу о новом заказе"""
+    text = "🔔 НОВЫЙ ЗАКАЗ!\n\n"
+    text += f"📦 Номер: {payload.get('order_number') or '#' + str(order['order_id'])}\n"
+    text += f"💰 Сумма: {int(order['total'])} ₽\n\n"
+    text += f"👤 Клиент: {order['name']}\n"
+    text += f"📞 Телефон: {order['phone']}\n\n"
+    
+    if order['delivery_type'] == 'delivery':
+        text += f"🚚 Доставка\n"
+        text += f"📍 {order['address']}\n\n"
+    else:
+        text += "🏃 Самовывоз\n\n"
+    
+    payment = PAYMENT_METHODS.get(order['payment_type'], order['payment_type'])
+    text += f"💳 {payment}\n\n"
+    
+    text += "🛒 Товары:\n"
+    for item in order['items']:
+        emoji = get_product_emoji(item["product_code"] or "")
+        text += f"• {emoji} {item['name']}: {item['quantity']} × {int(item['price'])} ₽\n"
+    
+    if payload.get('comment'):
+        text += f"\n💬 Комментарий: {payload['comment']}"
+    return text
+
+
+async def telegram_sink(event: OrderEvent) -> Optional[Awaitable[Any]]:
+    """Поставить уведомления по событию в очередь отправки; вернуть их доставку"""
+    deliveries: List[asyncio.Future] = []
+    if event.kind == ORDER_CREATED:
+        order = await get_order_details(event.orderid)
+        if not order:
+            return None
+        text = format_admin_new_order(order, event_payload(event))
+        for admin_id in ADMIN_IDS:
+            deliveries.append(send_queue.deliver(admin_id, text, parse_mode="HTML"))
+
+    elif event.kind == STATUS_CHANGED:
+        template = CUSTOMER_STATUS_TEXT.get(event.status)
+        # Заказы из бота - личные чаты, chat_id совпадает с user_id
+        if template and event.userid:
+            deliveries.append(send_queue.deliver(event.userid, template.format(order_id=event.orderid)))
+
+    return asyncio.gather(*deliveries) if deliveries else None
+
+
+order_dispatcher = OrderEventDispatcher(async_session, sinks=[telegram_sink])
@@ -0,0 +1,270 @@
+"""
+Очередь исходящих сообщений Telegram вне обработчиков.
+
+Хендлер кладёт сообщение в очередь и сразу отвечает пользователю;
+отправкой занимается фоновая задача с лимитами Bot API:
+не чаще global_rate сообщений в секунду на бота и одного сообщения
+в chat_interval секунд на чат. Сообщения одного чата уходят строго
+по порядку: пока более раннее в отправке или ждёт повтора, следующие
+придерживаются. На 429 (TelegramRetryAfter) вся очередь
+ждёт retry_after, сетевые ошибки и 5xx повторяются с экспоненциальной
+задержкой.
+
+deliver() - то же, что send_message(), но возвращает future: результат
+появляется, когда Telegram принял сообщение, исключение - когда
+отправить не удалось, отмена - когда очередь остановлена раньше.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(order=True)
+class OutgoingMessage:
+    """Сообщение в очереди (упорядочено по времени готовности)"""
+    ready_at: float
+    seq: int
+    chat_id: int = field(compare=False)
+    text: str = field(compare=False)
+    kwargs: Dict[str, Any] = field(compare=False, default_factory=dict)
+    attempt: int = field(compare=False, default=0)
+    done: Optional[asyncio.Future] = field(compare=False, default=None)
+
+
+class SendQueue:
+    """Исходящие сообщения с лимитами на чат и на бота"""
+
+    def __init__(
+        self,
+        global_rate: float = 25.0,
+        chat_interval: float = 1.0,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        base_backoff: float = 1.0,
+        max_depth: int = 10_000,
+    ):
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_depth = max_depth
+
+        self._bot: Optional[Bot] = None
+        self._heap: List[OutgoingMessage] = []
+        self._seq = itertools.count()
+        self._chat_next: Dict[int, float] = {}
+        self._chat_sent: Dict[int, float] = {}
+        # Чат -> seq сообщения, которое сейчас отправляется (или ждёт повтора),
+        # и придержанные за ним сообщения чата
+        self._chat_owner: Dict[int, int] = {}
+        self._held: Dict[int, List[OutgoingMessage]] = {}
+        self._global_next = 0.0
+        self._paused_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self._sending: Set[asyncio.Task] = set()
+
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def held(self) -> int:
+        """Сообщений, ждущих отправки более раннего в своём чате"""
+        return sum(len(messages) for messages in self._held.values())
+
+    @property
+    def depth(self) -> int:
+        """Сообщений в очереди и в отправке"""
+        return len(self._heap) + self.held + len(self._sending)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._heap),
+            "held": self.held,
+            "in_flight": len(self._sending),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> bool:
+        """Поставить сообщение в очередь; False - очередь переполнена"""
+        return self._enqueue(chat_id, text, kwargs)
+
+    def deliver(self, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """Поставить сообщение в очередь; future завершится с его отправкой"""
+        done = asyncio.get_running_loop().create_future()
+        if not self._enqueue(chat_id, text, kwargs, done):
+            done.set_exception(RuntimeError("Очередь отправки переполнена"))
+        return done
+
+    def _enqueue(
+        self, chat_id: int, text: str, kwargs: Dict[str, Any],
+        done: Optional[asyncio.Future] = None,
+    ) -> bool:
+        if len(self._heap) + self.held >= self.max_depth:
+            self.dropped += 1
+            logger.error(f"Очередь отправки переполнена, сообщение в чат {chat_id} отброшено")
+            return False
+
+        now = time.monotonic()
+        if len(self._chat_next) > self.max_depth:
+            self._chat_next = {c: t for c, t in self._chat_next.items() if t > now}
+            self._chat_sent = {
+                c: t for c, t in self._chat_sent.items() if t + self.chat_interval > now
+            }
+
+        # Сообщения одного чата разносим на chat_interval, порядок сохраняется
+        ready_at = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = ready_at + self.chat_interval
+        self._push(OutgoingMessage(ready_at, next(self._seq), chat_id, text, kwargs, done=done))
+        return True
+
+    def _push(self, message: OutgoingMessage):
+        heapq.heappush(self._heap, message)
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            ready_at = max(self._heap[0].ready_at, self._global_next, self._paused_until)
+            if ready_at > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), ready_at - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._slots.acquire()
+            message = heapq.heappop(self._heap)
+            now = time.monotonic()
+
+            # Более раннее сообщение чата ещё не отправлено (ждёт повтора) -
+            # это ждёт его, иначе чат получит сообщения не по порядку
+            if self._chat_owner.setdefault(message.chat_id, message.seq) != message.seq:
+                self._slots.release()
+                self._held.setdefault(message.chat_id, []).append(message)
+                continue
+
+            # После паузы 429 или повтора сообщения чата могли скопиться:
+            # интервал на чат проверяем и в момент отправки
+            chat_ready = self._chat_sent.get(message.chat_id, 0.0) + self.chat_interval
+            if chat_ready > now:
+                self._slots.release()
+                message.ready_at = chat_ready
+                self._push(message)
+                continue
+
+            self._chat_sent[message.chat_id] = now
+            self._global_next = now + 1 / self.global_rate
+            task = asyncio.create_task(self._send(message))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, message: OutgoingMessage):
+        retried = False
+        error: Optional[Exception] = None
+        try:
+            await self._bot.send_message(message.chat_id, message.text, **message.kwargs)
+            self.sent += 1
+        except TelegramRetryAfter as e:
+            # 429 ограничивает весь бот: приостанавливаем очередь целиком
+            self._paused_until = time.monotonic() + e.retry_after
+            retried, error = self._retry(message, e.retry_after, e), e
+        except (TelegramNetworkError, TelegramServerError) as e:
+            retried, error = self._retry(message, self.base_backoff * 2 ** message.attempt, e), e
+        except Exception as e:
+            error = e
+            self.failed += 1
+            logger.error(f"Не удалось отправить сообщение в чат {message.chat_id}: {e}")
+        except asyncio.CancelledError:
+            self._finish(message, None, cancelled=True)
+            raise
+        finally:
+            self._slots.release()
+            if not retried:
+                self._release_chat(message.chat_id)
+        if not retried:
+            self._finish(message, error)
+
+    @staticmethod
+    def _finish(message: OutgoingMessage, error: Optional[Exception], cancelled: bool = False):
+        """Сообщить ожидающему deliver() итог отправки"""
+        if message.done is None or message.done.done():
+            return
+        if cancelled:
+            message.done.cancel()
+        elif error is not None:
+            message.done.set_exception(error)
+        else:
+            message.done.set_result(None)
+
+    def _retry(self, message: OutgoingMessage, delay: float, error: Exception) -> bool:
+        """Поставить сообщение на повтор; False - попытки кончились"""
+        if message.attempt >= self.max_retries:
+            self.failed += 1
+            logger.error(f"Сообщение в чат {message.chat_id} не отправлено после {message.attempt + 1} попыток: {error}")
+            return False
+
+        message.attempt += 1
+        message.ready_at = time.monotonic() + delay
+        self.retried += 1
+        logger.warning(f"Повтор отправки в чат {message.chat_id} через {delay:.1f} с: {error}")
+        self._push(message)
+        return True
+
+    def _release_chat(self, chat_id: int):
+        """Сообщение чата отправлено (или брошено): вернуть придержанные в очередь"""
+        self._chat_owner.pop(chat_id, None)
+        for message in self._held.pop(chat_id, ()):
+            self._push(message)
+
+    def start(self, bot: Bot):
+        """Запустить фоновую отправку"""
+        self._bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Дослать очередь (не дольше timeout) и остановиться"""
+        deadline = time.monotonic() + timeout
+        while self.depth and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.depth:
+            logger.warning(f"Очередь отправки остановлена, не отправлено: {self.depth}")
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._sending):
+            task.cancel()
+        # Неотправленные сообщения: ожидающие deliver() получают отмену
+        for message in self._heap + [m for held in self._held.values() for m in held]:
+            self._finish(message, None, cancelled=True)
+
+
+send_queue = SendQueue()
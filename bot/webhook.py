@@ -0,0 +1,309 @@
+"""
+Webhook-режим бота внутри FastAPI-приложения (api/main.py).
+
+Включается переменной WEBHOOK_URL. Апдейты принимаются на WEBHOOK_PATH,
+сверяется секретный заголовок, лишние типы апдейтов отбрасываются.
+Обработка идёт фоновыми задачами: разные чаты - параллельно, один
+чат - строго по очереди. Без WEBHOOK_SECRET webhook не подключается:
+иначе кто угодно пришлёт апдейт от имени админа.
+
+Апдейты обрабатывает ровно один воркер - владелец WebhookWorkerLock:
+порядок апдейтов чата и лимит очереди отправки (bot/send_queue.py)
+держатся внутри процесса, а set_webhook и создание таблиц должны
+выполняться один раз. Остальные воркеры (uvicorn --workers N) стартуют
+как обычно и обслуживают API, а пришедший к ним апдейт передают
+владельцу через Unix-сокет (UpdateRelay) и отвечают Telegram только
+после того, как владелец его принял. Владелец на другом хосте
+(PostgreSQL) через сокет недоступен: тогда ответ 503, и Telegram
+повторит апдейт. Остановился владелец - блокировку через
+TAKEOVER_INTERVAL подхватывает один из оставшихся воркеров.
+"""
+
+import asyncio
+import fcntl
+import hmac
+import logging
+import os
+import tempfile
+from typing import Callable, Dict, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Update
+from fastapi import FastAPI, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from api.config import settings
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Ключ pg_advisory_lock (в одном пространстве с ключами api.change_seq)
+WEBHOOK_LOCK = 0x63686566_0003
+
+# Как часто воркер без блокировки пробует стать владельцем webhook (с)
+TAKEOVER_INTERVAL = 30
+# Сколько ждать, пока владелец примет переданный апдейт (с)
+RELAY_TIMEOUT = 5
+
+
+def update_chat_id(update: Update) -> Optional[int]:
+    """Чат апдейта - ключ упорядочивания (None - порядок не важен)"""
+    event = update.event
+    chat = getattr(event, "chat", None)
+    if chat is None and getattr(event, "message", None) is not None:
+        chat = event.message.chat  # callback_query
+    if chat is not None:
+        return chat.id
+
+    user = getattr(event, "from_user", None)
+    return user.id if user else None
+
+
+class ChatOrderedRunner:
+    """Апдейты разных чатов - параллельно, одного чата - по порядку поступления"""
+
+    def __init__(self, dp: Dispatcher, bot: Bot):
+        self.dp = dp
+        self.bot = bot
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._waiting: Dict[int, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, update: Update):
+        """Поставить апдейт в обработку, не дожидаясь её"""
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, update: Update):
+        chat_id = update_chat_id(update)
+        if chat_id is None:
+            await self._feed(update)
+            return
+
+        # До acquire нет await: задачи встают в очередь замка в порядке submit
+        lock = self._locks.setdefault(chat_id, asyncio.Lock())
+        self._waiting[chat_id] = self._waiting.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                await self._feed(update)
+        finally:
+            self._waiting[chat_id] -= 1
+            if not self._waiting[chat_id]:
+                del self._waiting[chat_id]
+                del self._locks[chat_id]
+
+    async def _feed(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            logger.exception(f"Ошибка обработки апдейта {update.update_id}")
+
+    async def drain(self):
+        """Дождаться апдейтов в обработке (при остановке)"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class WebhookWorkerLock:
+    """
+    Блокировка "webhook обслуживает этот процесс" на всё время работы.
+    PostgreSQL - сессионная advisory-блокировка на отдельном соединении
+    (видна воркерам на всех хостах), SQLite - flock на файл бота.
+    """
+
+    def __init__(self, engine: AsyncEngine, bot_id: str):
+        self.engine = engine
+        self.path = os.path.join(tempfile.gettempdir(), f"chefport-webhook-{bot_id}.lock")
+        self._conn: Optional[AsyncConnection] = None
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._conn is not None or self._fd is not None
+
+    async def acquire(self) -> bool:
+        """Взять блокировку; False - её держит другой процесс"""
+        if self.engine.dialect.name == "postgresql":
+            conn = await self.engine.connect()
+            locked = (await conn.execute(select(func.pg_try_advisory_lock(WEBHOOK_LOCK)))).scalar()
+            await conn.commit()  # сессионная блокировка переживает commit
+            if not locked:
+                await conn.close()
+                return False
+            self._conn = conn
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def release(self):
+        if self._conn is not None:
+            # Соединение вернётся в пул: сессионную блокировку снимаем явно
+            await self._conn.execute(select(func.pg_advisory_unlock(WEBHOOK_LOCK)))
+            await self._conn.commit()
+            await self._conn.close()
+            self._conn = None
+        if self._fd is not None:
+            os.close(self._fd)  # закрытие файла снимает flock
+            self._fd = None
+
+
+class UpdateRelay:
+    """
+    Передача апдейтов владельцу webhook через Unix-сокет на том же хосте:
+    одно соединение - один апдейт (тело запроса Telegram до EOF), владелец
+    отвечает "ok", когда апдейт поставлен в обработку.
+    """
+
+    def __init__(self, bot_id: str):
+        self.path = os.path.join(tempfile.gettempdir(), f"chefport-webhook-{bot_id}.sock")
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def serve(self, accept: Callable[[bytes], None]):
+        """Принимать апдейты (только владелец блокировки)"""
+        async def on_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                accept(await reader.read())
+                writer.write(b"ok")
+                await writer.drain()
+            except Exception:
+                logger.exception("Ошибка приёма апдейта от другого воркера")
+            finally:
+                writer.close()
+
+        # Сокет прежнего владельца остался после падения: блокировка у нас
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(on_client, path=self.path)
+
+    async def forward(self, raw: bytes) -> bool:
+        """Передать апдейт владельцу; False - владелец недоступен"""
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(self.path), RELAY_TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        try:
+            writer.write(raw)
+            writer.write_eof()
+            return await asyncio.wait_for(reader.read(), RELAY_TIMEOUT) == b"ok"
+        except (OSError, asyncio.TimeoutError):
+            return False
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+def create_bot() -> Bot:
+    """Bot с базовым URL Bot API из настроек"""
+    session = None
+    if settings.telegram_api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url))
+    return Bot(token=settings.bot_token, session=session)
+
+
+def setup_webhook(app: FastAPI):
+    """Подключить webhook бота к приложению, если задан WEBHOOK_URL"""
+    if not settings.webhook_url:
+        return
+    if not settings.webhook_secret:
+        logger.error("❌ WEBHOOK_SECRET не задан: webhook бота не подключён")
+        return
+
+    from bot.bot_complete import create_dispatcher
+    from bot.db_postgres import engine
+    from bot.fsm_storage import DBStorage
+
+    bot = create_bot()
+    # FSM без кэша процесса: при перезапуске и смене воркера состояние - из БД
+    storage = DBStorage(lru_size=0)
+    dp = create_dispatcher(bot, storage)
+    allowed_updates = dp.resolve_used_update_types()
+    runner = ChatOrderedRunner(dp, bot)
+    bot_id = settings.bot_token.split(":")[0]
+    worker_lock = WebhookWorkerLock(engine, bot_id)
+    relay = UpdateRelay(bot_id)
+    takeover: Dict[str, asyncio.Task] = {}
+
+    def accept(raw: bytes):
+        """Поставить апдейт в обработку (только у владельца)"""
+        update = Update.model_validate_json(raw, context={"bot": bot})
+        if update.event_type in allowed_updates:
+            runner.submit(update)
+
+    @app.post(settings.webhook_path, include_in_schema=False)
+    async def telegram_webhook(request: Request):
+        secret = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(secret, settings.webhook_secret):
+            return Response(status_code=401)
+
+        raw = await request.body()
+        if not worker_lock.held:
+            # 503 - Telegram повторит апдейт позже
+            return Response(status_code=200 if await relay.forward(raw) else 503)
+        accept(raw)
+        # Отвечаем сразу: Telegram повторяет апдейт, если ответа долго нет
+        return Response(status_code=200)
+
+    async def become_owner():
+        await dp.emit_startup(bot=bot, dispatcher=dp)
+        await relay.serve(accept)
+        await bot.set_webhook(
+            url=settings.webhook_url.rstrip("/") + settings.webhook_path,
+            secret_token=settings.webhook_secret,
+            allowed_updates=allowed_updates,
+        )
+        logger.info(f"🟢 Webhook установлен, типы апдейтов: {allowed_updates}")
+
+    async def wait_for_lock():
+        while True:
+            await asyncio.sleep(TAKEOVER_INTERVAL)
+            try:
+                if await worker_lock.acquire():
+                    break
+            except Exception as e:
+                logger.error(f"Ошибка захвата блокировки webhook: {e}")
+        await become_owner()
+
+    @app.on_event("startup")
+    async def start_webhook():
+        if await worker_lock.acquire():
+            await become_owner()
+            return
+        logger.info(
+            "ℹ️ Webhook бота обслуживает другой воркер: этот обслуживает API "
+            "и передаёт апдейты владельцу"
+        )
+        takeover["task"] = asyncio.create_task(wait_for_lock())
+
+    @app.on_event("shutdown")
+    async def stop_webhook():
+        task = takeover.pop("task", None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if worker_lock.held:
+            await relay.close()
+            await runner.drain()
+            await dp.emit_shutdown(bot=bot, dispatcher=dp)
+            await worker_lock.release()
+        await bot.session.close()
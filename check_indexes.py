@@ -0,0 +1,167 @@
+"""
+Проверка, что запросы bot/db_postgres.py идут по индексам.
+
+Проверяются не копии запросов, а сами функции: каждая вызывается на
+соединении во внешней транзакции (её commit - только SAVEPOINT, в
+конце всё откатывается), SQL перехватывается в before_cursor_execute
+и для каждого оператора выполняется EXPLAIN (FORMAT JSON) с теми же
+параметрами и enable_seqscan = off: на маленькой базе планировщик и
+так выберет Seq Scan, а здесь важно, что подходящий индекс вообще
+существует. Seq Scan по проверяемой таблице - ошибка; если функция
+эту таблицу больше не читает - тоже ошибка (проверка устарела).
+
+Запуск (нужен PostgreSQL из DATABASE_URL): python check_indexes.py
+"""
+import asyncio
+import json
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from api.models.category import Category
+from api.models.order import Order, OrderItem
+from api.models.product import Product
+from api.models.user_address import UserAddress
+from api.routes.delivery import load_active_orders
+from bot import db_postgres
+from bot.db_postgres import engine
+
+USER_ID = 1
+CATEGORY = "fish"
+PRODUCT = "sku1"
+
+# (вызов, таблица): вызов получает соединение проверки
+CHECKS: List[Tuple[str, Callable[[AsyncConnection], Awaitable[Any]], str]] = [
+    ("get_products_by_category", lambda c: db_postgres._load_products_by_category(CATEGORY), "categories"),
+    ("get_products_by_category", lambda c: db_postgres._load_products_by_category(CATEGORY), "products"),
+    ("get_product_by_code", lambda c: db_postgres.get_product_by_code(PRODUCT), "products"),
+    ("add_to_cart_db(+)", lambda c: db_postgres.add_to_cart_db(USER_ID, PRODUCT, 1), "cart"),
+    ("add_to_cart_db(-)", lambda c: db_postgres.add_to_cart_db(USER_ID, PRODUCT, -1), "cart"),
+    ("remove_item_from_cart_db", lambda c: db_postgres.remove_item_from_cart_db(USER_ID, PRODUCT), "cart"),
+    ("get_cart_db", lambda c: db_postgres.get_cart_db(USER_ID), "cart"),
+    ("get_user_addresses", lambda c: db_postgres.get_user_addresses(USER_ID), "useraddresses"),
+    ("get_user_orders", lambda c: db_postgres.get_user_orders(USER_ID), "orders"),
+    ("get_orders_with_items", lambda c: db_postgres.get_orders_with_items(USER_ID), "orders"),
+    ("get_orders_with_items", lambda c: db_postgres.get_orders_with_items(USER_ID), "orderitems"),
+    ("get_order_items", lambda c: db_postgres.get_order_items(1), "orderitems"),
+    ("get_orders_by_status", lambda c: db_postgres.get_orders_by_status("delivering"), "orders"),
+    ("get_orders_by_status('new')", lambda c: db_postgres.get_orders_by_status("new"), "orders"),
+    ("get_last_orders", lambda c: db_postgres.get_last_orders(), "orders"),
+    ("delivery: load_active_orders", lambda c: load_active_orders(AsyncSession(bind=c)), "orders"),
+]
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+PLANNED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def plan_nodes(node: dict):
+    """Обойти дерево плана"""
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def find_index(nodes: list, table: str) -> str:
+    """
+    Индекс, по которому читается таблица; "SEQ" - есть Seq Scan;
+    пустая строка - таблица в плане не встречается
+    """
+    found = ""
+    for node in nodes:
+        if node.get("Relation Name") != table:
+            continue
+        if node["Node Type"] == "Seq Scan":
+            return "SEQ"
+        if node["Node Type"] == "Bitmap Heap Scan":
+            # Имя индекса у Bitmap Heap Scan - в дочернем Bitmap Index Scan
+            found = ", ".join(n["Index Name"] for n in plan_nodes(node) if "Index Name" in n)
+        elif node["Node Type"] in INDEX_NODES:
+            found = node["Index Name"]
+        elif node.get("Conflict Arbiter Indexes"):
+            # INSERT ... ON CONFLICT: строку находит индекс-арбитр
+            found = ", ".join(node["Conflict Arbiter Indexes"])
+    return found
+
+
+@asynccontextmanager
+async def rolled_back():
+    """Соединение, на котором работают сессии db_postgres; в конце - откат"""
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        db_postgres.async_session.configure(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+            yield conn
+        finally:
+            db_postgres.async_session.configure(bind=engine, join_transaction_mode="conservative_savepoint")
+            await trans.rollback()
+
+
+async def seed(conn: AsyncConnection):
+    """Строки, без которых функции не дойдут до всех запросов (selectinload и т.п.)"""
+    async with AsyncSession(bind=conn, join_transaction_mode="create_savepoint") as session:
+        category = Category(code=CATEGORY, name="Проверка", sort_order=0)
+        session.add(category)
+        await session.flush()
+        session.add(Product(categoryid=category.id, code=PRODUCT, name="Проверка", priceperkg=1))
+        session.add(UserAddress(userid=USER_ID, address="Проверка"))
+        session.add(Order(
+            userid=USER_ID, status="delivering", total=1,
+            items=[OrderItem(productcode=PRODUCT, name="Проверка", price=1, quantity=1)],
+        ))
+        await session.commit()
+
+
+async def capture(conn: AsyncConnection, call) -> List[Tuple[str, Any]]:
+    """SQL, который выполнила функция (с параметрами драйвера)"""
+    statements = []
+
+    def on_execute(connection, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(PLANNED):
+            statements.append((statement, parameters))
+
+    event.listen(conn.sync_connection, "before_cursor_execute", on_execute)
+    try:
+        await call(conn)
+    except Exception as e:
+        # Запросы уже перехвачены; ошибка в разборе результата - не про индексы
+        print(f"      (вызов завершился ошибкой: {e!r})")
+    finally:
+        event.remove(conn.sync_connection, "before_cursor_execute", on_execute)
+    return statements
+
+
+async def explain(conn: AsyncConnection, statement: str, parameters) -> list:
+    plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(plan_nodes(plan[0]["Plan"]))
+
+
+async def check() -> int:
+    failed = 0
+    async with rolled_back() as conn:
+        await seed(conn)
+        for name, call, table in CHECKS:
+            nodes = []
+            for statement, parameters in await capture(conn, call):
+                nodes += await explain(conn, statement, parameters)
+
+            index = find_index(nodes, table)
+            if index == "SEQ":
+                failed += 1
+                print(f"SEQ   {name:<30} {table:<14} индекс не используется")
+            elif not index:
+                failed += 1
+                print(f"STALE {name:<30} {table:<14} функция не читает таблицу - обновите CHECKS")
+            else:
+                print(f"OK    {name:<30} {table:<14} {index}")
+    await engine.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(check()))
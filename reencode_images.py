@@ -0,0 +1,206 @@
+"""
+Пересборка уменьшенных копий (api.images) для всей библиотеки картинок.
+
+Обходит web/images/products и картинки, на которые ссылаются товары и
+категории, делает копии в пуле процессов и записывает в БД
+image_variants (и канонический image_url вместо /web/images/...)
+пачками - один UPDATE на пачку, а не commit на строку.
+
+Прогресс пишется в манифест (JSON Lines, строка на файл): прерванный
+запуск продолжается с места остановки, файлы с теми же размером и
+mtime повторно не кодируются.
+
+Запуск: python reencode_images.py [--workers 4] [--batch 500] [--force] [--dry-run]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update
+
+from api.database import AsyncSessionLocal, engine
+from api.images import (
+    FORMATS, IMAGE_EXTENSIONS, IMAGES_DIR, PRODUCT_IMAGES_DIR, VARIANTS, VARIANTS_DIR,
+    canonical_url, dump_variants, image_path, render_variants, variants_for_url,
+)
+from api.invalidation import CATALOG, CATEGORY, notify
+from api.models.category import Category
+from api.models.product import Product
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reencode_images.manifest.jsonl")
+
+
+def encode_file(path: str) -> Dict:
+    """Копии одного файла (в процессе пула); запись для манифеста"""
+    st = os.stat(path)
+    entry = {"file": os.path.relpath(path, IMAGES_DIR), "size": st.st_size, "mtime": st.st_mtime_ns}
+    try:
+        names = render_variants(path)
+    except ValueError as e:
+        entry["error"] = str(e)
+        return entry
+    out_dir = os.path.join(os.path.dirname(path), VARIANTS_DIR)
+    entry["bytes"] = {
+        f"{variant}.{fmt}": os.path.getsize(os.path.join(out_dir, name))
+        for variant, formats in names.items() for fmt, name in formats.items()
+    }
+    return entry
+
+
+def load_manifest(path: str) -> Dict[str, Dict]:
+    """Записи манифеста по файлу (последняя побеждает); обрезанная строка пропускается"""
+    entries = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["file"]] = entry
+    return entries
+
+
+def is_done(entry: Optional[Dict], path: str) -> bool:
+    if entry is None:
+        return False
+    st = os.stat(path)
+    if (entry["size"], entry["mtime"]) != (st.st_size, st.st_mtime_ns):
+        return False
+    if "error" in entry:
+        return True  # тот же битый файл - не пытаемся снова
+    url = "/images/" + entry["file"].replace(os.sep, "/")
+    return variants_for_url(url) is not None
+
+
+def library_files(extra: Iterable[str]) -> List[str]:
+    """Оригиналы в web/images/products и файлы из БД (без каталогов копий)"""
+    files = set()
+    for root, dirs, names in os.walk(PRODUCT_IMAGES_DIR):
+        dirs[:] = [d for d in dirs if d != VARIANTS_DIR]
+        files.update(os.path.join(root, n) for n in names if n.lower().endswith(IMAGE_EXTENSIONS))
+    files.update(p for p in extra if p.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(p))
+    return sorted(files)
+
+
+def remove_stale_tmp(files: Iterable[str]):
+    """Недописанные копии прерванного запуска"""
+    for out_dir in {os.path.join(os.path.dirname(p), VARIANTS_DIR) for p in files}:
+        if os.path.isdir(out_dir):
+            for name in os.listdir(out_dir):
+                if name.endswith(".tmp"):
+                    os.remove(os.path.join(out_dir, name))
+
+
+def encode_library(files: List[str], manifest_path: str, workers: int, force: bool) -> Dict[str, Dict]:
+    manifest = {} if force else load_manifest(manifest_path)
+    todo = [p for p in files if not is_done(manifest.get(os.path.relpath(p, IMAGES_DIR)), p)]
+    print(f"Файлов: {len(files)}, готово ранее: {len(files) - len(todo)}, к кодированию: {len(todo)}")
+    if not todo:
+        return manifest
+
+    remove_stale_tmp(todo)
+    started = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with open(manifest_path, "w" if force else "a", encoding="utf-8") as out, ctx.Pool(workers) as pool:
+        for n, entry in enumerate(pool.imap_unordered(encode_file, todo, chunksize=4), 1):
+            # Строка на файл сразу на диск: после прерывания продолжим с неё
+            out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            out.flush()
+            manifest[entry["file"]] = entry
+            if "error" in entry:
+                print(f"  ✗ {entry['file']}: {entry['error']}")
+            if n % 50 == 0 or n == len(todo):
+                rate = n / (time.perf_counter() - started)
+                print(f"  {n}/{len(todo)} ({rate:.1f} файл/с)")
+    return manifest
+
+
+def report(manifest: Dict[str, Dict], files: List[str]):
+    """Объём оригиналов и копий каждого размера"""
+    wanted = {os.path.relpath(p, IMAGES_DIR) for p in files}
+    done = [e for f, e in manifest.items() if f in wanted and "bytes" in e]
+    original = sum(e["size"] for e in done)
+    print(f"\nОригиналы: {len(done)} файлов, {original / 2**20:.1f} МБ")
+    if not original:
+        return
+    for variant in VARIANTS:
+        for fmt in FORMATS:
+            total = sum(e["bytes"][f"{variant}.{fmt}"] for e in done)
+            saved = original - total
+            print(f"  {variant:5} {fmt:4} {total / 2**20:7.1f} МБ, экономия {saved / 2**20:.1f} МБ ({saved / original:.1%})")
+    errors = sum(1 for f, e in manifest.items() if f in wanted and "error" in e)
+    if errors:
+        print(f"Не картинки / ошибки: {errors}")
+
+
+def row_changes(rows) -> List[Dict]:
+    """Параметры UPDATE для строк, у которых изменились image_url/image_variants"""
+    changes = []
+    for row_id, url, variants in rows:
+        new_url = canonical_url(url)
+        new_variants = dump_variants(variants_for_url(new_url))
+        if (new_url, new_variants) != (url, variants):
+            changes.append({"id": row_id, "image_url": new_url, "image_variants": new_variants})
+    return changes
+
+
+async def write_batches(model, topic: str, changes: List[Dict], batch: int):
+    """UPDATE по первичному ключу пачками, commit и уведомление кэшей на пачку"""
+    for start in range(0, len(changes), batch):
+        async with AsyncSessionLocal() as session:
+            await session.execute(update(model), changes[start:start + batch])
+            await notify(session, topic)
+            await session.commit()
+
+
+async def load_rows():
+    """(id, image_url, image_variants) товаров и категорий с картинкой"""
+    async with AsyncSessionLocal() as session:
+        products = (await session.execute(
+            select(Product.id, Product.image_url, Product.image_variants).where(Product.image_url.isnot(None))
+        )).all()
+        categories = (await session.execute(
+            select(Category.id, Category.image_url, Category.image_variants).where(Category.image_url.isnot(None))
+        )).all()
+    # Соединения пула привязаны к циклу событий, а их тут будет два
+    await engine.dispose()
+    return products, categories
+
+
+async def write_changes(product_changes: List[Dict], category_changes: List[Dict], batch: int):
+    await write_batches(Product, CATALOG, product_changes, batch)
+    await write_batches(Category, CATEGORY, category_changes, batch)
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch", type=int, default=500, help="строк в одном UPDATE")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--force", action="store_true", help="перекодировать всё, манифест заново")
+    parser.add_argument("--dry-run", action="store_true", help="не менять БД")
+    args = parser.parse_args()
+
+    products, categories = asyncio.run(load_rows())
+    referenced = filter(None, (image_path(url) for _, url, _ in (*products, *categories)))
+    files = library_files(referenced)
+    # Кодирование без цикла событий: Ctrl+C сразу останавливает пул
+    manifest = encode_library(files, args.manifest, args.workers, args.force)
+    report(manifest, files)
+
+    product_changes, category_changes = row_changes(products), row_changes(categories)
+    print(f"\nК обновлению в БД: товаров {len(product_changes)}, категорий {len(category_changes)}")
+    if args.dry_run:
+        return
+    asyncio.run(write_changes(product_changes, category_changes, args.batch))
+    print("✅ Готово")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Общие фикстуры тестов.
+
+По умолчанию тесты идут на временной SQLite. TEST_DATABASE_URL
+(postgresql+asyncpg://...) - на PostgreSQL: там же проверяется
+конкурентность (блокировки, порядок commit). База пересоздаётся
+перед каждым тестом, который берёт фикстуру db.
+"""
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="chefport-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite+aiosqlite:///{_tmp}/test.db"
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("SECRET_KEY", "test")
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import api.models  # noqa: E402,F401
+from api.database import Base, engine  # noqa: E402
+
+engine.echo = False
+
+
+def is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+requires_postgres = pytest.mark.skipif(
+    not os.environ.get("TEST_DATABASE_URL", "").startswith("postgresql"),
+    reason="нужен PostgreSQL (TEST_DATABASE_URL)",
+)
+
+
+@pytest.fixture
+async def db():
+    """Чистая схема; после теста соединения пулов закрываются"""
+    from bot import db_postgres
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+    await db_postgres.engine.dispose()
+
+
+class StatementCounter:
+    """Считает SQL-операторы движка (before_cursor_execute)"""
+
+    def __init__(self, sync_engine):
+        self.engine = sync_engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_statements():
+    """with count_statements(engine) as counter: ...; counter.count"""
+    return lambda async_engine: StatementCounter(async_engine.sync_engine)
@@ -0,0 +1,54 @@
+"""Загрузчики заказов бота: число SQL-операторов не зависит от числа заказов"""
+
+import pytest
+
+from api.database import AsyncSessionLocal
+from api.models.order import Order, OrderItem
+from bot import db_postgres
+
+USER_ID = 1001
+
+
+async def add_orders(count: int, items_per_order: int = 3):
+    async with AsyncSessionLocal() as session:
+        for n in range(count):
+            session.add(Order(
+                userid=USER_ID,
+                name=f"Клиент {n}",
+                total=1000 + n,
+                items=[
+                    OrderItem(productcode=f"p{i}", name=f"Товар {i}", price=100.0 * (i + 1), quantity=1)
+                    for i in range(items_per_order)
+                ],
+            ))
+        await session.commit()
+
+
+@pytest.mark.parametrize("loader, expected", [
+    (lambda: db_postgres.get_orders_with_items(USER_ID), 2),
+    (lambda: db_postgres.get_all_orders(limit=100), 2),
+])
+async def test_order_lists_do_not_query_per_order(db, count_statements, loader, expected):
+    await add_orders(1)
+    with count_statements(db_postgres.engine) as one:
+        orders = await loader()
+    assert len(orders) == 1
+
+    await add_orders(40)
+    with count_statements(db_postgres.engine) as many:
+        orders = await loader()
+    assert len(orders) == 41
+    assert all(len(order["items"]) == 3 for order in orders)
+
+    assert many.count == one.count == expected, many.statements
+
+
+async def test_order_details_single_statement(db, count_statements):
+    await add_orders(5, items_per_order=10)
+
+    with count_statements(db_postgres.engine) as counter:
+        details = await db_postgres.get_order_details(3)
+
+    assert details["order_id"] == 3
+    assert len(details["items"]) == 10
+    assert counter.count == 1, counter.statements
@@ -0,0 +1,34 @@
+"""Корзина бота: параллельные нажатия "+" и "-" без потерь и дублей"""
+
+import asyncio
+
+from sqlalchemy import select
+
+from api.database import AsyncSessionLocal
+from api.models.cart import Cart
+from bot import db_postgres
+
+USER_ID = 2002
+
+
+async def cart_rows(product_code: str):
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(
+            select(Cart).where(Cart.userid == USER_ID, Cart.productcode == product_code)
+        )).scalars().all()
+
+
+async def test_parallel_increments_make_one_row(db):
+    await asyncio.gather(*(db_postgres.add_to_cart_db(USER_ID, "sku1", 1) for _ in range(100)))
+
+    rows = await cart_rows("sku1")
+    assert len(rows) == 1
+    assert rows[0].quantity == 100
+
+
+async def test_parallel_decrements_remove_row_once(db):
+    await db_postgres.add_to_cart_db(USER_ID, "sku2", 10)
+
+    await asyncio.gather(*(db_postgres.add_to_cart_db(USER_ID, "sku2", -1) for _ in range(10)))
+
+    assert await cart_rows("sku2") == []
@@ -0,0 +1,51 @@
+"""Корзина бота и API: цена со скидкой та же, по которой считается заказ"""
+
+import httpx
+from fastapi import FastAPI
+
+from api.cart_view import load_cart_view
+from api.database import AsyncSessionLocal
+from api.models.product import Product
+from api.routes import cart, orders
+from bot import db_postgres
+
+USER_ID = 3003
+
+
+async def test_cart_shows_discounted_prices_like_checkout(db):
+    async with AsyncSessionLocal() as session:
+        session.add(Product(
+            categoryid=1, code="sale1", name="Скидка", priceperkg=1000,
+            is_discount=True, discount_percent=30,
+        ))
+        session.add(Product(categoryid=1, code="full1", name="Без скидки", priceperkg=500))
+        await session.commit()
+    await db_postgres.add_to_cart_db(USER_ID, "sale1", 2)
+    await db_postgres.add_to_cart_db(USER_ID, "full1", 1)
+
+    async with AsyncSessionLocal() as session:
+        view = await load_cart_view(session, USER_ID)
+    sale, full = view.lines
+    assert (sale.base_price, sale.discount_percent, sale.price, sale.line_total) == (1000, 30, 700, 1400)
+    assert (full.base_price, full.discount_percent, full.price, full.line_total) == (500, 0, 500, 500)
+    assert view.total == 1900
+
+    # Оформление в боте берёт цены из той же корзины
+    items = await db_postgres.get_cart_db(USER_ID)
+    assert [(i["product_code"], i["price"]) for i in items] == [("sale1", 700), ("full1", 500)]
+
+    app = FastAPI()
+    app.include_router(cart.router, prefix="/api/cart")
+    app.include_router(orders.router, prefix="/api/orders")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        response = await http.get(f"/api/cart/{USER_ID}")
+        assert response.json()["total"] == 1900
+        assert response.json()["lines"][0]["price"] == 700
+
+        # POST /api/orders считает ту же сумму
+        response = await http.post("/api/orders/", json={
+            "user_id": USER_ID,
+            "items": [{"product_id": 1, "quantity": 2}, {"product_id": 2, "quantity": 1}],
+        })
+        assert response.status_code == 201, response.text
+        assert response.json()["total_amount"] == view.total
@@ -0,0 +1,128 @@
+"""Снимок каталога из общего файла: товары из mmap, устаревание по max_age, чтение ботом"""
+
+import os
+import time
+
+from sqlalchemy import update
+
+from api.catalog import FULL_LIST_LIMIT, CatalogStore, MappedItems
+from api.config import settings
+from api.database import AsyncSessionLocal, engine
+from api.models.category import Category
+from api.models.product import Product
+from bot import db_postgres
+
+
+async def seed_catalog(count: int = 30):
+    async with AsyncSessionLocal() as session:
+        session.add(Category(code="fish", name="Рыба", sort_order=1))
+        for n in range(count):
+            session.add(Product(
+                categoryid=1 + n % 3, code=f"sku{n:03}", name=f"Товар {n:03}",
+                priceperkg=100 + n, category="fish", in_stock=n % 2 == 0,
+            ))
+        await session.commit()
+
+
+async def test_snapshot_reads_products_from_mapped_file(db, tmp_path):
+    await seed_catalog()
+    store = CatalogStore(str(tmp_path / "catalog.bin"))
+    snapshot = await store.get()
+
+    # Товары не копируются в память процесса: записи читаются из mmap
+    assert isinstance(snapshot.items, MappedItems)
+    assert len(snapshot.items) == len(snapshot.by_id) == 30
+    assert snapshot.get(7).code == "sku006"
+    assert snapshot.get(999) is None
+    assert sorted(snapshot.by_id) == list(range(1, 31))
+
+    first, after = snapshot.page(limit=10)
+    second, _ = snapshot.page(limit=10, after=after)
+    assert [p.id for p in first + second] == [i.product.id for i in snapshot.items[:20]]
+    assert [p.id for p in snapshot.products(in_stock=True, limit=3)] == [
+        i.product.id for i in snapshot.items if i.in_stock
+    ][:3]
+
+    payload, _ = await snapshot.products_payload(limit=FULL_LIST_LIMIT)
+    assert isinstance(payload.raw, memoryview)
+
+
+async def test_write_without_notify_is_picked_up_after_max_age(db, tmp_path):
+    await seed_catalog(3)
+    path = str(tmp_path / "catalog.bin")
+    store = CatalogStore(path, max_age=60)
+    assert (await store.get()).get(1).name == "Товар 000"
+
+    # Правка скриптом в обход notify(): тема catalog не меняется
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(Product).where(Product.id == 1).values(name="Новое имя"))
+        await session.commit()
+    assert (await store.get()).get(1).name == "Товар 000"
+
+    # Файл (возможно, собранный другим воркером) старше max_age
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert (await CatalogStore(path, max_age=60).get()).get(1).name == "Новое имя"
+
+    os.utime(path, (old, old))
+    store._verified_at -= 120
+    assert (await store.get()).get(1).name == "Товар 000"  # отдаётся сразу, сборка - в фоне
+    await store._background
+    assert (await store.get()).get(1).name == "Новое имя"
+    assert store.age < 60
+
+
+async def test_filtered_reads_decode_each_record_once(db, tmp_path, monkeypatch):
+    await seed_catalog()
+    snapshot = await CatalogStore(str(tmp_path / "catalog.bin")).get()
+    mapped = snapshot.items._mapped
+    decoded = []
+    record = mapped.record
+    monkeypatch.setattr(mapped, "record", lambda n: decoded.append(n) or record(n))
+
+    for _ in range(3):
+        snapshot.products(in_stock=True)
+        snapshot.products(category="fish", in_stock=False, limit=5)
+    assert sorted(decoded) == list(range(30))
+    assert snapshot.items[3] is snapshot.items[3]
+    assert snapshot.get(snapshot.items[3].product.id) is snapshot.items[3].product
+
+
+async def test_refresh_with_known_source_version_skips_db(db, tmp_path, count_statements):
+    await seed_catalog(3)
+    store = CatalogStore(str(tmp_path / "catalog.bin"))
+    await store.get()
+
+    # Версия темы из шины инвалидации совпадает с файлом - БД не трогаем
+    with count_statements(engine) as counter:
+        await store.refresh(source_version=0)
+    assert counter.count == 0
+
+    with count_statements(engine) as counter:
+        await store.refresh()
+    assert counter.count == 1  # версия темы catalog
+
+
+async def test_bot_reads_catalog_from_mapped_snapshot(db, tmp_path, monkeypatch, count_statements):
+    await seed_catalog()
+    path = str(tmp_path / "catalog.bin")
+    store = CatalogStore(path)
+    monkeypatch.setattr(settings, "catalog_file", path)
+    monkeypatch.setattr(db_postgres, "catalog", store)
+    snapshot = await store.get()
+
+    with count_statements(engine) as api_counter, count_statements(db_postgres.engine) as bot_counter:
+        categories = await db_postgres.get_categories()
+        products = await db_postgres.get_products_by_category("fish")
+        by_code = await db_postgres.get_product_by_code("sku003")
+        by_id = await db_postgres.get_product_by_id(4)
+        missing = await db_postgres.get_products_by_category("meat")
+    assert api_counter.count == bot_counter.count == 0
+
+    assert categories == [(1, "fish", "Рыба", 1)]
+    assert [p[3] for p in products] == [f"Товар {n:03}" for n in range(0, 30, 3)]
+    assert {p[1] for p in products} == {1}
+    assert by_code[:4] == (4, 1, "Товар 003", 103)
+    assert by_id[:4] == (4, 1, "sku003", "Товар 003")
+    assert missing == []
+    assert snapshot.get_by_code("nope") is None
@@ -0,0 +1,34 @@
+"""FSM-хранилище: кэш не продлевает жизнь состояния дольше TTL"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from aiogram.fsm.storage.base import StorageKey
+
+from api.database import AsyncSessionLocal
+from api.models.fsm_state import FSMState
+from bot.fsm_storage import DBStorage, storage_key
+
+KEY = StorageKey(bot_id=1, chat_id=2, user_id=2)
+
+
+async def test_cached_state_expires_ttl_after_last_write(db):
+    storage = DBStorage(ttl=timedelta(seconds=2))
+    # Состояние записано 1.5 с назад (другим процессом или до перезапуска)
+    async with AsyncSessionLocal() as session:
+        session.add(FSMState(
+            key=storage_key(KEY), state="Checkout:address", data=None,
+            updatedat=datetime.now(timezone.utc) - timedelta(seconds=1.5),
+        ))
+        await session.commit()
+
+    assert await storage.get_state(KEY) == "Checkout:address"
+    await asyncio.sleep(0.7)
+    # Через TTL после записи состояние пусто, хотя в кэш оно попало недавно
+    assert await storage.get_state(KEY) is None
+
+    # Новая запись снова живёт TTL
+    await storage.set_state(KEY, "Checkout:phone")
+    await asyncio.sleep(0.7)
+    assert await storage.get_state(KEY) == "Checkout:phone"
+    await storage.close()
@@ -0,0 +1,70 @@
+"""Ссылки на картинки и сборка мусора: сохранение товара не теряет ссылку"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from api import image_store
+from api.database import AsyncSessionLocal
+from api.image_store import blob_path, blob_url, collect_garbage, rebind
+from api.models.image_blob import ImageBlob
+from api.models.product import Product
+
+from conftest import requires_postgres
+from test_catalog_file import seed_catalog
+from test_products_api import http  # noqa: F401
+
+DIGEST = "ab" * 32
+
+
+@pytest.fixture
+async def old_blob(db, tmp_path, monkeypatch):
+    """Картинка без ссылок, загруженная давно: кандидат сборщика мусора"""
+    monkeypatch.setattr(image_store, "PRODUCT_IMAGES_DIR", str(tmp_path))
+    with open(blob_path(DIGEST, ".jpg"), "wb") as f:
+        f.write(b"jpeg")
+    async with AsyncSessionLocal() as session:
+        session.add(ImageBlob(
+            digest=DIGEST, ext=".jpg", size=4, refcount=0,
+            createdat=datetime.now(timezone.utc) - timedelta(days=2),
+        ))
+        await session.commit()
+    return blob_url(DIGEST, ".jpg")
+
+
+async def refcount():
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(select(ImageBlob.refcount).where(ImageBlob.digest == DIGEST))
+
+
+async def test_rebind_to_collected_image_is_rejected(old_blob, http):  # noqa: F811
+    await seed_catalog(1)
+    assert (await collect_garbage(grace=timedelta(hours=1)))["deleted"] == 1
+
+    response = await http.patch("/api/products/1", json={"image_url": old_blob})
+    assert response.status_code == 409
+    async with AsyncSessionLocal() as session:
+        assert (await session.get(Product, 1)).image_url is None
+
+
+@requires_postgres
+async def test_gc_waits_for_product_save_and_keeps_its_reference(old_blob):
+    await seed_catalog(1)
+
+    async with AsyncSessionLocal() as route:
+        product = await route.get(Product, 1)
+        old_url, product.image_url = product.image_url, old_blob
+        await rebind(route, old_url, old_blob)
+        await route.flush()
+
+        gc = asyncio.create_task(collect_garbage(grace=timedelta(hours=1)))
+        await asyncio.sleep(0.3)
+        assert not gc.done()  # ждёт блокировку строки картинки
+        await route.commit()
+
+    result = await gc
+    assert result["deleted"] == 0 and result["recounted"] == 0
+    assert await refcount() == 1
+    assert (await collect_garbage(grace=timedelta(hours=1)))["deleted"] == 0
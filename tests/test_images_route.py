@@ -0,0 +1,54 @@
+"""Копии картинок произвольного размера: w/h округляются до SIDES"""
+
+import io
+import os
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from PIL import Image
+
+from api.image_cache import DiskLRU
+from api.images import shutdown_pool
+from api.routes import images
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    src = tmp_path / "fish.jpg"
+    Image.new("RGB", (1000, 800), "navy").save(src, "JPEG")
+    cache = DiskLRU(str(tmp_path / "cache"), 64 * 1024 * 1024)
+    monkeypatch.setattr(images, "image_path", lambda url: str(src))
+    monkeypatch.setattr(images, "image_cache", cache)
+
+    app = FastAPI()
+    app.include_router(images.router, prefix="/images")
+    yield app, cache
+    shutdown_pool()
+
+
+def cached_files(cache: DiskLRU):
+    return [name for _, _, names in os.walk(cache.directory) for name in names]
+
+
+@pytest.mark.parametrize("side, snapped", [(1, 64), (64, 64), (201, 240), (1999, 2000)])
+def test_snap_side(side, snapped):
+    assert images.snap_side(side) == snapped
+    assert images.snap_side(None) is None
+
+
+async def test_nearby_sizes_share_one_copy(app):
+    app, cache = app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        sizes = []
+        for w in (201, 215, 239):
+            response = await http.get("/images/products/fish.jpg", params={"w": w})
+            assert response.status_code == 200
+            sizes.append(Image.open(io.BytesIO(response.content)).size)
+
+        response = await http.get("/images/products/fish.jpg", params={"w": 210, "h": 210})
+        assert Image.open(io.BytesIO(response.content)).size == (240, 240)
+
+    assert sizes == [(240, 192)] * 3
+    assert len(cached_files(cache)) == 2
+    assert cache.misses == 2 and cache.hits == 2
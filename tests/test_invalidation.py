@@ -0,0 +1,42 @@
+"""Шина инвалидации: пишутся только общие темы"""
+
+import asyncio
+
+from sqlalchemy import select
+
+from api.database import AsyncSessionLocal
+from api.invalidation import CATALOG, CHANNEL, InvalidationBus, notify, notify_payload
+from api.models.cache_version import CacheVersion
+from api.models.category import Category
+from bot import db_postgres
+
+
+async def topics():
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(select(CacheVersion.topic))).scalars().all()
+
+
+async def test_user_writes_do_not_add_topics(db):
+    await db_postgres.add_user_address(7, "Морская, 1", is_default=True)
+    await db_postgres.upsert_user_profile(7, {"full_name": "Тест"})
+    await db_postgres.update_marketing_consent(7, True)
+    assert await topics() == []
+
+
+async def test_catalog_change_drops_bot_fallback(db):
+    bus = InvalidationBus("postgresql://localhost/chefport")
+    db_postgres.subscribe_catalog_invalidation(bus)
+
+    async with AsyncSessionLocal() as session:
+        session.add(Category(code="fish", name="Рыба", sort_order=1))
+        version = await notify(session, CATALOG)
+        await session.commit()
+    assert await topics() == [CATALOG]
+
+    assert await db_postgres.get_categories()
+    assert db_postgres._catalog_last_good
+
+    # Уведомление того же commit, пришедшее по LISTEN от другого процесса
+    bus._on_notify(None, 0, CHANNEL, notify_payload(CATALOG, version, origin="api-worker"))
+    await asyncio.gather(*bus._running.values())
+    assert db_postgres._catalog_last_good == {}
@@ -0,0 +1,83 @@
+"""Лента событий заказов: курсор по порядку commit, а не по id"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import select
+
+from api.database import AsyncSessionLocal
+from api.models.order import Order
+from api.models.order_event import OrderEvent
+from api.order_events import add_order_event
+from api.order_feed import OrderFeed
+from api.routes import delivery
+
+from conftest import requires_postgres
+
+
+async def create_order() -> int:
+    async with AsyncSessionLocal() as session:
+        order = Order(userid=1, status="ready", total=100)
+        session.add(order)
+        await session.commit()
+        return order.id
+
+
+async def commit_event(order_id: int, status: str, event_id=None):
+    async with AsyncSessionLocal() as session:
+        event = add_order_event(session, order_id, status, user_id=1)
+        event.id = event_id
+        await session.commit()
+
+
+async def events_after(cursor: int):
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(
+            select(OrderEvent.status).where(OrderEvent.feedseq > cursor).order_by(OrderEvent.feedseq)
+        )).scalars().all()
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    feed = OrderFeed(interval=0.05)
+    monkeypatch.setattr(delivery, "order_feed", feed)
+    return feed
+
+
+async def test_event_with_lower_id_committed_later_is_not_lost(db, feed):
+    order_id = await create_order()
+    # Транзакция с id 5 взяла номер раньше, но закоммитилась после id 10
+    await commit_event(order_id, "delivering", event_id=10)
+    cursor = await feed.current()
+    assert await events_after(0) == ["delivering"]
+
+    await commit_event(order_id, "ready", event_id=5)
+
+    app = FastAPI()
+    app.include_router(delivery.router, prefix="/api/delivery")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        response = await http.get("/api/delivery/orders/poll", params={"cursor": cursor, "timeout": 5})
+
+    body = response.json()
+    assert body["changed"] is True and body["cursor"] > cursor
+    assert await events_after(cursor) == ["ready"]
+
+
+@requires_postgres
+async def test_concurrent_commits_out_of_id_order(db, feed):
+    order_id = await create_order()
+
+    async with AsyncSessionLocal() as slow:
+        add_order_event(slow, order_id, "cooking", user_id=1)
+        await slow.flush()  # id выдан, commit - позже
+
+        await commit_event(order_id, "delivering")
+        cursor = await feed.current()
+        assert await events_after(0) == ["delivering"]
+
+        await slow.commit()
+
+    assert await asyncio.wait_for(feed.wait(cursor, 5), 6) > cursor
+    assert await events_after(cursor) == ["cooking"]
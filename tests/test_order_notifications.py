@@ -0,0 +1,62 @@
+"""Уведомления о заказах: событие обработано, только когда сообщение отправлено"""
+
+import asyncio
+
+import pytest
+
+from api.database import AsyncSessionLocal
+from api.models.order_event import OrderEvent
+from api.order_events import OrderEventDispatcher
+from bot import order_notifications
+from bot.send_queue import SendQueue
+
+from test_order_feed import commit_event, create_order
+from test_send_queue import FlakyBot
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = SendQueue(global_rate=1000, chat_interval=0.001, base_backoff=0.01, max_retries=0)
+    monkeypatch.setattr(order_notifications, "send_queue", queue)
+    return queue
+
+
+async def load_event() -> OrderEvent:
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(OrderEvent.__table__.select())).one()
+
+
+async def test_event_is_processed_after_send_and_retried_after_failure(db, queue):
+    dispatcher = OrderEventDispatcher(AsyncSessionLocal, sinks=[order_notifications.telegram_sink])
+    await commit_event(await create_order(), "ready")
+
+    # Очередь ещё не отправляет: событие в пути, но не обработано и не берётся снова
+    assert await dispatcher.dispatch_batch() == 1
+    assert await dispatcher.dispatch_batch() == 0
+    assert (await load_event()).processedat is None
+
+    # Отправка не удалась - событие снова в очереди диспетчера
+    bot = FlakyBot({"🏃 Ваш заказ #1 готов к самовывозу!": 1})
+    queue.start(bot)
+    await asyncio.gather(*dispatcher._settling)
+    event = await load_event()
+    assert event.processedat is None and event.attempts == 1
+
+    assert await dispatcher.dispatch_batch() == 1
+    await asyncio.gather(*dispatcher._settling)
+    assert bot.sent[1] == ["🏃 Ваш заказ #1 готов к самовывозу!"]
+    assert (await load_event()).processedat is not None
+    await queue.stop(timeout=1)
+
+
+async def test_event_stays_pending_if_queue_stops_before_send(db, queue):
+    dispatcher = OrderEventDispatcher(AsyncSessionLocal, sinks=[order_notifications.telegram_sink])
+    await commit_event(await create_order(), "ready")
+
+    assert await dispatcher.dispatch_batch() == 1
+    await queue.stop(timeout=0)  # процесс остановлен, сообщение не ушло
+    await dispatcher.stop(timeout=1)
+
+    event = await load_event()
+    assert event.processedat is None and event.attempts == 0
+    assert await dispatcher.dispatch_batch() == 1  # уйдёт после перезапуска
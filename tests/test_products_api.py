@@ -0,0 +1,53 @@
+"""GET /api/products: параметры выборки"""
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api.catalog import CatalogStore
+from api.routes import products
+
+from test_catalog_file import seed_catalog
+
+
+@pytest.fixture
+async def http(db, monkeypatch):
+    store = CatalogStore()
+    monkeypatch.setattr(products, "catalog", store)
+    app = FastAPI()
+    app.include_router(products.router, prefix="/api/products")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        client.store = store
+        yield client
+
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": -1}, {"limit": 100_000}, {"skip": -1}])
+async def test_bad_paging_is_rejected(http, params):
+    await seed_catalog(3)
+    response = await http.get("/api/products/", params=params)
+    assert response.status_code == 422
+
+
+async def test_page_with_zero_limit_is_empty(http):
+    await seed_catalog(3)
+    snapshot = await http.store.get()
+    assert snapshot.page(limit=0) == ([], None)
+    assert len((await http.get("/api/products/", params={"limit": 2})).json()) == 2
+
+
+async def test_changes_after_max_seq_row_is_updated_and_deleted(http):
+    await seed_catalog(3)
+    last = (await http.get("/api/products/changes", params={"since": "0"})).json()["version"]
+
+    # Строка с наибольшим номером получает новый, больший номер
+    assert (await http.patch("/api/products/3", json={"name": "Новое имя"})).status_code == 200
+    changes = (await http.get("/api/products/changes", params={"since": str(last)})).json()
+    assert [p["name"] for p in changes["changed"]] == ["Новое имя"]
+    assert changes["version"] > last
+    last = changes["version"]
+
+    # Удаление этой строки не возвращает счётчик назад
+    assert (await http.delete("/api/products/3")).status_code == 204
+    changes = (await http.get("/api/products/changes", params={"since": str(last)})).json()
+    assert changes["deleted"] == [3] and changes["changed"] == []
+    assert changes["version"] > last
@@ -0,0 +1,43 @@
+"""Realtime-насос и replay: события, закоммиченные не по порядку id"""
+
+import pytest
+
+from api import realtime
+from api.order_feed import OrderFeed
+from api.realtime import RealtimeHub
+
+from test_order_feed import commit_event, create_order
+
+USER_ID = 1
+
+
+@pytest.fixture
+async def hub(monkeypatch):
+    monkeypatch.setattr(realtime, "order_feed", OrderFeed(interval=0.05))
+    hub = RealtimeHub()
+    yield hub
+    if hub._task is not None:
+        hub._task.cancel()
+
+
+async def test_pump_and_replay_deliver_late_commit_with_lower_id(db, hub):
+    order_id = await create_order()
+    await commit_event(order_id, "delivering", event_id=10)
+    sub = await hub.subscribe(USER_ID, catalog=False)
+    cursor = await realtime.order_feed.current()
+
+    # Меньший id, commit - после того, как насос прошёл id 10
+    await commit_event(order_id, "ready", event_id=5)
+
+    message = await sub.get(5)
+    assert '"status":"ready"' in message
+    assert f"id: {cursor + 1}" in message
+
+    # Переподключение с Last-Event-ID = курсор до события
+    late = await hub.subscribe(USER_ID, catalog=False)
+    replayed = await hub.replay(late, cursor)
+    assert len(replayed) == 1 and '"status":"ready"' in replayed[0]
+    assert late.last_order_event == cursor + 1
+
+    hub.unsubscribe(sub)
+    hub.unsubscribe(late)
@@ -0,0 +1,50 @@
+"""Очередь отправки: повтор не пропускает вперёд следующие сообщения чата"""
+
+from collections import defaultdict
+
+from aiogram.exceptions import TelegramNetworkError
+
+from bot.send_queue import SendQueue
+
+
+class FlakyBot:
+    """send_message, который первые failures раз падает на заданных текстах"""
+
+    def __init__(self, failures: dict):
+        self.failures = dict(failures)
+        self.sent = defaultdict(list)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        if self.failures.get(text):
+            self.failures[text] -= 1
+            raise TelegramNetworkError(method=None, message="connection reset")
+        self.sent[chat_id].append(text)
+
+
+async def test_retry_holds_later_messages_of_the_chat():
+    bot = FlakyBot({"a1": 2, "b2": 1})
+    queue = SendQueue(global_rate=1000, chat_interval=0.001, base_backoff=0.05)
+    queue.start(bot)
+
+    for n in range(1, 5):
+        queue.send_message(1, f"a{n}")
+        queue.send_message(2, f"b{n}")
+    await queue.stop(timeout=5)
+
+    assert queue.depth == 0
+    assert bot.sent[1] == ["a1", "a2", "a3", "a4"]
+    assert bot.sent[2] == ["b1", "b2", "b3", "b4"]
+    assert queue.retried == 3 and queue.failed == 0
+
+
+async def test_given_up_message_releases_the_chat():
+    bot = FlakyBot({"a1": 10})
+    queue = SendQueue(global_rate=1000, chat_interval=0.001, base_backoff=0.01, max_retries=1)
+    queue.start(bot)
+
+    queue.send_message(1, "a1")
+    queue.send_message(1, "a2")
+    await queue.stop(timeout=5)
+
+    assert bot.sent[1] == ["a2"]
+    assert queue.failed == 1 and queue.depth == 0
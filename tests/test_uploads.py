@@ -0,0 +1,155 @@
+"""Приём загрузок: коды ошибок receive_upload и задержка чтений во время загрузок"""
+
+import asyncio
+import hashlib
+import io
+import os
+import statistics
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from starlette.requests import Request
+
+from api import image_store
+from api.images import shutdown_pool
+from api.routes import uploads
+from api.upload_stream import FORM_OVERHEAD, receive_upload
+
+BOUNDARY = "chefport-test-boundary"
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def multipart(*parts) -> bytes:
+    """parts: (имя поля, имя файла или None, байты)"""
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def make_request(body: bytes, content_type: str = f"multipart/form-data; boundary={BOUNDARY}",
+                 with_length: bool = True, chunk: int = 16 * 1024) -> Request:
+    headers = [(b"content-type", content_type.encode())]
+    if with_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    chunks = [body[i:i + chunk] for i in range(0, len(body), chunk)] or [b""]
+
+    async def receive():
+        if chunks:
+            data = chunks.pop(0)
+            return {"type": "http.request", "body": data, "more_body": bool(chunks)}
+        return {"type": "http.disconnect"}
+
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": headers, "query_string": b""}
+    return Request(scope, receive)
+
+
+async def expect_status(tmp_path, request: Request, status: int, max_bytes: int = 1 << 20):
+    with pytest.raises(HTTPException) as error:
+        await receive_upload(request, str(tmp_path), max_bytes)
+    assert error.value.status_code == status
+    # Временный файл не остаётся ни при какой ошибке
+    assert os.listdir(tmp_path) == []
+
+
+async def test_receives_file_to_temp_path(tmp_path):
+    data = PNG + os.urandom(100_000)
+    body = multipart(("comment", None, b"hi"), ("file", "photo.png", data))
+    upload = await receive_upload(make_request(body), str(tmp_path), 1 << 20)
+
+    assert (upload.filename, upload.ext, upload.size) == ("photo.png", ".png", len(data))
+    assert upload.digest == hashlib.sha256(data).hexdigest()
+    with open(upload.path, "rb") as f:
+        assert f.read() == data
+
+
+async def test_413_by_content_length_before_reading(tmp_path):
+    body = multipart(("file", "big.png", PNG + b"\x00" * (1000 + FORM_OVERHEAD)))
+    await expect_status(tmp_path, make_request(body), 413, max_bytes=1000)
+
+
+async def test_413_while_streaming_without_length(tmp_path):
+    body = multipart(("file", "big.png", PNG + os.urandom(5000)))
+    await expect_status(tmp_path, make_request(body, with_length=False, chunk=1024), 413, max_bytes=1000)
+
+
+async def test_415_not_an_image(tmp_path):
+    body = multipart(("file", "photo.png", b"<?php echo 'not an image'; ?>"))
+    await expect_status(tmp_path, make_request(body), 415)
+
+
+@pytest.mark.parametrize("request_factory", [
+    lambda: make_request(b'{"file": 1}', content_type="application/json"),
+    lambda: make_request(multipart(("file", "photo.png", PNG)), content_type="multipart/form-data"),
+    lambda: make_request(multipart(("comment", None, PNG))),
+    lambda: make_request(multipart(("other", "photo.png", PNG))),
+    lambda: make_request(multipart(("file", "empty.png", b""))),
+    lambda: make_request(f"--{BOUNDARY}\r\nbroken".encode() + b"\x00" * 100),
+], ids=["not-multipart", "no-boundary", "no-filename", "other-field", "empty-file", "broken-body"])
+async def test_400_no_file(tmp_path, request_factory):
+    await expect_status(tmp_path, request_factory(), 400)
+
+
+# ----- задержка чтения каталога во время загрузок -----
+
+READ_P99_LIMIT = 0.1  # секунд
+
+
+def make_photo(side: int) -> bytes:
+    """JPEG из шума: почти не сжимается"""
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=95)
+    return out.getvalue()
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "PRODUCT_IMAGES_DIR", str(tmp_path))
+    monkeypatch.setattr(image_store, "PRODUCT_IMAGES_DIR", str(tmp_path))
+    yield tmp_path
+    shutdown_pool()
+
+
+async def test_catalog_reads_stay_fast_during_uploads(db, upload_dir):
+    from api.main import app
+
+    # Небольшая картинка (копии делаются быстро) и 8 МБ после её конца:
+    # приём и запись - как у большой фотографии
+    photo = make_photo(600) + os.urandom(8 * 2**20)
+    latencies = []
+    done = asyncio.Event()
+
+    async def read_loop(http: httpx.AsyncClient):
+        while not done.is_set():
+            started = time.perf_counter()
+            response = await http.get("/api/products/")
+            assert response.status_code == 200
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.005)
+
+    async def upload(http: httpx.AsyncClient, n: int):
+        body = photo + n.to_bytes(4, "big")  # разные файлы: без дедупликации
+        response = await http.post("/api/uploads/", files={"file": ("photo.jpg", body, "image/jpeg")})
+        assert response.status_code == 200, response.text
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as http:
+        await http.get("/api/products/")  # снимок каталога собран до замеров
+        reader = asyncio.create_task(read_loop(http))
+        try:
+            await asyncio.gather(*(upload(http, n) for n in range(4)))
+        finally:
+            done.set()
+            await reader
+
+    assert len(os.listdir(upload_dir)) >= 4
+    assert len(latencies) >= 20
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    assert p99 < READ_P99_LIMIT, f"p99 чтения каталога {p99 * 1000:.0f} мс"
@@ -0,0 +1,184 @@
+"""Webhook бота: секретный заголовок, порядок апдейтов чата, один владелец"""
+
+import asyncio
+import random
+from collections import defaultdict
+
+import httpx
+import pytest
+from aiogram import Dispatcher, Router
+from aiogram.types import Message
+from aiohttp import web
+from fastapi import FastAPI
+
+from api.config import settings
+from bot import bot_complete, webhook
+from bot.webhook import SECRET_HEADER, setup_webhook
+
+SECRET = "s3cret"
+CHATS = (101, 202, 303)
+
+
+class FakeTelegram:
+    """Bot API на localhost: запоминает вызовы методов"""
+
+    def __init__(self):
+        self.calls = []
+        self.sent = defaultdict(list)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = dict(await request.post())
+        self.calls.append((method, data))
+        if method == "sendMessage":
+            chat_id = int(data["chat_id"])
+            self.sent[chat_id].append(data["text"])
+            result = {
+                "message_id": len(self.calls), "date": 0, "text": data["text"],
+                "chat": {"id": chat_id, "type": "private"},
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def methods(self):
+        return [method for method, _ in self.calls]
+
+
+@pytest.fixture
+async def telegram(monkeypatch):
+    fake = FakeTelegram()
+    server = web.Application()
+    server.router.add_post("/bot{token}/{method}", fake.handle)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    monkeypatch.setattr(settings, "telegram_api_url", f"http://127.0.0.1:{port}")
+    monkeypatch.setattr(settings, "webhook_url", "https://shop.example")
+    monkeypatch.setattr(settings, "webhook_secret", SECRET)
+    # Вместо роутеров магазина - эхо со случайной задержкой: без
+    # упорядочивания ответы одного чата перемешались бы
+    monkeypatch.setattr(bot_complete, "create_dispatcher", echo_dispatcher)
+    yield fake
+    await runner.cleanup()
+
+
+def echo_dispatcher(bot, storage) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def echo(message: Message):
+        await asyncio.sleep(random.uniform(0, 0.02))
+        await message.bot.send_message(message.chat.id, message.text)
+
+    dp = Dispatcher(storage=storage)
+    dp.include_router(router)
+    dp.shutdown.register(storage.close)
+    return dp
+
+
+def message_update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": text,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Тест"},
+        },
+    }
+
+
+def client(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_webhook_checks_secret_and_keeps_chat_order(db, telegram):
+    app = FastAPI()
+    setup_webhook(app)
+    await app.router.startup()
+    try:
+        set_webhook = dict(telegram.calls)["setWebhook"]
+        assert set_webhook["secret_token"] == SECRET
+
+        async with client(app) as http:
+            forged = message_update(1, CHATS[0], "/admin")
+            response = await http.post(settings.webhook_path, json=forged)
+            assert response.status_code == 401
+            response = await http.post(settings.webhook_path, json=forged, headers={SECRET_HEADER: "wrong"})
+            assert response.status_code == 401
+
+            update_id = 10
+            for n in range(8):
+                for chat_id in CHATS:
+                    update_id += 1
+                    response = await http.post(
+                        settings.webhook_path,
+                        json=message_update(update_id, chat_id, f"{chat_id}:{n}"),
+                        headers={SECRET_HEADER: SECRET},
+                    )
+                    assert response.status_code == 200
+    finally:
+        await app.router.shutdown()  # дожидается апдейтов в обработке
+
+    assert sorted(telegram.sent) == sorted(CHATS)
+    for chat_id in CHATS:
+        assert telegram.sent[chat_id] == [f"{chat_id}:{n}" for n in range(8)]
+
+
+async def test_webhook_not_registered_without_secret(db, telegram, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_secret", "")
+    app = FastAPI()
+    setup_webhook(app)
+    await app.router.startup()
+
+    async with client(app) as http:
+        response = await http.post(settings.webhook_path, json=message_update(1, CHATS[0], "/admin"))
+    assert response.status_code == 404
+    assert telegram.calls == []
+
+
+async def test_second_worker_serves_api_and_relays_updates(db, telegram, monkeypatch):
+    monkeypatch.setattr(webhook, "TAKEOVER_INTERVAL", 0.05)
+    first, second = FastAPI(), FastAPI()
+    for app in (first, second):
+        setup_webhook(app)
+
+        @app.get("/health")
+        async def health():
+            return {"status": "ok"}
+
+    await first.router.startup()
+    await second.router.startup()  # не падает: воркер без webhook
+    try:
+        assert telegram.methods().count("setWebhook") == 1
+        async with client(second) as http:
+            assert (await http.get("/health")).status_code == 200
+            # Апдейт, пришедший ко второму воркеру, обрабатывает первый
+            response = await http.post(
+                settings.webhook_path, json=message_update(1, CHATS[0], "через второй"),
+                headers={SECRET_HEADER: SECRET},
+            )
+            assert response.status_code == 200
+    finally:
+        await first.router.shutdown()  # дожидается апдейтов в обработке
+    assert telegram.sent[CHATS[0]] == ["через второй"]
+
+    # Владелец остановился - webhook подхватывает второй воркер
+    try:
+        for _ in range(100):
+            if telegram.methods().count("setWebhook") == 2:
+                break
+            await asyncio.sleep(0.05)
+        assert telegram.methods().count("setWebhook") == 2
+        async with client(second) as http:
+            response = await http.post(
+                settings.webhook_path, json=message_update(2, CHATS[1], "напрямую"),
+                headers={SECRET_HEADER: SECRET},
+            )
+            assert response.status_code == 200
+    finally:
+        await second.router.shutdown()
+    assert telegram.sent[CHATS[1]] == ["напрямую"]